@@ -73,6 +73,7 @@ class EnterpriseBot:
         self.scheduler = None
         self.realtime_task = None  # Background task for real-time monitoring
         self.subscription_check_task = None  # Background task for subscription checking
+        self.subscription_check_wake = None  # Set when a subscription changes to reschedule the checker
         self.webhook_runner = None  # Webhook server runner
         self.webhook_site = None    # Webhook server site
 
@@ -147,7 +148,8 @@ class EnterpriseBot:
             subscription_repo=self.services.subscription_repo,
             group_repo=self.services.group_repo,
             notification_service=self.notification_service,
-            metrics=self.services.metrics
+            metrics=self.services.metrics,
+            subscription_service=self.subscription_service
         )
 
         # Create real-time news service
@@ -348,6 +350,9 @@ class EnterpriseBot:
         self.posting_service.bot = application.bot
         self.notification_service.set_bot(application.bot)
 
+        # Open shared NOWPayments HTTP session
+        await self.payment_service.connect()
+
         # Start webhook server for payment notifications
         try:
             from handlers.webhook_handler import create_webhook_server
@@ -366,12 +371,16 @@ class EnterpriseBot:
             logger.error(f"Failed to start webhook server: {e}", exc_info=True)
             logger.warning("Bot will continue without webhook server")
 
-        # Start subscription checker (runs daily at 9 AM UTC)
+        # Start subscription checker (runs at 9 AM UTC on days with due milestones)
         import asyncio
+        self.subscription_check_wake = asyncio.Event()
+        self.subscription_service.add_state_change_listener(
+            lambda group_id: self.subscription_check_wake.set()
+        )
         self.subscription_check_task = asyncio.create_task(
             self._run_subscription_checker()
         )
-        logger.info("💳 Subscription checker started (daily at 9:00 AM UTC)")
+        logger.info("💳 Subscription checker started (9:00 AM UTC on due days)")
 
         # Start real-time news monitoring
         if ENABLE_REALTIME_POSTING:
@@ -407,6 +416,13 @@ class EnterpriseBot:
             except Exception as e:
                 logger.error(f"Error shutting down webhook server: {e}", exc_info=True)
 
+        # Close shared NOWPayments HTTP session
+        if self.payment_service:
+            try:
+                await self.payment_service.disconnect()
+            except Exception as e:
+                logger.error(f"Error closing payment HTTP session: {e}", exc_info=True)
+
         # Stop subscription checker
         if self.subscription_check_task:
             self.subscription_check_task.cancel()
@@ -414,8 +430,16 @@ class EnterpriseBot:
                 await self.subscription_check_task
             except asyncio.CancelledError:
                 pass
+            await self.subscription_checker_service.close()
             logger.info("✅ Subscription checker stopped")
 
+        # Write back buffered user activity
+        if self.user_service:
+            try:
+                await self.user_service.close()
+            except Exception as e:
+                logger.error(f"Error flushing user activity: {e}", exc_info=True)
+
         # Stop real-time monitoring
         if self.realtime_news_service:
             self.realtime_news_service.stop_monitoring()
@@ -427,7 +451,9 @@ class EnterpriseBot:
                     pass
             logger.info("✅ Real-time monitoring stopped")
 
-        # Stop scheduler
+        # Stop scheduler and cut short any in-flight daily posting
+        if self.scheduler_service:
+            self.scheduler_service.cancel_posting()
         self.stop_scheduler()
 
         # Get final metrics
@@ -443,37 +469,46 @@ class EnterpriseBot:
 
     async def _run_subscription_checker(self):
         """
-        Background task to run subscription checker daily at 9 AM UTC.
+        Background task to run the subscription checker at 9 AM UTC.
+
+        Sleeps until the next day with a trial or grace period milestone
+        (at most a week). Subscription changes wake the task so it can
+        recompute the schedule.
         """
         import asyncio
 
         logger.info("Subscription checker task started")
 
+        target_time = time(9, 0)  # 9:00 AM UTC
+
         while True:
             try:
-                # Calculate next run time (9 AM UTC)
                 now = datetime.now(timezone.utc)
-                target_time = time(9, 0)  # 9:00 AM UTC
 
-                # Calculate next occurrence
-                next_run = datetime.combine(now.date(), target_time, tzinfo=timezone.utc)
-                if now.time() >= target_time:
-                    # If it's already past 9 AM today, schedule for tomorrow
-                    next_run += timedelta(days=1)
+                # Last day already covered: today if past 9 AM, else yesterday
+                covered = now.date() if now.time() >= target_time else now.date() - timedelta(days=1)
+                next_date = await self.subscription_checker_service.get_next_check_date(covered)
+                next_run = datetime.combine(next_date, target_time, tzinfo=timezone.utc)
 
                 # Calculate sleep duration
-                sleep_seconds = (next_run - now).total_seconds()
+                sleep_seconds = max(0.0, (next_run - now).total_seconds())
 
                 logger.info(f"Next subscription check scheduled for: {next_run.isoformat()} UTC")
                 logger.info(f"Sleeping for {sleep_seconds / 3600:.2f} hours...")
 
-                # Sleep until next run time
-                await asyncio.sleep(sleep_seconds)
+                # Sleep until next run time, or until a subscription changes
+                self.subscription_check_wake.clear()
+                try:
+                    await asyncio.wait_for(self.subscription_check_wake.wait(), timeout=sleep_seconds)
+                    logger.info("Subscription changed, rescheduling subscription check")
+                    continue
+                except asyncio.TimeoutError:
+                    pass
 
                 # Run the subscription check
-                logger.info("Running daily subscription check...")
+                logger.info("Running subscription check...")
                 await self.subscription_checker_service.check_all_subscriptions()
-                logger.info("Daily subscription check completed")
+                logger.info("Subscription check completed")
 
             except asyncio.CancelledError:
                 logger.info("Subscription checker task cancelled")
@@ -39,6 +39,9 @@ POSTING_HOUR = int(os.getenv("POSTING_HOUR", "9"))
 POSTING_MINUTE = int(os.getenv("POSTING_MINUTE", "0"))
 TIMEZONE = os.getenv("TIMEZONE", "UTC")
 
+# Maximum groups handled concurrently by the daily posting job
+DAILY_POST_CONCURRENCY = int(os.getenv("DAILY_POST_CONCURRENCY", "16"))
+
 # ============================================================================
 # DATABASE CONFIGURATION
 # ============================================================================
@@ -106,6 +109,12 @@ MIN_IMPORTANCE_SCORE = int(os.getenv("MIN_IMPORTANCE_SCORE", "7"))
 # Enable real-time hot news posting (24/7 monitoring)
 ENABLE_REALTIME_POSTING = os.getenv("ENABLE_REALTIME_POSTING", "true").lower() == "true"
 
+# Maximum groups posted to concurrently for each hot article
+REALTIME_GROUP_CONCURRENCY = int(os.getenv("REALTIME_GROUP_CONCURRENCY", "8"))
+
+# File where the posted-URL Bloom filter is persisted between restarts
+POSTED_URLS_FILTER_PATH = os.getenv("POSTED_URLS_FILTER_PATH", "./posted_urls.bloom")
+
 # Filters for hot news
 HOT_NEWS_FILTERS = {
     "important": True,  # Only important news
@@ -4,7 +4,8 @@ Provides foundational services for enterprise-grade operation.
 """
 
 from core.circuit_breaker import CircuitBreaker, circuit_breaker, CircuitBreakerError
-from core.cache import Cache, get_cache, init_cache, shutdown_cache
+from core.cache import Cache, SLRUCache, TTLCache, get_cache, init_cache, shutdown_cache
+from core.bloom_filter import BloomFilter, ScalableBloomFilter
 from core.metrics import MetricsCollector, get_metrics_collector
 from core.dependency_injection import (
     DependencyContainer,
@@ -30,10 +31,16 @@ __all__ = [
 
     # Cache
     'Cache',
+    'SLRUCache',
+    'TTLCache',
     'get_cache',
     'init_cache',
     'shutdown_cache',
 
+    # Bloom Filter
+    'BloomFilter',
+    'ScalableBloomFilter',
+
     # Metrics
     'MetricsCollector',
     'get_metrics_collector',
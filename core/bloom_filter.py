@@ -0,0 +1,221 @@
+"""
+Bloom filters for AI Market Insight Bot.
+Provides compact, probabilistic set membership for duplicate suppression.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import struct
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-capacity Bloom filter backed by a bytearray.
+
+    Membership tests may return false positives (bounded by error_rate once
+    capacity items have been added) but never false negatives.
+
+    Args:
+        capacity: Expected number of items
+        error_rate: Target false positive rate at capacity
+    """
+
+    _HEADER = struct.Struct("<QdQQ")  # capacity, error_rate, count, num_bits
+
+    def __init__(self, capacity: int = 10_000, error_rate: float = 0.001):
+        """Initialize Bloom filter."""
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+
+        # Optimal bit count and hash count for the target error rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        """Yield bit positions for an item (Kirsch-Mitzenmacher double hashing)."""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % num_bits
+
+    def add(self, item: str) -> bool:
+        """
+        Add an item.
+
+        Returns:
+            True if the item was (probably) not present before
+        """
+        bits = self._bits
+        added = False
+        for pos in self._positions(item):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def is_full(self) -> bool:
+        """Whether the filter has reached its design capacity."""
+        return self.count >= self.capacity
+
+    def to_bytes(self) -> bytes:
+        """Serialize filter state."""
+        header = self._HEADER.pack(self.capacity, self.error_rate, self.count, self.num_bits)
+        return header + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        """Restore a filter serialized with to_bytes()."""
+        capacity, error_rate, count, num_bits = cls._HEADER.unpack_from(data)
+        bloom = cls(capacity, error_rate)
+        bits = data[cls._HEADER.size:]
+        if bloom.num_bits != num_bits or len(bits) != len(bloom._bits):
+            raise ValueError("Corrupt Bloom filter data")
+        bloom._bits = bytearray(bits)
+        bloom.count = count
+        return bloom
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows by chaining larger, tighter filters.
+
+    When the newest filter reaches capacity a new one is appended with
+    `growth` times the capacity and `tightening` times the error rate, keeping
+    the compound false positive rate bounded.
+
+    With `max_filters` set, the oldest filter is dropped once that many exist
+    and new filters stop growing, so memory stays bounded and the oldest
+    items age out.
+
+    Args:
+        initial_capacity: Capacity of the first filter
+        error_rate: Target false positive rate of the first filter
+        growth: Capacity multiplier for each new filter
+        tightening: Error rate multiplier for each new filter
+        max_filters: Maximum number of chained filters (unbounded if None)
+    """
+
+    _MAGIC = b"SBF1"
+
+    def __init__(
+        self,
+        initial_capacity: int = 10_000,
+        error_rate: float = 0.001,
+        growth: int = 2,
+        tightening: float = 0.9,
+        max_filters: Optional[int] = None
+    ):
+        """Initialize scalable Bloom filter."""
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.max_filters = max_filters
+        self.filters: List[BloomFilter] = [BloomFilter(initial_capacity, error_rate)]
+
+    def add(self, item: str) -> bool:
+        """
+        Add an item.
+
+        Returns:
+            True if the item was (probably) not present before
+        """
+        if item in self:
+            return False
+        current = self.filters[-1]
+        if current.is_full:
+            if self.max_filters is not None and len(self.filters) >= self.max_filters:
+                # Rotate: forget the oldest items, keep the newest filter's size
+                del self.filters[:len(self.filters) - self.max_filters + 1]
+                current = BloomFilter(current.capacity, current.error_rate)
+            else:
+                current = BloomFilter(
+                    current.capacity * self.growth,
+                    current.error_rate * self.tightening
+                )
+            self.filters.append(current)
+        current.add(item)
+        return True
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in bloom for bloom in reversed(self.filters))
+
+    def __len__(self) -> int:
+        return sum(len(bloom) for bloom in self.filters)
+
+    def to_bytes(self) -> bytes:
+        """Serialize all chained filters."""
+        parts = [self._MAGIC, struct.pack("<I", len(self.filters))]
+        for bloom in self.filters:
+            data = bloom.to_bytes()
+            parts.append(struct.pack("<Q", len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ScalableBloomFilter":
+        """Restore a filter serialized with to_bytes()."""
+        if data[:4] != cls._MAGIC:
+            raise ValueError("Not a scalable Bloom filter")
+        (num_filters,) = struct.unpack_from("<I", data, 4)
+        offset = 8
+        filters = []
+        for _ in range(num_filters):
+            (size,) = struct.unpack_from("<Q", data, offset)
+            offset += 8
+            filters.append(BloomFilter.from_bytes(data[offset:offset + size]))
+            offset += size
+        if not filters:
+            raise ValueError("Empty Bloom filter data")
+        scalable = cls(filters[0].capacity, filters[0].error_rate)
+        scalable.filters = filters
+        return scalable
+
+    def save(self, path: str):
+        """Write filter state to disk atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ScalableBloomFilter"]:
+        """
+        Load filter state from disk.
+
+        Returns:
+            Restored filter, or None if missing or unreadable
+        """
+        try:
+            with open(path, "rb") as f:
+                return cls.from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Could not load Bloom filter from {path}: {e}")
+            return None
@@ -7,6 +7,7 @@ import logging
 import time
 import asyncio
 from typing import Any, Optional, Callable, Dict
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from functools import wraps
@@ -276,6 +277,170 @@ class Cache:
         return decorator
 
 
+class SLRUCache:
+    """
+    Segmented LRU cache resistant to scan pollution.
+    
+    New entries land in a small probation segment; only entries accessed a
+    second time are promoted to the larger protected segment. One-off scans
+    (e.g. a batch analyzing historical articles) churn probation only and
+    leave the hot working set intact.
+    
+    Not async-locked: all operations are synchronous and never await, so
+    they are atomic with respect to the event loop.
+    
+    Args:
+        probation: Maximum entries in the probation segment
+        protected: Maximum entries in the protected segment
+    """
+    
+    def __init__(self, probation: int = 128, protected: int = 768):
+        """Initialize SLRU cache."""
+        self.probation_size = probation
+        self.protected_size = protected
+        self._probation: "OrderedDict[Any, Any]" = OrderedDict()
+        self._protected: "OrderedDict[Any, Any]" = OrderedDict()
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Get value from cache, promoting probation hits to protected.
+        
+        Args:
+            key: Cache key
+            default: Value returned on miss
+            
+        Returns:
+            Cached value or default
+        """
+        protected = self._protected
+        if key in protected:
+            protected.move_to_end(key)
+            return protected[key]
+        
+        if key not in self._probation:
+            return default
+        
+        value = self._probation.pop(key)
+        if len(protected) >= self.protected_size:
+            # Demote protected LRU back to probation instead of dropping it
+            old_key, old_value = protected.popitem(last=False)
+            self._insert_probation(old_key, old_value)
+        protected[key] = value
+        return value
+    
+    def set(self, key: Any, value: Any):
+        """
+        Set value in cache.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        if key in self._protected:
+            self._protected[key] = value
+            self._protected.move_to_end(key)
+            return
+        self._probation.pop(key, None)
+        self._insert_probation(key, value)
+    
+    def _insert_probation(self, key: Any, value: Any):
+        """Insert into probation, evicting its LRU entry when full."""
+        if len(self._probation) >= self.probation_size:
+            self._probation.popitem(last=False)
+        self._probation[key] = value
+    
+    def delete(self, key: Any) -> bool:
+        """Delete entry from either segment."""
+        for segment in (self._protected, self._probation):
+            if key in segment:
+                del segment[key]
+                return True
+        return False
+    
+    def clear(self):
+        """Clear both segments."""
+        self._probation.clear()
+        self._protected.clear()
+    
+    def __contains__(self, key: Any) -> bool:
+        return key in self._protected or key in self._probation
+    
+    def __len__(self) -> int:
+        return len(self._protected) + len(self._probation)
+
+
+# Sentinel for TTLCache lookups where None is a valid cached value
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed TTL.
+    
+    Meant as a process-local L1 in front of the database for hot reads:
+    lookups are plain dict operations with no lock or await, so they are
+    atomic with respect to the event loop.
+    
+    Args:
+        maxsize: Maximum number of entries
+        ttl: Seconds an entry stays valid
+    """
+    
+    def __init__(self, maxsize: int = 10_000, ttl: float = 30.0):
+        """Initialize TTL cache."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (expires_at, value)
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Get value from cache.
+        
+        Args:
+            key: Cache key
+            default: Value returned on miss or expiry
+            
+        Returns:
+            Cached value or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def set(self, key: Any, value: Any):
+        """
+        Set value in cache, evicting the least recently used entry when full.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.maxsize:
+            self._entries.popitem(last=False)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+    
+    def pop(self, key: Any, default: Any = None) -> Any:
+        """Remove an entry, returning its value (expired or not) or default."""
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+    
+    def clear(self):
+        """Clear all entries."""
+        self._entries.clear()
+    
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 # Global cache instance
 _global_cache: Optional[Cache] = None
 
@@ -124,6 +124,10 @@ class MigrationManager:
             "004_add_groups_columns": MIGRATION_004,
             "005_add_news_cache_columns": MIGRATION_005,
             "006_subscription_system": MIGRATION_006,
+            "007_news_cache_recent_urls_index": MIGRATION_007,
+            "008_subscription_due_date_indexes": MIGRATION_008,
+            "009_subscription_events_dedupe_index": MIGRATION_009,
+            "010_groups_active_covering_index": MIGRATION_010,
         }
 
         for name, sql_statements in migrations.items():
@@ -421,6 +425,27 @@ MIGRATION_006 = [
     """,
 ]
 
+# Migration 007: Covering index for recent posted-URL lookups
+MIGRATION_007 = [
+    "CREATE INDEX IF NOT EXISTS idx_news_cache_created_url ON news_cache(created_at, expires_at, url)",
+]
+
+# Migration 008: Range-scan indexes for the daily subscription check
+MIGRATION_008 = [
+    "CREATE INDEX IF NOT EXISTS idx_subscriptions_status_trial_end ON subscriptions(subscription_status, trial_end_date)",
+    "CREATE INDEX IF NOT EXISTS idx_subscriptions_status_grace_end ON subscriptions(subscription_status, grace_period_end)",
+]
+
+# Migration 009: Covering index for the "warning already sent today" lookup
+MIGRATION_009 = [
+    "CREATE INDEX IF NOT EXISTS idx_events_dedupe ON subscription_events(event_type, created_at, subscription_id)",
+]
+
+# Migration 010: Covering index for the minimal active-groups scan
+MIGRATION_010 = [
+    "CREATE INDEX IF NOT EXISTS idx_groups_active ON groups(is_active, posting_time, group_id, trader_type)",
+]
+
 
 def run_all_migrations():
     """Run all pending migrations."""
@@ -9,11 +9,14 @@ import logging
 import threading
 from queue import Queue, Empty
 from contextlib import contextmanager
-from typing import Optional
+from typing import Optional, Sequence
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Compiled statements kept per SQLite connection (sqlite3 default is 128)
+SQLITE_STATEMENT_CACHE_SIZE = 256
+
 
 class DatabaseAdapter:
     """
@@ -21,19 +24,28 @@ class DatabaseAdapter:
     Automatically detects which database to use based on environment.
     """
     
-    def __init__(self, database_url: Optional[str] = None, pool_size: int = 5):
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        pool_size: int = 5,
+        sqlite_pragmas: Optional[Sequence[str]] = None
+    ):
         """
         Initialize database adapter.
         
         Args:
             database_url: Database URL (PostgreSQL URL or SQLite path)
             pool_size: Number of connections to maintain in pool
+            sqlite_pragmas: Extra PRAGMA statements run on every new SQLite
+                connection, e.g. "PRAGMA synchronous = NORMAL"
         """
         self.database_url = database_url or os.getenv('DATABASE_URL', './bot_database.db')
         self.pool_size = pool_size
+        self.sqlite_pragmas = tuple(sqlite_pragmas or ())
         self.pool = Queue(maxsize=pool_size)
         self.lock = threading.Lock()
         self.active_connections = 0
+        self.closed = False
         
         # Detect database type
         self.is_postgres = self._is_postgres_url(self.database_url)
@@ -93,10 +105,20 @@ class DatabaseAdapter:
         """Create SQLite connection."""
         import sqlite3
         
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+            # URI filenames, e.g. "file::memory:?cache=shared" for a shared in-memory database
+            uri=self.db_path.startswith('file:')
+        )
         conn.row_factory = sqlite3.Row
         # Enable foreign keys
         conn.execute("PRAGMA foreign_keys = ON")
+        # Per-connection settings (synchronous, cache_size, ...) must be applied
+        # to each pooled connection, not just the first one checked out
+        for pragma in self.sqlite_pragmas:
+            conn.execute(pragma)
         return conn
     
     @contextmanager
@@ -130,13 +152,23 @@ class DatabaseAdapter:
         finally:
             if conn:
                 self.active_connections -= 1
-                try:
-                    self.pool.put(conn, timeout=1)
-                except:
+                if self.closed:
+                    # Pool already shut down: don't park the connection in it
                     conn.close()
+                else:
+                    try:
+                        self.pool.put(conn, timeout=1)
+                    except:
+                        conn.close()
     
     def close_all(self):
-        """Close all connections in the pool."""
+        """
+        Close all connections in the pool.
+        
+        Connections checked out at the time are closed when they are
+        returned, so none outlive the pool.
+        """
+        self.closed = True
         while not self.pool.empty():
             try:
                 conn = self.pool.get_nowait()
@@ -18,20 +18,21 @@ class ConnectionPool:
     Now delegates to DatabaseAdapter for PostgreSQL/SQLite support.
     """
 
-    def __init__(self, db_path=None, pool_size=5):
+    def __init__(self, db_path=None, pool_size=5, sqlite_pragmas=None):
         """
         Initialize connection pool.
 
         Args:
             db_path: Path to database (for backward compatibility)
             pool_size: Number of connections to maintain in pool
+            sqlite_pragmas: Extra PRAGMA statements run on every SQLite connection
         """
         # Use DATABASE_URL from environment if available, otherwise use db_path
         database_url = os.getenv('DATABASE_URL')
         if not database_url and db_path:
             database_url = db_path
 
-        self.adapter = DatabaseAdapter(database_url, pool_size)
+        self.adapter = DatabaseAdapter(database_url, pool_size, sqlite_pragmas)
         logger.info(f"ConnectionPool initialized with {self.adapter.get_pool_stats()}")
 
     @contextmanager
@@ -60,10 +61,10 @@ class ConnectionPool:
 _pool = None
 
 
-def init_pool(db_path=None, pool_size=5):
+def init_pool(db_path=None, pool_size=5, sqlite_pragmas=None):
     """Initialize the global connection pool."""
     global _pool
-    _pool = ConnectionPool(db_path, pool_size)
+    _pool = ConnectionPool(db_path, pool_size, sqlite_pragmas)
     stats = _pool.get_pool_stats()
     logger.info(f"Connection pool initialized: {stats}")
     return _pool
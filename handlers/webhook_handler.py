@@ -4,10 +4,11 @@ Handles payment webhooks from NOWPayments.
 """
 
 import logging
-import json
 from aiohttp import web
 from typing import Optional
 
+from services.payment_service import json_loads
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,8 +58,8 @@ class WebhookHandler:
                 logger.warning("Webhook received without signature")
                 return web.Response(status=400, text="Missing signature")
             
-            # Get raw payload
-            payload = await request.text()
+            # Get raw payload bytes (signed as-is; no decode/encode round-trip)
+            payload = await request.read()
             
             # Verify signature
             is_valid = await self.payment_service.verify_webhook_signature(
@@ -72,14 +73,20 @@ class WebhookHandler:
             
             # Parse webhook data
             try:
-                webhook_data = json.loads(payload)
-            except json.JSONDecodeError as e:
+                webhook_data = json_loads(payload)
+            except ValueError as e:  # JSONDecodeError or invalid UTF-8
                 logger.error(f"Invalid JSON in webhook payload: {e}")
                 return web.Response(status=400, text="Invalid JSON")
             
             # Log webhook receipt
             logger.info(f"Received webhook: {webhook_data.get('payment_status')} for invoice {webhook_data.get('invoice_id')}")
             
+            # Acknowledge re-delivered events without reprocessing or
+            # re-activating the subscription
+            if self.payment_service.is_duplicate_webhook(webhook_data):
+                logger.info("Duplicate webhook acknowledged without reprocessing")
+                return web.Response(status=200, text="OK")
+            
             # Process webhook
             success = await self.payment_service.process_payment_webhook(webhook_data)
             
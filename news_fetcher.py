@@ -10,7 +10,7 @@ from config import (
     NEWSAPI_KEY, CRYPTOPANIC_API_KEY, CRYPTOCOMPARE_API_KEY,
     NEWSAPI_ENDPOINT, CRYPTOPANIC_ENDPOINT, CRYPTOCOMPARE_NEWS_ENDPOINT, COINGECKO_NEWS_ENDPOINT
 )
-from validators import InputValidator, InputSanitizer
+from validators import InputSanitizer
 
 logger = logging.getLogger(__name__)
 
@@ -65,14 +65,14 @@ class NewsFetcher:
             for article in data.get("articles", [])[:limit]:
                 # Validate and sanitize article data
                 title = InputSanitizer.sanitize_article_title(article.get("title", ""))
-                url = InputSanitizer.sanitize_url(article.get("url", ""))
+                url, url_valid = InputSanitizer.sanitize_and_validate_url(article.get("url", ""))
 
                 # Skip invalid articles
                 if not title or not url:
                     logger.warning("Skipping article with missing title or URL")
                     continue
 
-                if not InputValidator.validate_url(url):
+                if not url_valid:
                     logger.warning(f"Skipping article with invalid URL: {url}")
                     continue
 
@@ -157,7 +157,7 @@ class NewsFetcher:
                 else:
                     url = ""
 
-                url = InputSanitizer.sanitize_url(url)
+                url, url_valid = InputSanitizer.sanitize_and_validate_url(url)
 
                 # Debug: Print what we got after sanitization
                 if idx == 0:
@@ -173,7 +173,7 @@ class NewsFetcher:
                     logger.warning(f"Skipping CryptoPanic article {idx} with missing title or URL (title={bool(title)}, url={bool(url)})")
                     continue
 
-                if not InputValidator.validate_url(url):
+                if not url_valid:
                     logger.warning(f"Skipping CryptoPanic article with invalid URL: {url}")
                     continue
 
@@ -255,14 +255,14 @@ class NewsFetcher:
 
                 # Validate and sanitize article data
                 title = InputSanitizer.sanitize_article_title(article.get("title", ""))
-                url = InputSanitizer.sanitize_url(article.get("url", ""))
+                url, url_valid = InputSanitizer.sanitize_and_validate_url(article.get("url", ""))
 
                 # Skip invalid articles
                 if not title or not url:
                     logger.warning(f"Skipping CryptoCompare article {idx} with missing title or URL (title={bool(title)}, url={bool(url)})")
                     continue
 
-                if not InputValidator.validate_url(url):
+                if not url_valid:
                     logger.warning(f"Skipping CryptoCompare article with invalid URL: {url}")
                     continue
 
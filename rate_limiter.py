@@ -28,15 +28,16 @@ class RateLimiter:
     
     async def acquire(self):
         """Wait if necessary to maintain rate limit."""
+        # Reserve the next slot before sleeping so concurrent callers queue
+        # up behind each other instead of all waking at the same instant.
         current_time = time.time()
-        time_since_last_call = current_time - self.last_call_time
+        slot = max(current_time, self.last_call_time + self.min_interval)
+        self.last_call_time = slot
         
-        if time_since_last_call < self.min_interval:
-            wait_time = self.min_interval - time_since_last_call
+        wait_time = slot - current_time
+        if wait_time > 0:
             logger.debug(f"Rate limiting: waiting {wait_time:.3f}s")
             await asyncio.sleep(wait_time)
-        
-        self.last_call_time = time.time()
 
 
 class RetryConfig:
@@ -4,7 +4,7 @@ Provides connection pooling and transaction management.
 """
 
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable
 from contextlib import asynccontextmanager
 from abc import ABC, abstractmethod
 from db_pool import get_pool, ConnectionPool
@@ -52,6 +52,8 @@ class BaseRepository:
     - Logging
     """
     
+    IN_CHUNK_SIZE = 500  # Bound parameters per "IN (...)" list, under SQLite's limit
+    
     def __init__(self, pool: Optional[ConnectionPool] = None):
         """
         Initialize repository.
@@ -86,7 +88,8 @@ class BaseRepository:
         query: str,
         params: tuple = (),
         fetch_one: bool = False,
-        fetch_all: bool = False
+        fetch_all: bool = False,
+        row_factory: Optional[Callable[[Any], Any]] = None
     ) -> Optional[Any]:
         """
         Execute a database query with connection pooling.
@@ -96,10 +99,13 @@ class BaseRepository:
             params: Query parameters
             fetch_one: Return single row
             fetch_all: Return all rows
+            row_factory: Builds each result from the driver row, which
+                supports access by column name (default: dict)
             
         Returns:
             Query result or None
         """
+        make_row = row_factory or dict
         try:
             with self.pool.get_connection() as conn:
                 cursor = conn.cursor()
@@ -107,10 +113,10 @@ class BaseRepository:
                 
                 if fetch_one:
                     result = cursor.fetchone()
-                    return dict(result) if result else None
+                    return make_row(result) if result else None
                 elif fetch_all:
                     results = cursor.fetchall()
-                    return [dict(row) for row in results]
+                    return [make_row(row) for row in results]
                 else:
                     return cursor.lastrowid
                     
@@ -118,6 +124,39 @@ class BaseRepository:
             self.logger.error(f"Query execution error: {e}", exc_info=True)
             raise
     
+    async def iter_query(
+        self,
+        query: str,
+        params: tuple = (),
+        batch_size: int = 500
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream query results in batches instead of materializing all rows.
+        
+        Args:
+            query: SQL query string
+            params: Query parameters
+            batch_size: Rows fetched from the cursor at a time
+            
+        Yields:
+            Row dictionaries
+        """
+        try:
+            with self.pool.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+                        
+        except Exception as e:
+            self.logger.error(f"Query iteration error: {e}", exc_info=True)
+            raise
+    
     async def execute_many(self, query: str, params_list: List[tuple]) -> int:
         """
         Execute query with multiple parameter sets (batch operation).
@@ -4,7 +4,7 @@ Handles all group-related database operations with connection pooling.
 """
 
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from repositories.base_repository import BaseRepository
 
@@ -22,6 +22,15 @@ class GroupRepository(BaseRepository):
     - Activity tracking
     """
     
+    # Columns find_active_minimal returns by default; idx_groups_active covers them
+    ACTIVE_MINIMAL_COLUMNS = ('group_id', 'posting_time', 'trader_type')
+    
+    # Columns find_active_minimal may select
+    _SELECTABLE_COLUMNS = frozenset({
+        'group_id', 'group_name', 'posting_time', 'trader_type',
+        'is_active', 'created_at', 'last_post'
+    })
+    
     async def find_by_id(self, group_id: int) -> Optional[Dict[str, Any]]:
         """
         Find group by ID.
@@ -79,6 +88,35 @@ class GroupRepository(BaseRepository):
         
         return await self.execute_query(query, fetch_all=True)
     
+    async def find_active_minimal(
+        self,
+        columns: Tuple[str, ...] = ACTIVE_MINIMAL_COLUMNS
+    ) -> List[Dict[str, Any]]:
+        """
+        Get active groups with only the columns the caller needs.
+        
+        With the default columns the query is answered from
+        idx_groups_active alone, without reading the table rows.
+        
+        Args:
+            columns: Columns to select (must be group columns)
+            
+        Returns:
+            List of active group dictionaries ordered by posting time
+        """
+        unknown = set(columns) - self._SELECTABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown group columns: {sorted(unknown)}")
+        
+        query = f"""
+            SELECT {', '.join(columns)}
+            FROM groups
+            WHERE is_active = 1
+            ORDER BY posting_time
+        """
+        
+        return await self.execute_query(query, fetch_all=True)
+    
     async def create(
         self,
         group_id: int,
@@ -117,18 +155,101 @@ class GroupRepository(BaseRepository):
             self.logger.error(f"Failed to create group {group_id}: {e}")
             return False
     
-    async def update(self, group_id: int, data: Dict[str, Any]) -> bool:
+    async def register_group_with_trial(
+        self,
+        group_id: int,
+        group_name: str,
+        posting_time: str,
+        trader_type: str,
+        trial_start: datetime,
+        trial_end: datetime,
+        event_data: Optional[Dict[str, Any]] = None,
+        fingerprint: Optional[str] = None,
+        creator_user_id: Optional[int] = None
+    ) -> bool:
         """
-        Update group data.
+        Create a group together with its trial subscription in one transaction.
+        
+        Inserts the group (already marked as on trial), the subscription, the
+        'trial_started' event and, when a creator is given, the trial abuse
+        tracking row.
         
         Args:
             group_id: Telegram group ID
+            group_name: Group name
+            posting_time: Daily posting time (HH:MM format)
+            trader_type: Type of trader content
+            trial_start: Trial start time
+            trial_end: Trial end time
+            event_data: Data logged with the trial_started event
+            fingerprint: Group fingerprint for abuse tracking
+            creator_user_id: User ID who added the bot
+            
+        Returns:
+            True if everything was committed
+        """
+        import json
+        
+        now = datetime.now().isoformat()
+        operations = [
+            (
+                """
+                INSERT INTO groups (group_id, group_name, posting_time, trader_type,
+                                  is_active, created_at, last_post,
+                                  subscription_status, trial_ends_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (group_id, group_name, posting_time, trader_type, 1, now, None,
+                 'trial', trial_end.isoformat())
+            ),
+            (
+                """
+                INSERT INTO subscriptions (
+                    group_id, subscription_status, trial_start_date,
+                    trial_end_date, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (group_id, 'trial', trial_start.isoformat(), trial_end.isoformat(), now, now)
+            ),
+            (
+                # The new subscription_id is only known inside the transaction
+                """
+                INSERT INTO subscription_events (
+                    subscription_id, group_id, event_type, event_data, created_at
+                )
+                SELECT subscription_id, group_id, ?, ?, ?
+                FROM subscriptions WHERE group_id = ?
+                """,
+                ('trial_started', json.dumps(event_data) if event_data else None, now, group_id)
+            )
+        ]
+        
+        if fingerprint and creator_user_id:
+            operations.append((
+                """
+                INSERT INTO trial_abuse_tracking (
+                    group_id, group_title_hash, creator_user_id,
+                    trial_started_at, is_flagged, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (group_id, fingerprint, creator_user_id, trial_start.isoformat(), 0, now)
+            ))
+        
+        if await self.transaction(operations):
+            self.logger.info(f"Created group with trial: {group_id} ({group_name})")
+            return True
+        return False
+    
+    def _build_set_clause(self, data: Dict[str, Any]) -> Optional[Tuple[str, list]]:
+        """
+        Build the SET clause for a group update.
+        
+        Args:
             data: Dictionary of fields to update
             
         Returns:
-            True if successful
+            (set clause, values) tuple, or None if no allowed field is present
         """
-        # Build dynamic UPDATE query
         fields = []
         values = []
         
@@ -140,19 +261,82 @@ class GroupRepository(BaseRepository):
                 values.append(value)
         
         if not fields:
-            return False
+            return None
+        
+        return ', '.join(fields), values
+    
+    def _build_update(self, group_id: int, data: Dict[str, Any]) -> Optional[Tuple[str, tuple]]:
+        """
+        Build the UPDATE statement for a group.
         
-        query = f"UPDATE groups SET {', '.join(fields)} WHERE group_id = ?"
-        values.append(group_id)
+        Args:
+            group_id: Telegram group ID
+            data: Dictionary of fields to update
+            
+        Returns:
+            (query, params) tuple, or None if no allowed field is present
+        """
+        set_clause = self._build_set_clause(data)
+        if set_clause is None:
+            return None
+        
+        fields, values = set_clause
+        query = f"UPDATE groups SET {fields} WHERE group_id = ?"
+        return query, (*values, group_id)
+    
+    async def update(self, group_id: int, data: Dict[str, Any]) -> bool:
+        """
+        Update group data.
+        
+        Args:
+            group_id: Telegram group ID
+            data: Dictionary of fields to update
+            
+        Returns:
+            True if successful
+        """
+        statement = self._build_update(group_id, data)
+        if statement is None:
+            return False
         
         try:
-            await self.execute_query(query, tuple(values))
+            await self.execute_query(*statement)
             self.logger.info(f"Updated group: {group_id}")
             return True
         except Exception as e:
             self.logger.error(f"Failed to update group {group_id}: {e}")
             return False
     
+    async def update_all(self, group_ids: List[int], data: Dict[str, Any]) -> bool:
+        """
+        Apply the same update to several groups.
+        
+        Issues one "UPDATE ... WHERE group_id IN (...)" per IN_CHUNK_SIZE
+        ids, all in a single transaction.
+        
+        Args:
+            group_ids: Telegram group IDs
+            data: Dictionary of fields to update
+            
+        Returns:
+            True if successful
+        """
+        set_clause = self._build_set_clause(data)
+        if set_clause is None or not group_ids:
+            return False
+        
+        fields, values = set_clause
+        operations = []
+        for start in range(0, len(group_ids), self.IN_CHUNK_SIZE):
+            chunk = group_ids[start:start + self.IN_CHUNK_SIZE]
+            query = f"UPDATE groups SET {fields} WHERE group_id IN ({', '.join('?' * len(chunk))})"
+            operations.append((query, (*values, *chunk)))
+        
+        if await self.transaction(operations):
+            self.logger.info(f"Updated {len(group_ids)} groups")
+            return True
+        return False
+    
     async def delete(self, group_id: int) -> bool:
         """
         Delete group.
@@ -225,6 +409,30 @@ class GroupRepository(BaseRepository):
         now = datetime.now().isoformat()
         return await self.update(group_id, {"last_post": now})
     
+    async def update_last_post_many(self, group_ids: List[int]) -> int:
+        """
+        Update last post timestamp for several groups in one batch.
+        
+        Args:
+            group_ids: Telegram group IDs
+            
+        Returns:
+            Number of groups updated
+        """
+        if not group_ids:
+            return 0
+        
+        query = "UPDATE groups SET last_post = ? WHERE group_id = ?"
+        now = datetime.now().isoformat()
+        
+        try:
+            count = await self.execute_many(query, [(now, group_id) for group_id in group_ids])
+            self.logger.info(f"Updated last post for {count} groups")
+            return count
+        except Exception as e:
+            self.logger.error(f"Failed to update last post for groups: {e}")
+            return 0
+    
     async def get_by_posting_time(self, posting_time: str) -> List[Dict[str, Any]]:
         """
         Get all active groups with specific posting time.
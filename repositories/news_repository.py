@@ -4,7 +4,7 @@ Handles news caching and retrieval with connection pooling.
 """
 
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from datetime import datetime, timedelta
 from repositories.base_repository import BaseRepository
 
@@ -89,6 +89,31 @@ class NewsRepository(BaseRepository):
             now = datetime.now().isoformat()
             return await self.execute_query(query, (now, limit), fetch_all=True)
     
+    async def iter_recent_urls(self, limit: int = 10_000) -> AsyncIterator[str]:
+        """
+        Stream URLs of recent cached news articles, newest first.
+        
+        Only the url column is selected so the query can be served from
+        the (created_at, expires_at, url) index without reading rows.
+        
+        Args:
+            limit: Maximum number of URLs
+            
+        Yields:
+            Article URLs
+        """
+        query = """
+            SELECT url
+            FROM news_cache
+            WHERE expires_at > ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """
+        now = datetime.now().isoformat()
+        async for row in self.iter_query(query, (now, limit)):
+            if row.get("url"):
+                yield row["url"]
+    
     async def create(
         self,
         url: str,
@@ -4,7 +4,7 @@ Handles all subscription-related database operations.
 """
 
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 from datetime import datetime, timedelta
 import hashlib
 from repositories.base_repository import BaseRepository
@@ -12,6 +12,26 @@ from repositories.base_repository import BaseRepository
 logger = logging.getLogger(__name__)
 
 
+def _fingerprint_input(group_id: int, group_title: str) -> bytes:
+    """Build the "<group_id>:<title>" bytes directly, without an intermediate str."""
+    return b"%d:%s" % (group_id, str(group_title).encode("utf-8", "replace"))
+
+
+def trial_fingerprint(group_id: int, group_title: str) -> str:
+    """
+    Fingerprint a group for trial abuse tracking.
+    
+    Only used for equality lookups, so a fast 128-bit BLAKE2b digest
+    (32 hex chars) replaces SHA-256.
+    """
+    return hashlib.blake2b(_fingerprint_input(group_id, group_title), digest_size=16).hexdigest()
+
+
+def legacy_trial_fingerprint(group_id: int, group_title: str) -> str:
+    """SHA-256 fingerprint stored by trials tracked before BLAKE2b was used."""
+    return hashlib.sha256(_fingerprint_input(group_id, group_title)).hexdigest()
+
+
 class SubscriptionRepository(BaseRepository):
     """
     Repository for subscription data operations.
@@ -23,12 +43,63 @@ class SubscriptionRepository(BaseRepository):
     - Trial abuse tracking
     """
     
-    async def find_by_id(self, subscription_id: int) -> Optional[Dict[str, Any]]:
+    # Timestamp columns converted to datetime when rows are loaded with parse_dates
+    DATE_COLUMNS = (
+        'trial_start_date', 'trial_end_date', 'subscription_start_date',
+        'subscription_end_date', 'next_billing_date', 'grace_period_end',
+        'created_at', 'updated_at'
+    )
+    
+    # End dates also exposed as epoch seconds, for comparisons against time.time()
+    EPOCH_COLUMNS = {
+        'trial_end_date': 'trial_end_ts',
+        'subscription_end_date': 'subscription_end_ts',
+        'grace_period_end': 'grace_period_end_ts'
+    }
+    
+    _INSERT_EVENT = """
+        INSERT INTO subscription_events (
+            subscription_id, group_id, event_type, event_data, created_at
+        ) VALUES (?, ?, ?, ?, ?)
+    """
+    
+    @classmethod
+    def _row_with_dates(cls, row: Any) -> Dict[str, Any]:
+        """
+        Convert a driver row to a dict with DATE_COLUMNS parsed to datetime.
+        
+        Dates are stored as naive local time; offset-aware values (written
+        with a UTC offset or returned by the driver) are converted to naive
+        local time so callers can compare them with datetime.now().
+        
+        Each EPOCH_COLUMNS end date is also added as epoch seconds (None if
+        unset), so hot-path checks compare floats instead of datetimes.
+        """
+        data = dict(row)
+        for column in cls.DATE_COLUMNS:
+            value = data.get(column)
+            if isinstance(value, str) and value:
+                value = datetime.fromisoformat(value)
+            if isinstance(value, datetime):
+                if value.tzinfo is not None:
+                    value = value.astimezone().replace(tzinfo=None)
+                data[column] = value
+        for column, ts_column in cls.EPOCH_COLUMNS.items():
+            value = data.get(column)
+            data[ts_column] = value.timestamp() if isinstance(value, datetime) else None
+        return data
+    
+    async def find_by_id(
+        self,
+        subscription_id: int,
+        parse_dates: bool = False
+    ) -> Optional[Dict[str, Any]]:
         """
         Find subscription by ID.
         
         Args:
             subscription_id: Subscription ID
+            parse_dates: Return DATE_COLUMNS as datetime instead of ISO strings
             
         Returns:
             Subscription data dictionary or None
@@ -42,14 +113,24 @@ class SubscriptionRepository(BaseRepository):
             WHERE subscription_id = ?
         """
         
-        return await self.execute_query(query, (subscription_id,), fetch_one=True)
+        return await self.execute_query(
+            query,
+            (subscription_id,),
+            fetch_one=True,
+            row_factory=self._row_with_dates if parse_dates else None
+        )
     
-    async def find_by_group_id(self, group_id: int) -> Optional[Dict[str, Any]]:
+    async def find_by_group_id(
+        self,
+        group_id: int,
+        parse_dates: bool = False
+    ) -> Optional[Dict[str, Any]]:
         """
         Find subscription by group ID.
         
         Args:
             group_id: Telegram group ID
+            parse_dates: Return DATE_COLUMNS as datetime instead of ISO strings
             
         Returns:
             Subscription data dictionary or None
@@ -63,7 +144,46 @@ class SubscriptionRepository(BaseRepository):
             WHERE group_id = ?
         """
         
-        return await self.execute_query(query, (group_id,), fetch_one=True)
+        return await self.execute_query(
+            query,
+            (group_id,),
+            fetch_one=True,
+            row_factory=self._row_with_dates if parse_dates else None
+        )
+    
+    async def find_by_group_ids(
+        self,
+        group_ids: List[int],
+        parse_dates: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Find subscriptions for several groups, IN_CHUNK_SIZE ids per query.
+        
+        Args:
+            group_ids: Telegram group IDs
+            parse_dates: Return DATE_COLUMNS as datetime instead of ISO strings
+            
+        Returns:
+            Subscription rows for the groups that have one
+        """
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(group_ids), self.IN_CHUNK_SIZE):
+            chunk = group_ids[start:start + self.IN_CHUNK_SIZE]
+            query = f"""
+                SELECT subscription_id, group_id, subscription_status,
+                       trial_start_date, trial_end_date, subscription_start_date,
+                       subscription_end_date, next_billing_date, grace_period_end,
+                       created_at, updated_at
+                FROM subscriptions
+                WHERE group_id IN ({', '.join('?' * len(chunk))})
+            """
+            rows += await self.execute_query(
+                query,
+                tuple(chunk),
+                fetch_all=True,
+                row_factory=self._row_with_dates if parse_dates else None
+            ) or []
+        return rows
     
     async def find_all(self) -> List[Dict[str, Any]]:
         """
@@ -127,16 +247,15 @@ class SubscriptionRepository(BaseRepository):
             self.logger.error(f"Failed to create subscription: {e}")
             return None
     
-    async def update(self, subscription_id: int, data: Dict[str, Any]) -> bool:
+    def _build_set_clause(self, data: Dict[str, Any]) -> Optional[Tuple[str, list]]:
         """
-        Update subscription data.
+        Build the SET clause for a subscription update.
         
         Args:
-            subscription_id: Subscription ID
             data: Dictionary of fields to update
             
         Returns:
-            True if successful
+            (set clause, values) tuple, or None if no allowed field is present
         """
         fields = []
         values = []
@@ -153,23 +272,142 @@ class SubscriptionRepository(BaseRepository):
                 values.append(value)
         
         if not fields:
-            return False
+            return None
         
         # Always update updated_at
         fields.append("updated_at = ?")
         values.append(datetime.now().isoformat())
         
-        query = f"UPDATE subscriptions SET {', '.join(fields)} WHERE subscription_id = ?"
-        values.append(subscription_id)
+        return ', '.join(fields), values
+    
+    def _build_update(
+        self,
+        subscription_id: int,
+        data: Dict[str, Any]
+    ) -> Optional[Tuple[str, tuple]]:
+        """
+        Build the UPDATE statement for a subscription.
+        
+        Args:
+            subscription_id: Subscription ID
+            data: Dictionary of fields to update
+            
+        Returns:
+            (query, params) tuple, or None if no allowed field is present
+        """
+        set_clause = self._build_set_clause(data)
+        if set_clause is None:
+            return None
+        
+        fields, values = set_clause
+        query = f"UPDATE subscriptions SET {fields} WHERE subscription_id = ?"
+        return query, (*values, subscription_id)
+    
+    async def update(self, subscription_id: int, data: Dict[str, Any]) -> bool:
+        """
+        Update subscription data.
+        
+        Args:
+            subscription_id: Subscription ID
+            data: Dictionary of fields to update
+            
+        Returns:
+            True if successful
+        """
+        statement = self._build_update(subscription_id, data)
+        if statement is None:
+            return False
         
         try:
-            await self.execute_query(query, tuple(values))
+            await self.execute_query(*statement)
             self.logger.info(f"Updated subscription: {subscription_id}")
             return True
         except Exception as e:
             self.logger.error(f"Failed to update subscription {subscription_id}: {e}")
             return False
     
+    async def update_all(self, subscription_ids: List[int], data: Dict[str, Any]) -> bool:
+        """
+        Apply the same update to several subscriptions.
+        
+        Issues one "UPDATE ... WHERE subscription_id IN (...)" per
+        IN_CHUNK_SIZE ids, all in a single transaction.
+        
+        Args:
+            subscription_ids: Subscription IDs
+            data: Dictionary of fields to update
+            
+        Returns:
+            True if successful
+        """
+        set_clause = self._build_set_clause(data)
+        if set_clause is None or not subscription_ids:
+            return False
+        
+        fields, values = set_clause
+        operations = []
+        for start in range(0, len(subscription_ids), self.IN_CHUNK_SIZE):
+            chunk = subscription_ids[start:start + self.IN_CHUNK_SIZE]
+            query = (
+                f"UPDATE subscriptions SET {fields} "
+                f"WHERE subscription_id IN ({', '.join('?' * len(chunk))})"
+            )
+            operations.append((query, (*values, *chunk)))
+        
+        if await self.transaction(operations):
+            self.logger.info(f"Updated {len(subscription_ids)} subscriptions")
+            return True
+        return False
+    
+    async def activate_and_log(
+        self,
+        subscription_id: int,
+        group_id: int,
+        data: Dict[str, Any],
+        event_data: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Activate a subscription, re-enable its group and log the event atomically.
+        
+        Runs the subscription UPDATE, the group UPDATE and the
+        'subscription_activated' event INSERT in one transaction.
+        
+        Args:
+            subscription_id: Subscription ID
+            group_id: Telegram group ID
+            data: Subscription fields to update
+            event_data: Additional event data
+            
+        Returns:
+            True if all three writes were committed
+        """
+        import json
+        
+        statement = self._build_update(subscription_id, data)
+        if statement is None:
+            return False
+        
+        now = datetime.now().isoformat()
+        operations = [
+            statement,
+            (
+                "UPDATE groups SET subscription_status = ?, is_active = ? WHERE group_id = ?",
+                ('active', 1, group_id)
+            ),
+            (
+                self._INSERT_EVENT,
+                (
+                    subscription_id, group_id, 'subscription_activated',
+                    json.dumps(event_data) if event_data else None, now
+                )
+            )
+        ]
+        
+        if await self.transaction(operations):
+            self.logger.info(f"Activated subscription: {subscription_id}")
+            return True
+        return False
+    
     async def delete(self, subscription_id: int) -> bool:
         """
         Delete subscription.
@@ -270,9 +508,7 @@ class SubscriptionRepository(BaseRepository):
             True if successful
         """
         # Generate fingerprint
-        fingerprint = hashlib.sha256(
-            f"{group_id}:{group_title}".encode()
-        ).hexdigest()
+        fingerprint = trial_fingerprint(group_id, group_title)
         
         query = """
             INSERT INTO trial_abuse_tracking (
@@ -334,12 +570,65 @@ class SubscriptionRepository(BaseRepository):
         
         return await self.execute_query(query, (creator_user_id,), fetch_all=True)
     
+    async def iter_tracked_trials(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the fingerprint and creator of every tracked trial.
+        
+        Yields:
+            Rows with group_title_hash and creator_user_id
+        """
+        query = "SELECT group_title_hash, creator_user_id FROM trial_abuse_tracking"
+        async for row in self.iter_query(query):
+            yield row
+    
+    async def find_trial_abuse_signals(
+        self,
+        fingerprints: List[str],
+        creator_user_id: int
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize trials matching any group fingerprint or a creator in one query.
+        
+        Only the aggregates the abuse rules need are returned, not the rows.
+        
+        Args:
+            fingerprints: Group fingerprint hashes (current and legacy)
+            creator_user_id: User ID
+            
+        Returns:
+            Dictionary with 'fingerprint' and 'creator' entries, each holding
+            'last_started_at' (latest trial_started_at or None) and
+            'trial_count'
+        """
+        query = f"""
+            SELECT 'fingerprint' AS source, MAX(trial_started_at) AS last_started_at,
+                   COUNT(*) AS trial_count
+            FROM trial_abuse_tracking
+            WHERE group_title_hash IN ({', '.join('?' * len(fingerprints))})
+            UNION ALL
+            SELECT 'creator' AS source, MAX(trial_started_at) AS last_started_at,
+                   COUNT(*) AS trial_count
+            FROM trial_abuse_tracking
+            WHERE creator_user_id = ?
+        """
+        
+        rows = await self.execute_query(query, (*fingerprints, creator_user_id), fetch_all=True)
+        
+        signals: Dict[str, Dict[str, Any]] = {
+            source: {'last_started_at': None, 'trial_count': 0}
+            for source in ('fingerprint', 'creator')
+        }
+        for row in rows or []:
+            signals[row.pop('source')] = row
+        return signals
+    
     async def log_event(
         self,
         subscription_id: int,
         group_id: int,
         event_type: str,
-        event_data: Optional[Dict[str, Any]] = None
+        event_data: Optional[Dict[str, Any]] = None,
+        event_data_json: Optional[str] = None
     ) -> bool:
         """
         Log subscription event.
@@ -349,28 +638,56 @@ class SubscriptionRepository(BaseRepository):
             group_id: Group ID
             event_type: Type of event
             event_data: Additional event data
+            event_data_json: Pre-serialized event data (skips re-encoding)
             
         Returns:
             True if successful
         """
         import json
         
-        query = """
-            INSERT INTO subscription_events (
-                subscription_id, group_id, event_type, event_data, created_at
-            ) VALUES (?, ?, ?, ?, ?)
-        """
-        
         now = datetime.now().isoformat()
-        data_json = json.dumps(event_data) if event_data else None
+        if event_data_json is not None:
+            data_json = event_data_json
+        else:
+            data_json = json.dumps(event_data) if event_data else None
         
         try:
             await self.execute_query(
-                query,
+                self._INSERT_EVENT,
                 (subscription_id, group_id, event_type, data_json, now)
             )
             return True
         except Exception as e:
             self.logger.error(f"Failed to log event: {e}")
             return False
-
+    
+    async def log_events(
+        self,
+        events: List[Tuple[int, int, str, Optional[Dict[str, Any]]]]
+    ) -> int:
+        """
+        Log several subscription events in one batch.
+        
+        Args:
+            events: List of (subscription_id, group_id, event_type, event_data)
+            
+        Returns:
+            Number of events logged
+        """
+        import json
+        
+        if not events:
+            return 0
+        
+        now = datetime.now().isoformat()
+        params_list = [
+            (subscription_id, group_id, event_type, json.dumps(event_data) if event_data else None, now)
+            for subscription_id, group_id, event_type, event_data in events
+        ]
+        
+        try:
+            await self.execute_many(self._INSERT_EVENT, params_list)
+            return len(params_list)
+        except Exception as e:
+            self.logger.error(f"Failed to log events: {e}")
+            return 0
@@ -4,7 +4,7 @@ Handles all user-related database operations with connection pooling.
 """
 
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from repositories.base_repository import BaseRepository
 
@@ -166,6 +166,26 @@ class UserRepository(BaseRepository):
         now = datetime.now().isoformat()
         return await self.update(chat_id, {"last_active": now})
     
+    async def bulk_update_last_active(self, updates: Dict[int, float]) -> int:
+        """
+        Write many last active timestamps in one batch.
+        
+        Args:
+            updates: Mapping of chat_id -> epoch timestamp of last activity
+            
+        Returns:
+            Number of users updated
+        """
+        if not updates:
+            return 0
+        
+        query = "UPDATE users SET last_active = ? WHERE chat_id = ?"
+        params_list = [
+            (datetime.fromtimestamp(ts).isoformat(), chat_id)
+            for chat_id, ts in updates.items()
+        ]
+        return await self.execute_many(query, params_list)
+    
     async def get_by_trader_type(self, trader_type: str) -> List[Dict[str, Any]]:
         """
         Get all users of a specific trader type.
@@ -225,27 +245,32 @@ class UserRepository(BaseRepository):
         user = await self.find_by_id(chat_id)
         return user is not None
     
-    async def get_or_create(self, chat_id: int, trader_type: str = "investor") -> Dict[str, Any]:
+    async def get_or_create(
+        self,
+        chat_id: int,
+        trader_type: str = "investor"
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
         """
         Get existing user or create new one.
         
+        last_active is not updated for existing users; callers record
+        activity through UserService's write-behind buffer.
+        
         Args:
             chat_id: Telegram chat ID
             trader_type: Default trader type for new users
             
         Returns:
-            User data dictionary
+            Tuple of (user data dictionary, whether the user was created)
         """
         user = await self.find_by_id(chat_id)
         
         if user:
-            # Update last active
-            await self.update_last_active(chat_id)
-            return user
+            return user, False
         
         # Create new user
-        await self.create(chat_id, trader_type)
-        return await self.find_by_id(chat_id)
+        created = await self.create(chat_id, trader_type)
+        return await self.find_by_id(chat_id), created
     
     async def create_many(self, users: List[Dict[str, Any]]) -> int:
         """
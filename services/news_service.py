@@ -4,10 +4,11 @@ Handles news fetching, AI analysis, and caching with circuit breaker protection.
 """
 
 import logging
+import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from core.cache import Cache
+from core.cache import Cache, SLRUCache
 from core.circuit_breaker import CircuitBreaker, CircuitBreakerError
 from core.metrics import MetricsCollector
 from repositories.news_repository import NewsRepository
@@ -28,6 +29,8 @@ class NewsService:
     - Performance metrics tracking
     """
     
+    ANALYSIS_CACHE_TTL = 3600  # Seconds an AI analysis is reused from memory
+    
     def __init__(
         self,
         news_repo: NewsRepository,
@@ -58,6 +61,10 @@ class NewsService:
         self.gemini_cb = gemini_circuit_breaker
         self.news_api_cb = news_api_circuit_breaker
         
+        # In-process L1 for AI analyses as (monotonic deadline, analysis);
+        # SLRU so batch scans over old articles don't flush the hot working set
+        self._analysis_lru = SLRUCache(probation=128, protected=768)
+        
         logger.info("NewsService initialized")
     
     async def fetch_trending_news(self, limit: int = 5) -> List[Dict[str, Any]]:
@@ -107,6 +114,10 @@ class NewsService:
         """Synchronous wrapper for news fetching."""
         try:
             return self.news_fetcher.fetch_trending_news(limit=limit)
+        except (OSError, ValueError) as e:
+            # Expected transient failures (timeouts, HTTP, bad JSON): skip traceback
+            logger.warning("Error in _fetch_trending_sync: %s", e)
+            return []
         except Exception as e:
             logger.error(f"Error in _fetch_trending_sync: {e}", exc_info=True)
             return []
@@ -162,6 +173,9 @@ class NewsService:
         """Synchronous wrapper for finance news fetching."""
         try:
             return self.news_fetcher.fetch_finance_news(query=query, limit=limit)
+        except (OSError, ValueError) as e:
+            logger.warning("Error in _fetch_finance_sync: %s", e)
+            return []
         except Exception as e:
             logger.error(f"Error in _fetch_finance_sync: {e}", exc_info=True)
             return []
@@ -171,7 +185,8 @@ class NewsService:
         title: str,
         summary: str,
         trader_type: str = "investor",
-        url: Optional[str] = None
+        url: Optional[str] = None,
+        cache_stats: Optional[Dict[str, int]] = None
     ) -> str:
         """
         Analyze article with AI, using cache and circuit breaker.
@@ -181,6 +196,8 @@ class NewsService:
             summary: Article summary
             trader_type: Type of trader (scalper, day_trader, swing_trader, investor)
             url: Article URL for caching
+            cache_stats: Optional local counter dict; when given, cache hit/miss
+                counts are accumulated here for the caller to flush in one batch
 
         Returns:
             AI analysis text for the specific trader type
@@ -189,19 +206,25 @@ class NewsService:
         if url:
             cached_analysis = await self.news_repo.get_or_none(url, trader_type)
             if cached_analysis:
-                self.metrics.inc_counter("cache_hits_total")
+                self._count_cache_event("cache_hits_total", cache_stats)
                 logger.debug(f"Database cache hit for article: {url} (trader_type: {trader_type})")
                 return cached_analysis
 
-        # Check memory cache
+        # Check in-process cache, then shared memory cache
         cache_key = f"ai_analysis:{trader_type}:{title[:50]}"
+        entry = self._analysis_lru.get(cache_key)
+        if entry and entry[0] > time.monotonic():
+            self._count_cache_event("cache_hits_total", cache_stats)
+            return entry[1]
+
         cached = await self.cache.get(cache_key)
         if cached:
-            self.metrics.inc_counter("cache_hits_total")
+            self._remember_analysis(cache_key, cached)
+            self._count_cache_event("cache_hits_total", cache_stats)
             logger.debug(f"Memory cache hit for article: {title[:50]} (trader_type: {trader_type})")
             return cached
 
-        self.metrics.inc_counter("cache_misses_total")
+        self._count_cache_event("cache_misses_total", cache_stats)
 
         # Analyze with AI using circuit breaker
         try:
@@ -218,7 +241,8 @@ class NewsService:
             logger.info(f"✅ Successfully received AI analysis for trader_type: {trader_type}")
 
             # Cache in memory
-            await self.cache.set(cache_key, analysis, ttl=3600)  # 1 hour
+            self._remember_analysis(cache_key, analysis)
+            await self.cache.set(cache_key, analysis, ttl=self.ANALYSIS_CACHE_TTL)
 
             # Cache in database if URL provided
             if url:
@@ -236,6 +260,9 @@ class NewsService:
         except CircuitBreakerError as e:
             logger.error(f"Gemini API circuit breaker open: {e}")
             return self._fallback_analysis(title, summary)
+        except (OSError, ValueError) as e:
+            logger.warning("Error analyzing article: %s", e)
+            return self._fallback_analysis(title, summary)
         except Exception as e:
             logger.error(f"Error analyzing article: {e}", exc_info=True)
             return self._fallback_analysis(title, summary)
@@ -269,6 +296,17 @@ class NewsService:
 
         return str(result)
     
+    def _count_cache_event(self, name: str, cache_stats: Optional[Dict[str, int]]):
+        """Record a cache event directly or into a caller-owned batch."""
+        if cache_stats is None:
+            self.metrics.inc_counter(name)
+        else:
+            cache_stats[name] = cache_stats.get(name, 0) + 1
+    
+    def _remember_analysis(self, cache_key: str, analysis: str):
+        """Keep an analysis in the in-process cache for ANALYSIS_CACHE_TTL seconds."""
+        self._analysis_lru.set(cache_key, (time.monotonic() + self.ANALYSIS_CACHE_TTL, analysis))
+    
     def _fallback_analysis(self, title: str, summary: str) -> str:
         """Fallback analysis when AI is unavailable."""
         return f"📰 {title}\n\n{summary}\n\n⚠️ AI analysis temporarily unavailable."
@@ -293,12 +331,14 @@ class NewsService:
         
         # Add AI analysis to each article
         analyzed_articles = []
+        cache_stats: Dict[str, int] = {}
         for article in articles:
             analysis = await self.analyze_article(
                 title=article.get('title', ''),
                 summary=article.get('description', ''),
                 trader_type=trader_type,
-                url=article.get('url')
+                url=article.get('url'),
+                cache_stats=cache_stats
             )
             
             analyzed_articles.append({
@@ -307,6 +347,9 @@ class NewsService:
                 'trader_type': trader_type
             })
         
+        for name, count in cache_stats.items():
+            self.metrics.inc_counter(name, count)
+        
         return analyzed_articles
     
     async def cleanup_expired_cache(self) -> int:
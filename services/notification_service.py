@@ -12,6 +12,120 @@ from core.metrics import MetricsCollector
 
 logger = logging.getLogger(__name__)
 
+# Trial warning (emoji, urgency) indexed by days remaining; anything beyond
+# the table falls back to a plain reminder.
+_TRIAL_URGENCY = (
+    ("🚨", "⚠️ <b>URGENT</b>"),
+    ("🚨", "⚠️ <b>URGENT</b>"),
+    ("⏰", "⚠️ <b>Important</b>"),
+    ("⏰", "⚠️ <b>Important</b>"),
+)
+_TRIAL_URGENCY_DEFAULT = ("📅", "📢 <b>Reminder</b>")
+
+# Message templates, built once at import and filled with str.format; dates
+# are formatted through their format spec
+_TRIAL_STARTED_TEMPLATE = (
+    "🎉 <b>Welcome to AI Market Insight Bot!</b>\n\n"
+    "✅ Your {trial_days}-day free trial has started!\n\n"
+    "📅 <b>Trial Period:</b>\n"
+    "   • Starts: {today:%B %d, %Y}\n"
+    "   • Ends: {trial_end_date:%B %d, %Y}\n\n"
+    "🚀 <b>What You Get:</b>\n"
+    "   • Real-time crypto news alerts 24/7\n"
+    "   • AI-powered market impact analysis\n"
+    "   • Hot news posted immediately\n"
+    "   • Customized for your trading style\n\n"
+    "💡 <b>Commands:</b>\n"
+    "   • /subscription - Check your trial status\n"
+    "   • /renew - View subscription plans\n\n"
+    "Enjoy your trial! 🎊"
+)
+
+_TRIAL_WARNING_TEMPLATE = (
+    "{urgency}\n\n"
+    "{emoji} Your free trial expires in <b>{days_remaining} day{plural}</b>!\n\n"
+    "📅 <b>Trial Ends:</b> {trial_end_date:%B %d, %Y at %I:%M %p UTC}\n\n"
+    "💰 <b>Continue Receiving News:</b>\n"
+    "   • Subscribe for just $15/month\n"
+    "   • Pay with cryptocurrency (BTC, ETH, USDT, etc.)\n"
+    "   • Instant activation after payment\n\n"
+    "🔄 <b>Renew Now:</b>\n"
+    "   Use /renew to see payment options\n\n"
+    "❓ Questions? Contact support."
+)
+
+_TRIAL_EXPIRED_TEMPLATE = (
+    "⏰ <b>Trial Period Expired</b>\n\n"
+    "Your {grace_period_days}-day free trial has ended.\n\n"
+    "🎁 <b>Grace Period Active:</b>\n"
+    "   • You have {grace_period_days} days to renew\n"
+    "   • News posting will continue during grace period\n"
+    "   • Grace period ends: {grace_period_end:%B %d, %Y}\n\n"
+    "💰 <b>Subscribe Now:</b>\n"
+    "   • Only $15/month\n"
+    "   • Pay with crypto (BTC, ETH, USDT, USDC, BNB, TRX)\n"
+    "   • Instant activation\n\n"
+    "🔄 <b>Renew:</b> Use /renew command\n\n"
+    "⚠️ After grace period, news posting will stop until you subscribe."
+)
+
+_GRACE_PERIOD_WARNING_TEMPLATE = (
+    "🚨 <b>URGENT: Grace Period Ending Soon</b>\n\n"
+    "⏰ Your grace period expires in <b>{days_remaining} day{plural}</b>!\n\n"
+    "📅 <b>Grace Period Ends:</b> {grace_period_end:%B %d, %Y at %I:%M %p UTC}\n\n"
+    "⚠️ <b>What Happens Next:</b>\n"
+    "   • News posting will STOP after grace period\n"
+    "   • You'll need to subscribe to resume service\n\n"
+    "💰 <b>Subscribe Now - $15/month:</b>\n"
+    "   • Instant activation\n"
+    "   • Pay with cryptocurrency\n"
+    "   • Uninterrupted news delivery\n\n"
+    "🔄 <b>Renew:</b> Use /renew command immediately\n\n"
+    "Don't miss out on critical market updates!"
+)
+
+_SUBSCRIPTION_EXPIRED_MESSAGE = (
+    "❌ <b>Subscription Expired</b>\n\n"
+    "Your grace period has ended and news posting has been stopped.\n\n"
+    "💰 <b>Reactivate Your Subscription:</b>\n"
+    "   • Only $15/month\n"
+    "   • Pay with cryptocurrency\n"
+    "   • Instant reactivation\n\n"
+    "🔄 <b>Subscribe:</b> Use /renew command\n\n"
+    "We'll be here when you're ready to resume! 👋"
+)
+
+_PAYMENT_RECEIVED_TEMPLATE = (
+    "✅ <b>Payment Received!</b>\n\n"
+    "🎉 Your payment has been confirmed!\n\n"
+    "💰 <b>Payment Details:</b>\n"
+    "   • Amount: ${amount_usd:.2f} USD\n"
+    "   • Currency: {currency}\n"
+    "   • Status: Confirmed\n\n"
+    "⏳ <b>Activation:</b>\n"
+    "   Your subscription is being activated...\n"
+    "   This usually takes a few seconds.\n\n"
+    "Thank you for subscribing! 🙏"
+)
+
+_SUBSCRIPTION_ACTIVATED_TEMPLATE = (
+    "🎊 <b>Subscription Activated!</b>\n\n"
+    "✅ Your subscription is now active!\n\n"
+    "📅 <b>Subscription Details:</b>\n"
+    "   • Status: Active\n"
+    "   • Valid Until: {subscription_end_date:%B %d, %Y}\n"
+    "   • Next Billing: {next_billing_date:%B %d, %Y}\n\n"
+    "🚀 <b>What's Included:</b>\n"
+    "   • Real-time crypto news 24/7\n"
+    "   • AI-powered market analysis\n"
+    "   • Hot news posted immediately\n"
+    "   • Unlimited news updates\n\n"
+    "💡 <b>Commands:</b>\n"
+    "   • /subscription - Check status\n"
+    "   • /renew - Renew subscription\n\n"
+    "Enjoy your premium service! 🎉"
+)
+
 
 class NotificationService:
     """
@@ -31,14 +145,33 @@ class NotificationService:
         metrics: Optional[MetricsCollector] = None
     ):
         """Initialize notification service."""
-        self.bot = bot
+        self.bot = None
         self.metrics = metrics or MetricsCollector()
+        
+        # Bound to the real sender once a bot is available, so the hot path
+        # does not re-check for a missing bot on every message.
+        self.send_notification = self._send_notification_unset
+        if bot:
+            self.set_bot(bot)
     
     def set_bot(self, bot: Bot):
         """Set the bot instance."""
         self.bot = bot
+        self.send_notification = (
+            self._send_notification_impl if bot else self._send_notification_unset
+        )
     
-    async def send_notification(
+    async def _send_notification_unset(
+        self,
+        group_id: int,
+        message: str,
+        parse_mode: str = "HTML"
+    ) -> bool:
+        """Fallback sender used until a bot instance is set."""
+        logger.error("Bot instance not set in NotificationService")
+        return False
+    
+    async def _send_notification_impl(
         self,
         group_id: int,
         message: str,
@@ -47,6 +180,8 @@ class NotificationService:
         """
         Send a notification message to a group.
         
+        Exposed as ``send_notification`` once a bot has been set.
+        
         Args:
             group_id: Telegram group ID
             message: Message text
@@ -55,10 +190,6 @@ class NotificationService:
         Returns:
             True if sent successfully, False otherwise
         """
-        if not self.bot:
-            logger.error("Bot instance not set in NotificationService")
-            return False
-        
         try:
             await self.bot.send_message(
                 chat_id=group_id,
@@ -97,21 +228,10 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        message = (
-            f"🎉 <b>Welcome to AI Market Insight Bot!</b>\n\n"
-            f"✅ Your {trial_days}-day free trial has started!\n\n"
-            f"📅 <b>Trial Period:</b>\n"
-            f"   • Starts: {datetime.now().strftime('%B %d, %Y')}\n"
-            f"   • Ends: {trial_end_date.strftime('%B %d, %Y')}\n\n"
-            f"🚀 <b>What You Get:</b>\n"
-            f"   • Real-time crypto news alerts 24/7\n"
-            f"   • AI-powered market impact analysis\n"
-            f"   • Hot news posted immediately\n"
-            f"   • Customized for your trading style\n\n"
-            f"💡 <b>Commands:</b>\n"
-            f"   • /subscription - Check your trial status\n"
-            f"   • /renew - View subscription plans\n\n"
-            f"Enjoy your trial! 🎊"
+        message = _TRIAL_STARTED_TEMPLATE.format(
+            trial_days=trial_days,
+            today=datetime.now(),
+            trial_end_date=trial_end_date
         )
         
         success = await self.send_notification(group_id, message)
@@ -136,27 +256,19 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        if days_remaining <= 1:
-            urgency = "⚠️ <b>URGENT</b>"
-            emoji = "🚨"
-        elif days_remaining <= 3:
-            urgency = "⚠️ <b>Important</b>"
-            emoji = "⏰"
-        else:
-            urgency = "📢 <b>Reminder</b>"
-            emoji = "📅"
+        emoji, urgency = (
+            _TRIAL_URGENCY[max(days_remaining, 0)]
+            if days_remaining < len(_TRIAL_URGENCY)
+            else _TRIAL_URGENCY_DEFAULT
+        )
         
-        message = (
-            f"{urgency}\n\n"
-            f"{emoji} Your free trial expires in <b>{days_remaining} day{'s' if days_remaining != 1 else ''}</b>!\n\n"
-            f"📅 <b>Trial Ends:</b> {trial_end_date.strftime('%B %d, %Y at %I:%M %p UTC')}\n\n"
-            f"💰 <b>Continue Receiving News:</b>\n"
-            f"   • Subscribe for just $15/month\n"
-            f"   • Pay with cryptocurrency (BTC, ETH, USDT, etc.)\n"
-            f"   • Instant activation after payment\n\n"
-            f"🔄 <b>Renew Now:</b>\n"
-            f"   Use /renew to see payment options\n\n"
-            f"❓ Questions? Contact support."
+        plural = "" if days_remaining == 1 else "s"
+        message = _TRIAL_WARNING_TEMPLATE.format(
+            urgency=urgency,
+            emoji=emoji,
+            days_remaining=days_remaining,
+            plural=plural,
+            trial_end_date=trial_end_date
         )
         
         success = await self.send_notification(group_id, message)
@@ -181,19 +293,9 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        message = (
-            f"⏰ <b>Trial Period Expired</b>\n\n"
-            f"Your {grace_period_days}-day free trial has ended.\n\n"
-            f"🎁 <b>Grace Period Active:</b>\n"
-            f"   • You have {grace_period_days} days to renew\n"
-            f"   • News posting will continue during grace period\n"
-            f"   • Grace period ends: {grace_period_end.strftime('%B %d, %Y')}\n\n"
-            f"💰 <b>Subscribe Now:</b>\n"
-            f"   • Only $15/month\n"
-            f"   • Pay with crypto (BTC, ETH, USDT, USDC, BNB, TRX)\n"
-            f"   • Instant activation\n\n"
-            f"🔄 <b>Renew:</b> Use /renew command\n\n"
-            f"⚠️ After grace period, news posting will stop until you subscribe."
+        message = _TRIAL_EXPIRED_TEMPLATE.format(
+            grace_period_days=grace_period_days,
+            grace_period_end=grace_period_end
         )
         
         success = await self.send_notification(group_id, message)
@@ -218,19 +320,11 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        message = (
-            f"🚨 <b>URGENT: Grace Period Ending Soon</b>\n\n"
-            f"⏰ Your grace period expires in <b>{days_remaining} day{'s' if days_remaining != 1 else ''}</b>!\n\n"
-            f"📅 <b>Grace Period Ends:</b> {grace_period_end.strftime('%B %d, %Y at %I:%M %p UTC')}\n\n"
-            f"⚠️ <b>What Happens Next:</b>\n"
-            f"   • News posting will STOP after grace period\n"
-            f"   • You'll need to subscribe to resume service\n\n"
-            f"💰 <b>Subscribe Now - $15/month:</b>\n"
-            f"   • Instant activation\n"
-            f"   • Pay with cryptocurrency\n"
-            f"   • Uninterrupted news delivery\n\n"
-            f"🔄 <b>Renew:</b> Use /renew command immediately\n\n"
-            f"Don't miss out on critical market updates!"
+        plural = "" if days_remaining == 1 else "s"
+        message = _GRACE_PERIOD_WARNING_TEMPLATE.format(
+            days_remaining=days_remaining,
+            plural=plural,
+            grace_period_end=grace_period_end
         )
         
         success = await self.send_notification(group_id, message)
@@ -251,16 +345,7 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        message = (
-            f"❌ <b>Subscription Expired</b>\n\n"
-            f"Your grace period has ended and news posting has been stopped.\n\n"
-            f"💰 <b>Reactivate Your Subscription:</b>\n"
-            f"   • Only $15/month\n"
-            f"   • Pay with cryptocurrency\n"
-            f"   • Instant reactivation\n\n"
-            f"🔄 <b>Subscribe:</b> Use /renew command\n\n"
-            f"We'll be here when you're ready to resume! 👋"
-        )
+        message = _SUBSCRIPTION_EXPIRED_MESSAGE
         
         success = await self.send_notification(group_id, message)
         if success:
@@ -284,17 +369,9 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        message = (
-            f"✅ <b>Payment Received!</b>\n\n"
-            f"🎉 Your payment has been confirmed!\n\n"
-            f"💰 <b>Payment Details:</b>\n"
-            f"   • Amount: ${amount_usd:.2f} USD\n"
-            f"   • Currency: {currency.upper()}\n"
-            f"   • Status: Confirmed\n\n"
-            f"⏳ <b>Activation:</b>\n"
-            f"   Your subscription is being activated...\n"
-            f"   This usually takes a few seconds.\n\n"
-            f"Thank you for subscribing! 🙏"
+        message = _PAYMENT_RECEIVED_TEMPLATE.format(
+            amount_usd=amount_usd,
+            currency=currency.upper()
         )
         
         success = await self.send_notification(group_id, message)
@@ -319,22 +396,9 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        message = (
-            f"🎊 <b>Subscription Activated!</b>\n\n"
-            f"✅ Your subscription is now active!\n\n"
-            f"📅 <b>Subscription Details:</b>\n"
-            f"   • Status: Active\n"
-            f"   • Valid Until: {subscription_end_date.strftime('%B %d, %Y')}\n"
-            f"   • Next Billing: {next_billing_date.strftime('%B %d, %Y')}\n\n"
-            f"🚀 <b>What's Included:</b>\n"
-            f"   • Real-time crypto news 24/7\n"
-            f"   • AI-powered market analysis\n"
-            f"   • Hot news posted immediately\n"
-            f"   • Unlimited news updates\n\n"
-            f"💡 <b>Commands:</b>\n"
-            f"   • /subscription - Check status\n"
-            f"   • /renew - Renew subscription\n\n"
-            f"Enjoy your premium service! 🎉"
+        message = _SUBSCRIPTION_ACTIVATED_TEMPLATE.format(
+            subscription_end_date=subscription_end_date,
+            next_billing_date=next_billing_date
         )
         
         success = await self.send_notification(group_id, message)
@@ -3,12 +3,15 @@ Payment service for AI Market Insight Bot.
 Handles cryptocurrency payment processing via NOWPayments API.
 """
 
+import asyncio
 import logging
+import time
 import aiohttp
 import hmac
 import hashlib
 import json
-from typing import Optional, Dict, Any, List
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, Union
 from datetime import datetime, timedelta
 
 from repositories.payment_repository import PaymentRepository
@@ -18,6 +21,39 @@ import config
 
 logger = logging.getLogger(__name__)
 
+# NOWPayments statuses that mark a payment as confirmed
+_CONFIRMED_STATES = frozenset({'finished', 'confirmed'})
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON, using orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(data: Any) -> str:
+    """Serialize JSON compactly, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'))
+
+
+def json_dumps_bytes(data: Any) -> bytes:
+    """Serialize JSON compactly to bytes for request bodies."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+# Content-Type for pre-serialized JSON request bodies
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 class PaymentService:
     """
@@ -31,6 +67,12 @@ class PaymentService:
     - Payment confirmation processing
     """
     
+    # Number of recently processed webhook events remembered for deduplication
+    WEBHOOK_DEDUP_SIZE = 4096
+    
+    # Seconds the NOWPayments currency list is reused before refetching
+    CURRENCIES_TTL = 3600.0
+    
     def __init__(
         self,
         payment_repo: PaymentRepository,
@@ -53,10 +95,70 @@ class PaymentService:
         self.api_key = config.NOWPAYMENTS_API_KEY
         self.ipn_secret = config.NOWPAYMENTS_IPN_SECRET
         self.api_url = config.NOWPAYMENTS_API_URL
-        self.supported_currencies = config.SUPPORTED_CURRENCIES
+        
+        # Endpoint URLs built once
+        self._url_invoice = f"{self.api_url}/invoice"
+        self._url_invoice_fmt = self.api_url + "/invoice/{}"
+        self._url_currencies = f"{self.api_url}/currencies"
+        # Ordered list for display fallbacks; frozenset for O(1) membership
+        self.supported_currency_list = [c.lower() for c in config.SUPPORTED_CURRENCIES]
+        self.supported_currencies = frozenset(self.supported_currency_list)
+        
+        # Pre-keyed HMAC prototype; copied per webhook to skip key setup
+        self._ipn_secret_bytes = self.ipn_secret.encode('utf-8') if self.ipn_secret else None
+        self._hmac_proto = (
+            hmac.new(self._ipn_secret_bytes, b'', hashlib.sha512)
+            if self._ipn_secret_bytes else None
+        )
+        
+        # Recently processed (invoice_id, status, confirmations) webhook keys
+        self._processed_webhooks: "OrderedDict[str, None]" = OrderedDict()
+        
+        # Cached (fetched_at, currencies) with a lock collapsing concurrent refreshes
+        self._currencies_cache: Optional[Tuple[float, List[str]]] = None
+        self._currencies_lock = asyncio.Lock()
+        
+        # Shared HTTP session (keep-alive connection pool to NOWPayments)
+        self._session: Optional[aiohttp.ClientSession] = None
         
         logger.info("PaymentService initialized")
     
+    async def connect(self):
+        """Open the shared NOWPayments HTTP session."""
+        if self._session is None or self._session.closed:
+            headers = {"x-api-key": self.api_key} if self.api_key else None
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=32,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=75
+                ),
+                timeout=aiohttp.ClientTimeout(total=15),
+                headers=headers
+            )
+            logger.info("PaymentService HTTP session opened")
+    
+    async def disconnect(self):
+        """Close the shared NOWPayments HTTP session."""
+        if self._session is not None:
+            if not self._session.closed:
+                await self._session.close()
+            self._session = None
+            logger.info("PaymentService HTTP session closed")
+    
+    async def __aenter__(self):
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared session, opening it lazily if needed."""
+        if self._session is None or self._session.closed:
+            await self.connect()
+        return self._session
+    
     async def create_invoice(
         self,
         subscription_id: int,
@@ -98,7 +200,7 @@ class PaymentService:
                 "price_amount": amount_usd,
                 "price_currency": "usd",
                 "pay_currency": currency.lower(),
-                "order_id": f"sub_{subscription_id}_{int(datetime.now().timestamp())}",
+                "order_id": f"sub_{subscription_id}_{int(time.time())}",
                 "order_description": description or f"Subscription for group {group_id}",
                 "ipn_callback_url": config.WEBHOOK_URL if config.WEBHOOK_URL else None,
                 "success_url": None,  # Can be set to a success page
@@ -106,23 +208,22 @@ class PaymentService:
             }
             
             # Create invoice via NOWPayments API
-            headers = {
-                "x-api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/invoice",
-                    headers=headers,
-                    json=invoice_data
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"NOWPayments API error: {response.status} - {error_text}")
-                        return None
-                    
-                    result = await response.json()
+            session = await self._get_session()
+            # Omit unset optional fields and serialize the body ourselves
+            body = json_dumps_bytes(
+                {k: v for k, v in invoice_data.items() if v is not None}
+            )
+            async with session.post(
+                self._url_invoice,
+                data=body,
+                headers=_JSON_HEADERS
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"NOWPayments API error: {response.status} - {error_text}")
+                    return None
+                
+                result = await response.json()
             
             # Create payment record in database
             payment = await self.payment_repo.create({
@@ -189,21 +290,16 @@ class PaymentService:
                 logger.error("NOWPayments API key not configured")
                 return None
             
-            headers = {
-                "x-api-key": self.api_key
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_url}/invoice/{invoice_id}",
-                    headers=headers
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"NOWPayments API error: {response.status} - {error_text}")
-                        return None
-                    
-                    result = await response.json()
+            session = await self._get_session()
+            async with session.get(
+                self._url_invoice_fmt.format(invoice_id)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"NOWPayments API error: {response.status} - {error_text}")
+                    return None
+                
+                result = await response.json()
             
             return result
             
@@ -213,14 +309,14 @@ class PaymentService:
     
     async def verify_webhook_signature(
         self,
-        payload: str,
+        payload: Union[bytes, str],
         signature: str
     ) -> bool:
         """
         Verify NOWPayments webhook signature.
 
         Args:
-            payload: Webhook payload (raw JSON string)
+            payload: Raw webhook body bytes (str accepted for compatibility)
             signature: HMAC signature from header
 
         Returns:
@@ -237,15 +333,22 @@ class PaymentService:
                     logger.warning("IPN secret not configured, skipping signature verification (DEVELOPMENT ONLY)")
                     return True
 
-            # Calculate expected signature
-            expected_signature = hmac.new(
-                self.ipn_secret.encode('utf-8'),
-                payload.encode('utf-8'),
-                hashlib.sha512
-            ).hexdigest()
+            # Decode the hex signature; SHA-512 digest length is public, so
+            # rejecting malformed or wrong-length input early is timing-safe
+            try:
+                signature_bytes = bytes.fromhex(signature)
+            except ValueError:
+                signature_bytes = b''
+
+            if len(signature_bytes) != self._hmac_proto.digest_size:
+                is_valid = False
+            else:
+                # Calculate expected signature
+                mac = self._hmac_proto.copy()
+                mac.update(payload if isinstance(payload, bytes) else payload.encode('utf-8'))
 
-            # Compare signatures (timing-safe comparison)
-            is_valid = hmac.compare_digest(signature, expected_signature)
+                # Compare raw digests (timing-safe comparison)
+                is_valid = hmac.compare_digest(signature_bytes, mac.digest())
 
             if not is_valid:
                 logger.warning("Invalid webhook signature")
@@ -257,6 +360,35 @@ class PaymentService:
             logger.error(f"Error verifying webhook signature: {e}", exc_info=True)
             return False
     
+    @staticmethod
+    def _webhook_key(webhook_data: Dict[str, Any]) -> str:
+        """Build the idempotency key for a webhook event."""
+        return (
+            f"nowpay:{webhook_data.get('invoice_id')}:"
+            f"{webhook_data.get('payment_status')}:"
+            f"{webhook_data.get('confirmations', 0)}"
+        )
+    
+    def is_duplicate_webhook(self, webhook_data: Dict[str, Any]) -> bool:
+        """
+        Check whether an identical webhook event was already processed.
+        
+        NOWPayments may re-deliver the same IPN several times.
+        
+        Args:
+            webhook_data: Webhook payload data
+            
+        Returns:
+            True if the event was already processed
+        """
+        return self._webhook_key(webhook_data) in self._processed_webhooks
+    
+    def _remember_webhook(self, webhook_data: Dict[str, Any]):
+        """Record a processed webhook event, evicting the oldest when full."""
+        self._processed_webhooks[self._webhook_key(webhook_data)] = None
+        if len(self._processed_webhooks) > self.WEBHOOK_DEDUP_SIZE:
+            self._processed_webhooks.popitem(last=False)
+    
     async def process_payment_webhook(self, webhook_data: Dict[str, Any]) -> bool:
         """
         Process payment webhook from NOWPayments.
@@ -282,26 +414,31 @@ class PaymentService:
                 logger.error(f"Payment not found for invoice: {invoice_id}")
                 return False
             
+            # Serialize once for both the payment record and the event log
+            payload_json = json_dumps(webhook_data)
+            
             # Update payment record
             update_data = {
                 'payment_status': payment_status,
                 'transaction_hash': webhook_data.get('payment_hash'),
                 'confirmations': webhook_data.get('confirmations', 0),
-                'webhook_data': json.dumps(webhook_data)
+                'webhook_data': payload_json
             }
             
             # If payment is confirmed, set confirmed_at
-            if payment_status in ['finished', 'confirmed']:
+            if payment_status in _CONFIRMED_STATES:
                 update_data['confirmed_at'] = datetime.now().isoformat()
             
-            await self.payment_repo.update(payment['payment_id'], update_data)
-            
-            # Log event
-            await self.subscription_repo.log_event(
-                payment['subscription_id'],
-                payment['group_id'],
-                f'payment_{payment_status}',
-                webhook_data
+            # Update payment and log event; the two writes are independent
+            await asyncio.gather(
+                self.payment_repo.update(payment['payment_id'], update_data),
+                self.subscription_repo.log_event(
+                    payment['subscription_id'],
+                    payment['group_id'],
+                    f'payment_{payment_status}',
+                    webhook_data,
+                    event_data_json=payload_json
+                )
             )
             
             # If payment is confirmed, activate subscription
@@ -311,6 +448,7 @@ class PaymentService:
                 logger.info(f"Payment confirmed for subscription {payment['subscription_id']}")
                 self.metrics.inc_counter("payments_confirmed")
             
+            self._remember_webhook(webhook_data)
             logger.info(f"Processed webhook for invoice {invoice_id}: {payment_status}")
             return True
             
@@ -322,33 +460,64 @@ class PaymentService:
         """
         Get list of available cryptocurrencies from NOWPayments.
         
+        The list changes rarely, so successful fetches are reused for
+        CURRENCIES_TTL seconds.
+        
         Returns:
             List of currency codes
         """
-        try:
-            if not self.api_key:
-                return self.supported_currencies
+        if not self.api_key:
+            return list(self.supported_currency_list)
+        
+        cached = self._fresh_currencies()
+        if cached is not None:
+            return cached
+        
+        async with self._currencies_lock:
+            # Another caller may have refreshed while we waited
+            cached = self._fresh_currencies()
+            if cached is not None:
+                return cached
             
-            headers = {
-                "x-api-key": self.api_key
-            }
+            currencies = await self._fetch_available_currencies()
+            if currencies is None:
+                return list(self.supported_currency_list)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_url}/currencies",
-                    headers=headers
-                ) as response:
-                    if response.status != 200:
-                        logger.warning("Failed to fetch currencies from NOWPayments")
-                        return self.supported_currencies
-                    
-                    result = await response.json()
-                    currencies = result.get('currencies', [])
-                    
-                    # Filter to only supported currencies
-                    return [c for c in currencies if c.lower() in self.supported_currencies]
+            self._currencies_cache = (time.monotonic(), currencies)
+            return list(currencies)
+    
+    def _fresh_currencies(self) -> Optional[List[str]]:
+        """Return a copy of the cached currency list if still fresh."""
+        if self._currencies_cache is None:
+            return None
+        fetched_at, currencies = self._currencies_cache
+        if time.monotonic() - fetched_at > self.CURRENCIES_TTL:
+            return None
+        return list(currencies)
+    
+    async def _fetch_available_currencies(self) -> Optional[List[str]]:
+        """
+        Fetch supported currencies from NOWPayments.
+        
+        Returns:
+            List of currency codes, or None on failure
+        """
+        try:
+            session = await self._get_session()
+            async with session.get(
+                self._url_currencies
+            ) as response:
+                if response.status != 200:
+                    logger.warning("Failed to fetch currencies from NOWPayments")
+                    return None
+                
+                result = await response.json()
+                currencies = result.get('currencies', [])
+                
+                # Filter to only supported currencies
+                return [c for c in currencies if c.lower() in self.supported_currencies]
             
         except Exception as e:
             logger.error(f"Error getting available currencies: {e}", exc_info=True)
-            return self.supported_currencies
+            return None
 
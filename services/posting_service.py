@@ -3,10 +3,12 @@ Posting service for AI Market Insight Bot.
 Handles posting messages to Telegram groups with rate limiting.
 """
 
+import asyncio
 import logging
-from typing import Optional, TYPE_CHECKING
-from datetime import datetime, timedelta
+import time
+from typing import Dict, List, Optional, TYPE_CHECKING
 from telegram import Bot
+from telegram.constants import ParseMode
 from telegram.error import TelegramError
 from rate_limiter import ConcurrentPostingManager
 from core.metrics import MetricsCollector
@@ -16,6 +18,65 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Expiration notifications sent when posting is blocked
+_MSG_NO_SUBSCRIPTION = (
+    "⚠️ <b>Subscription Required</b>\n\n"
+    "This group doesn't have an active subscription.\n\n"
+    "💰 <b>Get Started:</b>\n"
+    "   • 15-day free trial available\n"
+    "   • Then only $15/month\n"
+    "   • Pay with cryptocurrency\n\n"
+    "🚀 <b>Start Trial:</b> Use /start command\n"
+    "📞 <b>Questions?</b> Contact support"
+)
+
+_MSG_TRIAL_EXPIRED = (
+    "⏰ <b>Free Trial Expired</b>\n\n"
+    "Your 15-day free trial has ended.\n\n"
+    "💰 <b>Continue Receiving News:</b>\n"
+    "   • Subscribe for just $15/month\n"
+    "   • Pay with crypto (BTC, ETH, USDT, USDC, BNB, TRX)\n"
+    "   • Instant activation after payment\n\n"
+    "🔄 <b>Subscribe Now:</b> Use /renew command\n\n"
+    "❓ Questions? Contact support."
+)
+
+_MSG_SUBSCRIPTION_EXPIRED = (
+    "❌ <b>Subscription Expired</b>\n\n"
+    "Your subscription has ended and news posting has been stopped.\n\n"
+    "💰 <b>Reactivate Your Subscription:</b>\n"
+    "   • Only $15/month\n"
+    "   • Pay with cryptocurrency\n"
+    "   • Instant reactivation\n\n"
+    "🔄 <b>Renew:</b> Use /renew command\n\n"
+    "We'll be here when you're ready to resume! 👋"
+)
+
+# In grace period but posting blocked (shouldn't happen normally)
+_MSG_GRACE_PERIOD = (
+    "⚠️ <b>Grace Period Active</b>\n\n"
+    "Your subscription has expired but you're in the grace period.\n\n"
+    "💰 <b>Renew Now to Continue:</b>\n"
+    "   • Only $15/month\n"
+    "   • Pay with cryptocurrency\n"
+    "   • Instant activation\n\n"
+    "🔄 <b>Renew:</b> Use /renew command\n\n"
+    "⏰ Grace period ends soon. Renew to keep receiving news!"
+)
+
+_MSG_UNKNOWN_STATUS = (
+    "⚠️ <b>Subscription Issue</b>\n\n"
+    "There's an issue with your subscription status.\n\n"
+    "🔄 <b>Renew:</b> Use /renew command\n"
+    "📞 <b>Support:</b> Contact us for assistance"
+)
+
+_EXPIRATION_MESSAGES = {
+    'trial': _MSG_TRIAL_EXPIRED,
+    'expired': _MSG_SUBSCRIPTION_EXPIRED,
+    'grace_period': _MSG_GRACE_PERIOD,
+}
+
 
 class PostingService:
     """
@@ -30,6 +91,14 @@ class PostingService:
     - Subscription expiration notifications
     """
 
+    # Maximum in-flight sends for a single broadcast
+    BROADCAST_CONCURRENCY = 32
+
+    # Minimum seconds between expiration notifications to the same group
+    EXPIRATION_NOTIFICATION_INTERVAL = 86400.0
+    # Sweep stale notification timestamps once the map grows past this size
+    EXPIRATION_NOTIFICATION_SWEEP_SIZE = 1024
+
     def __init__(
         self,
         bot: Optional[Bot],
@@ -43,13 +112,13 @@ class PostingService:
         self.metrics = metrics
         self.subscription_service = subscription_service
         # Track when we last sent expiration notifications to avoid spam
-        self._last_expiration_notification = {}  # {group_id: datetime}
+        self._last_expiration_notification: Dict[int, float] = {}  # {group_id: monotonic seconds}
     
     async def post_to_group(
         self,
         group_id: int,
         message: str,
-        parse_mode: str = "HTML"
+        parse_mode: ParseMode = ParseMode.HTML
     ) -> bool:
         """
         Post a message to a Telegram group.
@@ -116,6 +185,22 @@ class PostingService:
         self.subscription_service = subscription_service
         logger.info("Subscription service set in PostingService")
 
+    async def prime_posting_allowed(self, group_ids: List[int]):
+        """
+        Load posting permission for a batch of groups in one lookup.
+
+        Called before a fan-out so each post_to_group is answered from the
+        subscription service's cached rows instead of reading its group
+        separately.
+
+        Args:
+            group_ids: Telegram group IDs about to be posted to
+        """
+        if not self.subscription_service:
+            return
+
+        await self.subscription_service.is_posting_allowed_bulk(group_ids)
+
     async def _send_expiration_notification(self, group_id: int) -> bool:
         """
         Send a notification to the group about subscription expiration.
@@ -130,12 +215,11 @@ class PostingService:
         logger.info(f"📧 Attempting to send expiration notification to group {group_id}")
 
         # Check if we already sent a notification today
-        now = datetime.now()
+        now = time.monotonic()
         last_notification = self._last_expiration_notification.get(group_id)
 
-        if last_notification:
-            time_since_last = now - last_notification
-            if time_since_last < timedelta(hours=24):
+        if last_notification is not None:
+            if now - last_notification < self.EXPIRATION_NOTIFICATION_INTERVAL:
                 logger.debug(f"Skipping expiration notification for group {group_id} - already sent today")
                 return False
 
@@ -149,75 +233,23 @@ class PostingService:
             subscription = await self.subscription_service.subscription_repo.find_by_group_id(group_id)
 
             if not subscription:
-                # No subscription found
-                notification_message = (
-                    "⚠️ <b>Subscription Required</b>\n\n"
-                    "This group doesn't have an active subscription.\n\n"
-                    "💰 <b>Get Started:</b>\n"
-                    "   • 15-day free trial available\n"
-                    "   • Then only $15/month\n"
-                    "   • Pay with cryptocurrency\n\n"
-                    "🚀 <b>Start Trial:</b> Use /start command\n"
-                    "📞 <b>Questions?</b> Contact support"
-                )
+                notification_message = _MSG_NO_SUBSCRIPTION
             else:
                 status = subscription.get('subscription_status', 'unknown')
+                notification_message = _EXPIRATION_MESSAGES.get(status, _MSG_UNKNOWN_STATUS)
 
-                if status == 'trial':
-                    # Trial expired
-                    notification_message = (
-                        "⏰ <b>Free Trial Expired</b>\n\n"
-                        "Your 15-day free trial has ended.\n\n"
-                        "💰 <b>Continue Receiving News:</b>\n"
-                        "   • Subscribe for just $15/month\n"
-                        "   • Pay with crypto (BTC, ETH, USDT, USDC, BNB, TRX)\n"
-                        "   • Instant activation after payment\n\n"
-                        "🔄 <b>Subscribe Now:</b> Use /renew command\n\n"
-                        "❓ Questions? Contact support."
-                    )
-                elif status == 'expired':
-                    # Subscription expired
-                    notification_message = (
-                        "❌ <b>Subscription Expired</b>\n\n"
-                        "Your subscription has ended and news posting has been stopped.\n\n"
-                        "💰 <b>Reactivate Your Subscription:</b>\n"
-                        "   • Only $15/month\n"
-                        "   • Pay with cryptocurrency\n"
-                        "   • Instant reactivation\n\n"
-                        "🔄 <b>Renew:</b> Use /renew command\n\n"
-                        "We'll be here when you're ready to resume! 👋"
-                    )
-                elif status == 'grace_period':
-                    # In grace period but posting blocked (shouldn't happen normally)
-                    grace_end = subscription.get('grace_period_end_date')
-                    notification_message = (
-                        "⚠️ <b>Grace Period Active</b>\n\n"
-                        "Your subscription has expired but you're in the grace period.\n\n"
-                        "💰 <b>Renew Now to Continue:</b>\n"
-                        "   • Only $15/month\n"
-                        "   • Pay with cryptocurrency\n"
-                        "   • Instant activation\n\n"
-                        "🔄 <b>Renew:</b> Use /renew command\n\n"
-                        f"⏰ Grace period ends soon. Renew to keep receiving news!"
-                    )
-                else:
-                    # Unknown status
-                    notification_message = (
-                        "⚠️ <b>Subscription Issue</b>\n\n"
-                        "There's an issue with your subscription status.\n\n"
-                        "🔄 <b>Renew:</b> Use /renew command\n"
-                        "📞 <b>Support:</b> Contact us for assistance"
-                    )
-
-            # Send the notification
+            # Send the notification (shares the posting rate budget)
+            await self.posting_manager.rate_limiter.acquire()
             await self.bot.send_message(
                 chat_id=group_id,
                 text=notification_message,
-                parse_mode="HTML"
+                parse_mode=ParseMode.HTML
             )
 
             # Update last notification time
             self._last_expiration_notification[group_id] = now
+            if len(self._last_expiration_notification) > self.EXPIRATION_NOTIFICATION_SWEEP_SIZE:
+                self._sweep_expiration_notifications(now)
 
             logger.info(f"Sent subscription expiration notification to group {group_id}")
             self.metrics.inc_counter("expiration_notifications_sent")
@@ -230,11 +262,20 @@ class PostingService:
             logger.error(f"Unexpected error sending expiration notification to group {group_id}: {e}", exc_info=True)
             return False
 
+    def _sweep_expiration_notifications(self, now: float):
+        """Drop notification timestamps older than the notification interval."""
+        cutoff = now - self.EXPIRATION_NOTIFICATION_INTERVAL
+        self._last_expiration_notification = {
+            group_id: sent_at
+            for group_id, sent_at in self._last_expiration_notification.items()
+            if sent_at > cutoff
+        }
+
     async def post_to_multiple_groups(
         self,
         group_ids: list[int],
         message: str,
-        parse_mode: str = "HTML"
+        parse_mode: ParseMode = ParseMode.HTML
     ) -> dict[int, bool]:
         """
         Post a message to multiple Telegram groups.
@@ -247,11 +288,22 @@ class PostingService:
         Returns:
             Dictionary mapping group_id to success status
         """
-        results = {}
-
-        for group_id in group_ids:
-            success = await self.post_to_group(group_id, message, parse_mode)
-            results[group_id] = success
-
-        return results
+        # Sends to distinct groups overlap; the posting manager's rate limiter
+        # still spaces the actual API calls, and the semaphore caps in-flight
+        # requests so the bot's HTTP pool isn't exhausted.
+        semaphore = asyncio.Semaphore(self.BROADCAST_CONCURRENCY)
+
+        async def _post(group_id: int) -> bool:
+            async with semaphore:
+                return await self.post_to_group(group_id, message, parse_mode)
+
+        outcomes = await asyncio.gather(
+            *(_post(group_id) for group_id in group_ids),
+            return_exceptions=True
+        )
+
+        return {
+            group_id: outcome is True
+            for group_id, outcome in zip(group_ids, outcomes)
+        }
 
@@ -5,17 +5,31 @@ Continuously monitors for hot/important news and posts immediately.
 
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from core.bloom_filter import ScalableBloomFilter
 from news_fetcher import NewsFetcher
 from services.news_service import NewsService
 from services.posting_service import PostingService
 from repositories.news_repository import NewsRepository
 from repositories.group_repository import GroupRepository
-from config import NEWS_CHECK_INTERVAL_MINUTES, MIN_IMPORTANCE_SCORE, ENABLE_REALTIME_POSTING
+from config import (
+    NEWS_CHECK_INTERVAL_MINUTES, MIN_IMPORTANCE_SCORE, ENABLE_REALTIME_POSTING,
+    REALTIME_GROUP_CONCURRENCY, POSTED_URLS_FILTER_PATH
+)
 
 logger = logging.getLogger(__name__)
 
+_SEP = "=" * 60
+_SUBSEP = "-" * 60
+
+
+async def _bounded(semaphore: asyncio.Semaphore, coro):
+    """Await a coroutine while holding a semaphore slot."""
+    async with semaphore:
+        return await coro
+
 
 class RealtimeNewsService:
     """
@@ -29,6 +43,9 @@ class RealtimeNewsService:
     - 24/7 operation independent of scheduled posting
     """
     
+    ARTICLE_CONCURRENCY = 5  # Hot articles posted at the same time
+    MAX_POSTED_FILTERS = 4  # Bloom generations kept (~150k URLs) before the oldest is dropped
+    
     def __init__(
         self,
         news_fetcher: NewsFetcher,
@@ -44,9 +61,18 @@ class RealtimeNewsService:
         self.news_repo = news_repo
         self.group_repo = group_repo
         self.is_running = False
+        self._stop = asyncio.Event()
+        self._last_check_ts: Optional[float] = None
         self.check_interval = NEWS_CHECK_INTERVAL_MINUTES * 60  # Convert to seconds
         self.min_importance = MIN_IMPORTANCE_SCORE
-        self.posted_urls = set()  # Track posted URLs to avoid duplicates
+        # Track posted URLs to avoid duplicates (compact, persisted across restarts)
+        self.posted_filter = ScalableBloomFilter(
+            initial_capacity=10_000,
+            error_rate=0.001,
+            max_filters=self.MAX_POSTED_FILTERS
+        )
+        self.posted_filter_path = POSTED_URLS_FILTER_PATH
+        self.group_concurrency = REALTIME_GROUP_CONCURRENCY
         
     async def start_monitoring(self):
         """Start continuous monitoring for hot news."""
@@ -59,127 +85,193 @@ class RealtimeNewsService:
             return
         
         self.is_running = True
+        self._stop.clear()
         logger.info(f"🔥 Starting real-time hot news monitoring (checking every {NEWS_CHECK_INTERVAL_MINUTES} minutes)")
         logger.info(f"📊 Minimum importance score: {self.min_importance}/10")
         
         # Load previously posted URLs from database
         await self._load_posted_urls()
         
-        while self.is_running:
+        while not self._stop.is_set():
             try:
                 await self._check_and_post_hot_news()
                 
-                # Wait for next check
-                await asyncio.sleep(self.check_interval)
+                # Wait until the next check is due
+                delay = self.check_interval
+                if self._last_check_ts is not None:
+                    delay = max(0.0, self.check_interval - (time.monotonic() - self._last_check_ts))
                 
             except Exception as e:
                 logger.error(f"Error in real-time monitoring loop: {e}", exc_info=True)
                 # Wait a bit before retrying
-                await asyncio.sleep(60)
+                delay = 60
+            
+            if await self._wait_for_stop(delay):
+                break
+        
+        self.is_running = False
+    
+    async def _wait_for_stop(self, timeout: float) -> bool:
+        """
+        Sleep for up to timeout seconds, waking early if monitoring is stopped.
+        
+        Returns:
+            True if stop was requested
+        """
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
     
     def stop_monitoring(self):
         """Stop the monitoring loop."""
         logger.info("Stopping real-time news monitoring...")
         self.is_running = False
+        self._stop.set()
+        self._save_posted_urls()
     
     async def _load_posted_urls(self):
-        """Load recently posted URLs from database to avoid duplicates."""
+        """Load posted URLs from the persisted filter and the database."""
+        stored = ScalableBloomFilter.load(self.posted_filter_path)
+        if stored is not None:
+            stored.max_filters = self.MAX_POSTED_FILTERS
+            self.posted_filter = stored
+            logger.info(f"Loaded posted-URL filter ({len(stored)} URLs) from {self.posted_filter_path}")
+
         try:
-            # Get articles posted in the last 24 hours
-            recent_articles = await self.news_repo.find_recent(limit=100)
-            self.posted_urls = {article["url"] for article in recent_articles if article.get("url")}
-            logger.info(f"Loaded {len(self.posted_urls)} recently posted URLs")
+            # Always merge in articles posted in the last 24 hours: the stored
+            # filter may predate posts made before a crash
+            added = 0
+            async for url in self.news_repo.iter_recent_urls(limit=10_000):
+                if self.posted_filter.add(url):
+                    added += 1
+            logger.info(f"Loaded {added} recently posted URLs from the database")
         except Exception as e:
             logger.error(f"Error loading posted URLs: {e}")
     
+    def _save_posted_urls(self):
+        """Persist the posted-URL filter so it survives restarts."""
+        try:
+            self.posted_filter.save(self.posted_filter_path)
+        except OSError as e:
+            logger.warning(f"Could not save posted-URL filter: {e}")
+    
     async def _check_and_post_hot_news(self):
         """Check for hot news and post immediately if found."""
-        logger.info("=" * 60)
+        self._last_check_ts = time.monotonic()
+        logger.info(_SEP)
         logger.info("🔍 Starting hot news check cycle...")
         logger.info(f"⏰ Check time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}")
 
         try:
             # Fetch hot/important news
             logger.info("📡 Fetching hot news from CryptoPanic API...")
-            hot_articles = self.news_fetcher.fetch_hot_news(limit=10)
+            # NewsFetcher uses blocking requests; keep it off the event loop
+            hot_articles = await asyncio.to_thread(self.news_fetcher.fetch_hot_news, limit=10)
 
             if not hot_articles:
                 logger.info("❌ No hot news found in this check")
-                logger.info("=" * 60)
+                logger.info(_SEP)
                 return
 
             logger.info(f"✅ Found {len(hot_articles)} hot articles from CryptoPanic")
 
             # Log details of each article
-            for idx, article in enumerate(hot_articles, 1):
-                importance = article.get("importance_score", 0)
-                is_hot = article.get("hot", False)
-                is_important = article.get("important", False)
-                logger.info(f"  [{idx}] Score: {importance}/10 | Hot: {is_hot} | Important: {is_important} | {article['title'][:60]}...")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("\n".join(
+                    "  [%d] Score: %s/10 | Hot: %s | Important: %s | %.60s..." % (
+                        idx,
+                        article.get("importance_score", 0),
+                        article.get("hot", False),
+                        article.get("important", False),
+                        article["title"]
+                    )
+                    for idx, article in enumerate(hot_articles, 1)
+                ))
 
             # Get all active groups
             active_groups = await self.group_repo.find_active()
 
             if not active_groups:
                 logger.warning("⚠️ No active groups to post to")
-                logger.info("=" * 60)
+                logger.info(_SEP)
                 return
 
             logger.info(f"📢 Found {len(active_groups)} active groups for posting")
 
-            # Process each hot article
-            new_posts_count = 0
+            # Filter out already-posted and low-importance articles up front
+            candidates = []
+            # URLs already queued this cycle: candidates are posted concurrently
+            # and only added to posted_filter afterwards
+            seen = set()
             filtered_already_posted = 0
             filtered_low_importance = 0
 
             for article in hot_articles:
-                # Skip if already posted
-                if article["url"] in self.posted_urls:
+                # Skip if already posted or already queued from this batch
+                if article["url"] in seen or article["url"] in self.posted_filter:
                     filtered_already_posted += 1
-                    logger.debug(f"⏭️ Skipping already posted: {article['title'][:50]}...")
+                    logger.debug("⏭️ Skipping already posted: %.50s...", article["title"])
                     continue
 
                 # Check importance score
                 importance_score = article.get("importance_score", 0)
                 if importance_score < self.min_importance:
                     filtered_low_importance += 1
-                    logger.info(f"⏭️ Filtered out (score {importance_score} < {self.min_importance}): {article['title'][:50]}...")
+                    logger.info(
+                        "⏭️ Filtered out (score %s < %s): %.50s...",
+                        importance_score, self.min_importance, article["title"]
+                    )
                     continue
 
-                logger.info(f"🔥 POSTING hot news (score: {importance_score}/10): {article['title'][:60]}...")
+                logger.info("🔥 POSTING hot news (score: %s/10): %.60s...", importance_score, article["title"])
+                seen.add(article["url"])
+                candidates.append(article)
 
-                # Post to all active groups
-                success = await self._post_to_groups(article, active_groups)
+            # Post qualifying articles concurrently; rate limiting lives in the posting service
+            semaphore = asyncio.Semaphore(self.ARTICLE_CONCURRENCY)
+            results = await asyncio.gather(
+                *(_bounded(semaphore, self._post_to_groups(article, active_groups)) for article in candidates),
+                return_exceptions=True
+            )
 
-                if success:
+            new_posts_count = 0
+            for article, success in zip(candidates, results):
+                if success is True:
                     # Mark as posted
-                    self.posted_urls.add(article["url"])
+                    self.posted_filter.add(article["url"])
                     new_posts_count += 1
                     logger.info(f"✅ Successfully posted to all groups!")
-
-                    # Small delay between posts to avoid rate limiting
-                    await asyncio.sleep(2)
                 else:
                     logger.error(f"❌ Failed to post article to groups")
 
+            if new_posts_count:
+                # Persist now rather than only on clean shutdown, so a crash
+                # cannot lose the record of these posts
+                await asyncio.to_thread(self._save_posted_urls)
+
             # Summary
-            logger.info("-" * 60)
-            logger.info(f"📊 Check Summary:")
-            logger.info(f"   • Total articles fetched: {len(hot_articles)}")
-            logger.info(f"   • Already posted (skipped): {filtered_already_posted}")
-            logger.info(f"   • Low importance (filtered): {filtered_low_importance}")
-            logger.info(f"   • New posts sent: {new_posts_count}")
+            logger.info(_SUBSEP)
+            logger.info(
+                "📊 Check Summary:\n"
+                "   • Total articles fetched: %d\n"
+                "   • Already posted (skipped): %d\n"
+                "   • Low importance (filtered): %d\n"
+                "   • New posts sent: %d",
+                len(hot_articles), filtered_already_posted, filtered_low_importance, new_posts_count
+            )
 
             if new_posts_count > 0:
                 logger.info(f"🎯 Successfully posted {new_posts_count} hot news articles!")
             else:
                 logger.info("ℹ️ No new hot news qualified for posting this cycle")
 
-            logger.info("=" * 60)
+            logger.info(_SEP)
 
         except Exception as e:
             logger.error(f"❌ Error checking hot news: {e}", exc_info=True)
-            logger.info("=" * 60)
+            logger.info(_SEP)
     
     async def _post_to_groups(self, article: Dict[str, Any], groups: List[Dict[str, Any]]) -> bool:
         """
@@ -192,86 +284,149 @@ class RealtimeNewsService:
         Returns:
             True if posted successfully to at least one group
         """
-        posted_count = 0
-
         logger.info(f"   📤 Posting to {len(groups)} active groups...")
 
-        for group in groups:
-            try:
-                group_id = group["group_id"]
-                group_name = group.get("group_name", f"Group {group_id}")
-                trader_type = group.get("trader_type", "investor")
-
-                logger.info(f"   → Group: {group_name} (trader_type: {trader_type})")
-
-                # Get AI analysis for this trader type
-                logger.info(f"      🤖 Requesting AI analysis from Gemini...")
-                analysis = await self.news_service.analyze_article(
+        # Analyze once per distinct trader type rather than once per group
+        trader_types = list({group.get("trader_type", "investor") for group in groups})
+        logger.info(f"      🤖 Requesting AI analysis from Gemini for {len(trader_types)} trader type(s)...")
+        analyses = dict(zip(trader_types, await asyncio.gather(
+            *(
+                self.news_service.analyze_article(
                     url=article["url"],
                     title=article["title"],
                     summary=article.get("description", ""),
                     trader_type=trader_type
                 )
+                for trader_type in trader_types
+            ),
+            return_exceptions=True
+        )))
+
+        # One subscription lookup for the whole fan-out instead of one per group
+        await self.posting_service.prime_posting_allowed([group["group_id"] for group in groups])
+
+        frame = self._render_article_frame(article)
+        semaphore = asyncio.Semaphore(self.group_concurrency)
+        results = await asyncio.gather(
+            *(
+                _bounded(
+                    semaphore,
+                    self._post_to_group(article, group, analyses[group.get("trader_type", "investor")], frame)
+                )
+                for group in groups
+            ),
+            return_exceptions=True
+        )
+        cache_docs = [result for result in results if isinstance(result, dict)]
+        posted_count = len(cache_docs)
+
+        if cache_docs:
+            # One batched write each instead of per-group round-trips
+            await self.group_repo.update_last_post_many([doc["group_id"] for doc in cache_docs])
+            await self.news_repo.cache_many(cache_docs)
 
-                if not analysis:
-                    logger.warning(f"      ⚠️ Failed to get AI analysis for group {group_name}")
-                    continue
+        logger.info(f"   ✅ Posted to {posted_count}/{len(groups)} groups")
+        return posted_count > 0
 
-                logger.info(f"      ✅ AI analysis received: {analysis[:100]}...")
+    @staticmethod
+    def _render_article_frame(article: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Render the group-independent parts of a hot news message.
 
-                # Format message with hot news indicator
-                importance_score = article.get("importance_score", 0)
-                hot_indicator = "🔥 HOT NEWS" if article.get("hot") else "⚡ IMPORTANT"
-
-                # ✅ FIX: Include full news content in the message
-                message = f"{hot_indicator} (Impact: {importance_score}/10)\n\n"
-                message += f"📰 {article['title']}\n\n"
-
-                # Add full news content if available
-                description = article.get("description", "")
-                if description:
-                    message += f"📄 Full Story:\n{description}\n\n"
-
-                message += f"📊 Market Impact Analysis ({trader_type.replace('_', ' ').title()}):\n"
-                message += f"{analysis}\n\n"
-                message += f"🔗 Source: {article['url']}\n"
-                message += f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}"
-
-                # Post to group
-                logger.info(f"      📨 Sending message to Telegram...")
-                success = await self.posting_service.post_to_group(
-                    group_id=group_id,
-                    message=message
-                )
+        Args:
+            article: Article data
 
-                if success:
-                    posted_count += 1
-                    logger.info(f"      ✅ Posted successfully to {group_name}")
-
-                    # Update group's last_post timestamp
-                    await self.group_repo.update_last_post(group_id)
-
-                    # Cache the analysis
-                    await self.news_repo.create(
-                        url=article["url"],
-                        title=article["title"],
-                        summary=article.get("description", ""),
-                        analysis=analysis,
-                        trader_type=trader_type,
-                        ttl_hours=24
-                    )
-                else:
-                    logger.error(f"      ❌ Failed to post to {group_name}")
+        Returns:
+            (prefix, suffix) placed around the per-group analysis
+        """
+        importance_score = article.get("importance_score", 0)
+        hot_indicator = "🔥 HOT NEWS" if article.get("hot") else "⚡ IMPORTANT"
 
-                # Small delay between group posts
-                await asyncio.sleep(1)
+        # ✅ FIX: Include full news content in the message
+        prefix = f"{hot_indicator} (Impact: {importance_score}/10)\n\n📰 {article['title']}\n\n"
 
-            except Exception as e:
-                logger.error(f"   ❌ Error posting to group {group.get('group_id')}: {e}", exc_info=True)
-                continue
+        # Add full news content if available
+        description = article.get("description", "")
+        if description:
+            prefix += f"📄 Full Story:\n{description}\n\n"
 
-        logger.info(f"   ✅ Posted to {posted_count}/{len(groups)} groups")
-        return posted_count > 0
+        suffix = (
+            f"\n\n🔗 Source: {article['url']}\n"
+            f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}"
+        )
+        return prefix, suffix
+
+    async def _post_to_group(
+        self,
+        article: Dict[str, Any],
+        group: Dict[str, Any],
+        analysis: Any,
+        frame: Optional[Tuple[str, str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Post article to a single group with AI analysis.
+
+        Args:
+            article: Article data
+            group: Group data
+            analysis: AI analysis for the group's trader type (or the
+                exception raised while requesting it)
+            frame: Pre-rendered (prefix, suffix) from _render_article_frame
+
+        Returns:
+            News cache record for the posted analysis, or None on failure
+        """
+        try:
+            group_id = group["group_id"]
+            group_name = group.get("group_name", f"Group {group_id}")
+            trader_type = group.get("trader_type", "investor")
+
+            logger.info(f"   → Group: {group_name} (trader_type: {trader_type})")
+
+            if isinstance(analysis, BaseException):
+                logger.error(f"      ❌ AI analysis failed for group {group_name}: {analysis}")
+                return None
+
+            if not analysis:
+                logger.warning(f"      ⚠️ Failed to get AI analysis for group {group_name}")
+                return None
+
+            logger.info("      ✅ AI analysis received: %.100s...", analysis)
+
+            # Wrap the per-group analysis in the shared article frame
+            prefix, suffix = frame or self._render_article_frame(article)
+            message = (
+                f"{prefix}📊 Market Impact Analysis ({trader_type.replace('_', ' ').title()}):\n"
+                f"{analysis}{suffix}"
+            )
+
+            # Post to group
+            logger.info(f"      📨 Sending message to Telegram...")
+            success = await self.posting_service.post_to_group(
+                group_id=group_id,
+                message=message
+            )
+
+            if not success:
+                logger.error(f"      ❌ Failed to post to {group_name}")
+                return None
+
+            logger.info(f"      ✅ Posted successfully to {group_name}")
+
+            # Analysis cache record; written in batch by _post_to_groups
+            return {
+                "group_id": group_id,
+                "url": article["url"],
+                "title": article["title"],
+                "summary": article.get("description", ""),
+                "analysis": analysis,
+                "trader_type": trader_type,
+                "ttl_hours": 24
+            }
+
+        except Exception as e:
+            logger.error(f"   ❌ Error posting to group {group.get('group_id')}: {e}", exc_info=True)
+            return None
     
     async def manual_check(self) -> Dict[str, Any]:
         """
@@ -283,7 +438,7 @@ class RealtimeNewsService:
         logger.info("Manual hot news check triggered")
         
         try:
-            hot_articles = self.news_fetcher.fetch_hot_news(limit=5)
+            hot_articles = await asyncio.to_thread(self.news_fetcher.fetch_hot_news, limit=5)
             
             return {
                 "success": True,
@@ -5,11 +5,13 @@ Handles daily news posting to registered groups at configured times.
 
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from telegram import Bot
 from telegram.error import TelegramError, Forbidden, BadRequest
 
+from config import DAILY_POST_CONCURRENCY
 from core.metrics import MetricsCollector
 from repositories.group_repository import GroupRepository
 from services.news_service import NewsService
@@ -18,6 +20,24 @@ from rate_limiter import ConcurrentPostingManager
 logger = logging.getLogger(__name__)
 
 
+_TRADER_EMOJI = {
+    'scalper': '⚡',
+    'day_trader': '🎯',
+    'swing_trader': '🌊',
+    'investor': '🏛️'
+}
+
+_SEPARATOR = "━" * 22 + "\n\n"
+
+_MESSAGE_FOOTER = "💡 *Powered by AI Analysis | Stay Informed, Trade Smart*"
+
+
+async def _bounded(semaphore: asyncio.Semaphore, coro):
+    """Await a coroutine while holding a semaphore slot."""
+    async with semaphore:
+        return await coro
+
+
 class SchedulerService:
     """
     Service for automated news posting to groups.
@@ -30,6 +50,8 @@ class SchedulerService:
     - Metrics tracking
     """
     
+    PERMISSION_CACHE_TTL = 6 * 3600.0  # seconds
+    
     def __init__(
         self,
         bot: Bot,
@@ -53,6 +75,11 @@ class SchedulerService:
         self.news_service = news_service
         self.posting_manager = posting_manager
         self.metrics = metrics
+        self.concurrency = DAILY_POST_CONCURRENCY
+        self._bot_id: Optional[int] = None
+        # group_id -> (can_post, monotonic timestamp)
+        self._perm_cache: Dict[int, Tuple[bool, float]] = {}
+        self._posting_task: Optional[asyncio.Task] = None
         
         logger.info("SchedulerService initialized")
     
@@ -66,33 +93,53 @@ class SchedulerService:
         Returns:
             True if bot can post, False otherwise
         """
+        cached = self._perm_cache.get(group_id)
+        if cached is not None and time.monotonic() - cached[1] < self.PERMISSION_CACHE_TTL:
+            return cached[0]
+        
         try:
+            if self._bot_id is None:
+                self._bot_id = self.bot.id
+            
             # Get bot's member status in the group
-            bot_member = await self.bot.get_chat_member(group_id, self.bot.id)
+            bot_member = await self.bot.get_chat_member(group_id, self._bot_id)
             
             # Check if bot can send messages
+            can_post = True
             if bot_member.status == 'left' or bot_member.status == 'kicked':
                 logger.warning(f"Bot is not a member of group {group_id}")
-                return False
+                can_post = False
             
             # For administrators, check can_post_messages permission
-            if bot_member.status == 'administrator':
+            elif bot_member.status == 'administrator':
                 if not bot_member.can_post_messages:
                     logger.warning(f"Bot lacks post permission in group {group_id}")
-                    return False
+                    can_post = False
             
-            return True
+            self._perm_cache[group_id] = (can_post, time.monotonic())
+            return can_post
             
         except Forbidden:
             logger.warning(f"Bot was removed from group {group_id}")
+            self.invalidate_permissions(group_id)
             return False
         except BadRequest as e:
             logger.error(f"Error checking permissions for group {group_id}: {e}")
+            self.invalidate_permissions(group_id)
             return False
         except Exception as e:
             logger.error(f"Unexpected error checking permissions for group {group_id}: {e}")
             return False
     
+    def invalidate_permissions(self, group_id: int):
+        """
+        Drop the cached permission result for a group.
+        
+        Args:
+            group_id: Telegram group ID
+        """
+        self._perm_cache.pop(group_id, None)
+    
     async def generate_news_for_group(self, group: Dict[str, Any]) -> Optional[str]:
         """
         Generate AI-analyzed news content for a group.
@@ -116,39 +163,54 @@ class SchedulerService:
                 logger.warning(f"No articles fetched for group {group_name}")
                 return None
             
-            # Analyze articles with AI
-            analyzed_articles = []
-            for article in articles[:3]:  # Analyze top 3 articles
-                try:
-                    analysis = await self.news_service.analyze_article(
-                        title=article.get('title', ''),
-                        summary=article.get('description', ''),
-                        url=article.get('url', ''),
-                        trader_type=trader_type
-                    )
-                    
-                    analyzed_articles.append({
-                        'title': article.get('title', ''),
-                        'url': article.get('url', ''),
-                        'analysis': analysis
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error analyzing article: {e}")
-                    continue
-            
-            if not analyzed_articles:
-                logger.warning(f"No articles analyzed for group {group_name}")
-                return None
-            
-            # Format message
-            message = self._format_news_message(analyzed_articles, trader_type)
-            return message
+            return await self.generate_news_for_trader_type(articles, trader_type)
             
         except Exception as e:
             logger.error(f"Error generating news for group {group.get('group_name')}: {e}", exc_info=True)
             return None
     
+    async def generate_news_for_trader_type(
+        self,
+        articles: List[Dict[str, Any]],
+        trader_type: str
+    ) -> Optional[str]:
+        """
+        Analyze pre-fetched articles for a trader type and format the message.
+        
+        Args:
+            articles: Trending articles
+            trader_type: Trader type for personalization
+            
+        Returns:
+            Formatted news message or None if no article could be analyzed
+        """
+        analyzed_articles = []
+        for article in articles[:3]:  # Analyze top 3 articles
+            try:
+                analysis = await self.news_service.analyze_article(
+                    title=article.get('title', ''),
+                    summary=article.get('description', ''),
+                    url=article.get('url', ''),
+                    trader_type=trader_type
+                )
+                
+                analyzed_articles.append({
+                    'title': article.get('title', ''),
+                    'url': article.get('url', ''),
+                    'analysis': analysis
+                })
+                
+            except Exception as e:
+                logger.error(f"Error analyzing article: {e}")
+                continue
+        
+        if not analyzed_articles:
+            logger.warning(f"No articles analyzed for trader_type {trader_type}")
+            return None
+        
+        # Format message
+        return self._format_news_message(analyzed_articles, trader_type)
+    
     def _format_news_message(self, articles: List[Dict[str, Any]], trader_type: str) -> str:
         """
         Format analyzed articles into a message.
@@ -160,36 +222,44 @@ class SchedulerService:
         Returns:
             Formatted message string
         """
-        trader_emoji = {
-            'scalper': '⚡',
-            'day_trader': '🎯',
-            'swing_trader': '🌊',
-            'investor': '🏛️'
-        }
-        
-        emoji = trader_emoji.get(trader_type, '📰')
+        emoji = _TRADER_EMOJI.get(trader_type, '📰')
         trader_name = trader_type.replace('_', ' ').title()
         
-        message = f"{emoji} **Daily AI Market Insights for {trader_name}s**\n\n"
-        message += f"📅 {datetime.now().strftime('%B %d, %Y')}\n"
-        message += "━━━━━━━━━━━━━━━━━━━━━━\n\n"
+        parts = [
+            f"{emoji} **Daily AI Market Insights for {trader_name}s**\n\n",
+            f"📅 {datetime.now().strftime('%B %d, %Y')}\n",
+            _SEPARATOR
+        ]
         
         for i, article in enumerate(articles, 1):
-            message += f"**{i}. {article['title']}**\n\n"
-            message += f"🤖 **AI Analysis:**\n{article['analysis']}\n\n"
-            message += f"🔗 [Read More]({article['url']})\n\n"
-            message += "━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            parts.append(
+                f"**{i}. {article['title']}**\n\n"
+                f"🤖 **AI Analysis:**\n{article['analysis']}\n\n"
+                f"🔗 [Read More]({article['url']})\n\n"
+            )
+            parts.append(_SEPARATOR)
         
-        message += "💡 *Powered by AI Analysis | Stay Informed, Trade Smart*"
+        parts.append(_MESSAGE_FOOTER)
         
-        return message
+        return "".join(parts)
     
-    async def post_to_group(self, group: Dict[str, Any]) -> bool:
+    async def post_to_group(
+        self,
+        group: Dict[str, Any],
+        message: Optional[str] = None,
+        permissions_checked: bool = False,
+        record_metrics: bool = True
+    ) -> bool:
         """
         Post news to a single group.
         
         Args:
             group: Group data dictionary
+            message: Pre-rendered message; generated for the group if omitted
+            permissions_checked: Skip the permission check when the caller
+                has already verified the group
+            record_metrics: Count the outcome in the post counters; batch
+                callers pass False and record totals themselves
             
         Returns:
             True if successful, False otherwise
@@ -199,13 +269,14 @@ class SchedulerService:
         
         try:
             # Check bot permissions
-            if not await self.check_bot_permissions(group_id):
+            if not permissions_checked and not await self.check_bot_permissions(group_id):
                 logger.warning(f"Skipping group {group_name} - insufficient permissions")
                 await self.group_repo.update_active_status(group_id, False)
                 return False
             
             # Generate news content
-            message = await self.generate_news_for_group(group)
+            if message is None:
+                message = await self.generate_news_for_group(group)
             
             if not message:
                 logger.warning(f"No content generated for group {group_name}")
@@ -220,7 +291,7 @@ class SchedulerService:
                     disable_web_page_preview=False
                 )
             
-            success = await self.posting_manager.post_with_retry(
+            success = await self.posting_manager.post_to_group(
                 post_func,
                 group_id
             )
@@ -228,21 +299,25 @@ class SchedulerService:
             if success:
                 # Update last_post timestamp
                 await self.group_repo.update_last_post(group_id)
-                self.metrics.inc_counter("scheduled_posts_success")
+                if record_metrics:
+                    self.metrics.inc_counter("scheduled_posts_success")
                 logger.info(f"✅ Successfully posted to group {group_name}")
             else:
-                self.metrics.inc_counter("scheduled_posts_failed")
+                if record_metrics:
+                    self.metrics.inc_counter("scheduled_posts_failed")
                 logger.error(f"❌ Failed to post to group {group_name}")
             
             return success
             
         except Forbidden:
             logger.warning(f"Bot was blocked/removed from group {group_name}")
+            self.invalidate_permissions(group_id)
             await self.group_repo.update_active_status(group_id, False)
             return False
         except Exception as e:
             logger.error(f"Error posting to group {group_name}: {e}", exc_info=True)
-            self.metrics.inc_counter("scheduled_posts_failed")
+            if record_metrics:
+                self.metrics.inc_counter("scheduled_posts_failed")
             return False
     
     async def run_daily_posting(self):
@@ -251,10 +326,13 @@ class SchedulerService:
         This method is called by the scheduler.
         """
         logger.info("🚀 Starting daily posting job...")
+        self._posting_task = asyncio.current_task()
         
         try:
-            # Get all active groups
-            active_groups = await self.group_repo.find_active()
+            # Get all active groups, with just the columns posting uses
+            active_groups = await self.group_repo.find_active_minimal(
+                ('group_id', 'group_name', 'trader_type')
+            )
             
             if not active_groups:
                 logger.info("No active groups found for posting")
@@ -262,20 +340,79 @@ class SchedulerService:
             
             logger.info(f"Found {len(active_groups)} active groups")
             
-            # Post to all groups concurrently
-            tasks = [self.post_to_group(group) for group in active_groups]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            
+            # Verify permissions for all groups up front
+            allowed = await asyncio.gather(
+                *(_bounded(semaphore, self.check_bot_permissions(group['group_id'])) for group in active_groups),
+                return_exceptions=True
+            )
+            postable_groups = []
+            for group, ok in zip(active_groups, allowed):
+                if ok is True:
+                    postable_groups.append(group)
+                else:
+                    logger.warning(f"Skipping group {group.get('group_name', 'Unknown')} - insufficient permissions")
+                    await self.group_repo.update_active_status(group['group_id'], False)
+            
+            # Fetch trending news once and render one message per trader type
+            articles = await self.news_service.fetch_trending_news(limit=5)
+            if not articles:
+                logger.warning("No articles fetched for daily posting")
+            
+            trader_types = list({group.get('trader_type', 'investor') for group in postable_groups})
+            messages = await asyncio.gather(
+                *(self.generate_news_for_trader_type(articles, trader_type) for trader_type in trader_types),
+                return_exceptions=True
+            ) if articles else [None] * len(trader_types)
+            msg_by_trader_type = {
+                trader_type: message if isinstance(message, str) else None
+                for trader_type, message in zip(trader_types, messages)
+            }
+            
+            # Post to all verified groups with bounded concurrency
+            tasks: List[asyncio.Task] = []
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    for group in postable_groups:
+                        tasks.append(tg.create_task(_bounded(
+                            semaphore,
+                            self.post_to_group(
+                                group,
+                                msg_by_trader_type.get(group.get('trader_type', 'investor')) or "",
+                                permissions_checked=True,
+                                record_metrics=False
+                            )
+                        )))
+            except* Exception as eg:
+                for exc in eg.exceptions:
+                    logger.error(f"Unhandled error in daily posting task: {exc}", exc_info=exc)
             
             # Count successes and failures
-            successes = sum(1 for r in results if r is True)
-            failures = len(results) - successes
+            successes = sum(
+                1 for t in tasks
+                if not t.cancelled() and t.exception() is None and t.result() is True
+            )
+            failures = len(active_groups) - successes
             
             logger.info(f"✅ Daily posting complete: {successes} successful, {failures} failed")
             
-            # Update metrics
+            # Update metrics once for the whole batch
+            self.metrics.inc_counter("scheduled_posts_success", successes)
+            self.metrics.inc_counter("scheduled_posts_failed", len(tasks) - successes)
             self.metrics.inc_counter("daily_posting_jobs_total")
             
+        except asyncio.CancelledError:
+            logger.info("Daily posting job cancelled")
+            raise
         except Exception as e:
             logger.error(f"Error in daily posting job: {e}", exc_info=True)
             self.metrics.inc_counter("daily_posting_jobs_failed")
-
+        finally:
+            self._posting_task = None
+    
+    def cancel_posting(self):
+        """Cancel an in-flight daily posting job and its per-group tasks."""
+        if self._posting_task and not self._posting_task.done():
+            logger.info("Cancelling in-flight daily posting job...")
+            self._posting_task.cancel()
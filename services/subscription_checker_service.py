@@ -3,12 +3,118 @@ Subscription Checker Service for AI Market Insight Bot.
 Handles automated checking of trial and subscription expiration.
 """
 
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, List, Dict, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Days before trial end at which warnings are sent
+TRIAL_WARNING_DAYS = (7, 3, 1)
+
+
+@dataclass(slots=True)
+class DueSubscription:
+    """A trial or grace period with an action due, as read by the checker."""
+    
+    subscription_id: int
+    group_id: int
+    subscription_status: str
+    end_at: Optional[datetime]  # trial_end_date or grace_period_end, by status
+    group_name: Optional[str]
+    days_until_end: Optional[int] = None
+    
+    @classmethod
+    def from_row(cls, row: Any) -> "DueSubscription":
+        """Build from a driver row; end_at is None if the date is invalid."""
+        status = row['subscription_status']
+        end_value = row['trial_end_date'] if status == 'trial' else row['grace_period_end']
+        try:
+            end_at = datetime.fromisoformat(str(end_value))
+        except (TypeError, ValueError):
+            end_at = None
+        return cls(
+            row['subscription_id'], row['group_id'], status, end_at,
+            row['group_name'], row['days_until_end']
+        )
+
+
+# (subscription_status, days until end date) -> rows due for that action
+DueBuckets = Dict[Tuple[str, int], List[DueSubscription]]
+
+# (subscription_id, group_id, event_type, event_data) queued for log_events
+Event = Tuple[int, int, str, Dict]
+
+
+# SQL is built once at import so every call hands the driver the same
+# string and hits its compiled-statement cache.
+
+# (subscription_status, days until end date) pairs the checker acts on
+DUE_MILESTONES = (
+    *(('trial', days) for days in (*TRIAL_WARNING_DAYS, 0)),
+    ('grace_period', 1),
+    ('grace_period', 0)
+)
+
+_END_DATE_COLUMNS = {'trial': 'trial_end_date', 'grace_period': 'grace_period_end'}
+
+
+def _build_due_query() -> str:
+    """
+    Specialize the due-subscription query for DUE_MILESTONES.
+    
+    Each milestone becomes its own one-day index range seek tagged with its
+    bucket, so only rows that need an action are read and the caller can
+    dispatch on the tag without date arithmetic.
+    """
+    branches = []
+    for status, days in DUE_MILESTONES:
+        column = _END_DATE_COLUMNS[status]
+        branches.append(f"""
+    SELECT {days} AS days_until_end, s.subscription_id, s.group_id,
+           s.subscription_status, s.trial_end_date, s.grace_period_end, g.group_name
+    FROM subscriptions s
+    JOIN groups g ON s.group_id = g.group_id
+    WHERE s.subscription_status = '{status}'
+    AND s.{column} >= ? AND s.{column} < ?""")
+    return "\n    UNION ALL".join(branches) + "\n"
+
+
+_DUE_SUBSCRIPTIONS_QUERY = _build_due_query()
+
+_NEXT_MILESTONE_QUERY = """
+    SELECT subscription_status, trial_end_date AS end_date
+    FROM subscriptions
+    WHERE subscription_status = 'trial'
+    AND trial_end_date >= ? AND trial_end_date < ?
+    UNION ALL
+    SELECT subscription_status, grace_period_end AS end_date
+    FROM subscriptions
+    WHERE subscription_status = 'grace_period'
+    AND grace_period_end >= ? AND grace_period_end < ?
+"""
+
+
+@lru_cache(maxsize=None)
+def _events_sent_query(num_types: int) -> str:
+    """Build the sent-today lookup for a given number of event types."""
+    return f"""
+        SELECT subscription_id, event_type
+        FROM subscription_events
+        WHERE created_at >= ?
+        AND event_type IN ({', '.join('?' * num_types)})
+    """
+
+
+async def _bounded(semaphore: asyncio.Semaphore, coro):
+    """Await a coroutine while holding a semaphore slot."""
+    async with semaphore:
+        return await coro
+
+
 
 class SubscriptionCheckerService:
     """
@@ -22,12 +128,18 @@ class SubscriptionCheckerService:
     - Automatic group disabling
     """
     
+    CHECK_CONCURRENCY = 16  # Subscriptions processed at the same time
+    SWEEP_INTERVAL_DAYS = 7  # Longest gap between checks when nothing is due
+    EVENT_QUEUE_SIZE = 10_000  # Audit events buffered before writes fall back to inline
+    EVENT_BATCH_SIZE = 500  # Audit events written per executemany
+    
     def __init__(
         self,
         subscription_repo,
         group_repo,
         notification_service,
-        metrics
+        metrics,
+        subscription_service=None
     ):
         """
         Initialize subscription checker service.
@@ -37,17 +149,51 @@ class SubscriptionCheckerService:
             group_repo: GroupRepository instance
             notification_service: NotificationService instance
             metrics: MetricsCollector instance
+            subscription_service: SubscriptionService whose cached posting
+                state is invalidated after status changes (optional)
         """
         self.subscription_repo = subscription_repo
         self.group_repo = group_repo
         self.notification_service = notification_service
         self.metrics = metrics
+        self.subscription_service = subscription_service
         
         # Grace period duration (days)
         self.GRACE_PERIOD_DAYS = 3
         
+        # Audit events are written by a background task off the check path
+        self._event_queue: asyncio.Queue = asyncio.Queue(maxsize=self.EVENT_QUEUE_SIZE)
+        self._event_writer_task: Optional[asyncio.Task] = None
+        
+        # (subscription_id, event_type) pairs known to be logged today
+        self._sent_today: Set[Tuple[int, str]] = set()
+        self._sent_today_types: Set[str] = set()
+        self._sent_today_date: Optional[date] = None
+        
         logger.info("SubscriptionCheckerService initialized")
     
+    async def _invalidate_groups(self, group_ids: List[int]):
+        """Drop cached posting state for groups whose status was just changed."""
+        if self.subscription_service:
+            await self.subscription_service.invalidate_groups(group_ids)
+    
+    async def flush_events(self):
+        """Wait until all queued audit events have been written."""
+        if self._event_writer_task is not None and not self._event_writer_task.done():
+            await self._event_queue.join()
+    
+    async def close(self):
+        """Flush queued audit events and stop the background writer."""
+        if self._event_writer_task is None:
+            return
+        await self.flush_events()
+        self._event_writer_task.cancel()
+        try:
+            await self._event_writer_task
+        except asyncio.CancelledError:
+            pass
+        self._event_writer_task = None
+    
     async def check_all_subscriptions(self):
         """
         Main method to check all subscriptions.
@@ -56,17 +202,32 @@ class SubscriptionCheckerService:
         try:
             logger.info("Starting daily subscription check...")
             
-            # Check trial warnings
-            await self.check_trial_warnings()
+            # One clock reading for the whole run keeps day boundaries consistent
+            run_at = datetime.now()
             
-            # Check expired trials
-            await self.check_expired_trials()
+            # Load everything due today in a single scan
+            due = await self._load_due_subscriptions(run_at)
             
-            # Check grace period warnings
-            await self.check_grace_period_warnings()
+            # Nothing due today: skip the checks and their sent-today lookups
+            if not due:
+                logger.info("No subscriptions due today, skipping checks")
+                self.metrics.inc_counter("subscription_checks_skipped")
+                return
             
-            # Check expired subscriptions
-            await self.check_expired_subscriptions()
+            # The checks touch disjoint buckets, so run them concurrently
+            checks = (
+                self.check_trial_warnings,
+                self.check_expired_trials,
+                self.check_grace_period_warnings,
+                self.check_expired_subscriptions
+            )
+            results = await asyncio.gather(
+                *(check(due, run_at) for check in checks),
+                return_exceptions=True
+            )
+            for check, result in zip(checks, results):
+                if isinstance(result, Exception):
+                    logger.error(f"{check.__name__} failed: {result}", exc_info=result)
             
             logger.info("Daily subscription check completed")
             self.metrics.inc_counter("subscription_checks_completed")
@@ -75,343 +236,485 @@ class SubscriptionCheckerService:
             logger.error(f"Error in daily subscription check: {e}", exc_info=True)
             self.metrics.inc_counter("subscription_checks_failed")
     
-    async def check_trial_warnings(self):
+    async def check_trial_warnings(
+        self,
+        due: Optional[DueBuckets] = None,
+        run_at: Optional[datetime] = None
+    ):
         """
         Check for trials expiring soon and send warnings.
         Sends notifications at 7, 3, and 1 days before expiration.
+        
+        Args:
+            due: Pre-loaded due subscriptions (loaded if omitted)
+            run_at: Time of the check run (defaults to now)
         """
         try:
             logger.info("Checking trial warnings...")
             
-            # Warning thresholds (days before expiration)
-            warning_days = [7, 3, 1]
+            run_at = run_at or datetime.now()
+            if due is None:
+                due = await self._load_due_subscriptions(run_at)
             
-            for days in warning_days:
-                # Calculate target date
-                target_date = datetime.now() + timedelta(days=days)
-                target_date_str = target_date.date().isoformat()
-                
-                # Find trials expiring on target date
-                trials = await self._find_trials_expiring_on_date(target_date_str)
+            # Warnings already sent today, fetched in one query
+            sent = await self._load_events_sent_today(
+                [f'trial_warning_{days}d' for days in TRIAL_WARNING_DAYS],
+                run_at
+            )
+            
+            for days in TRIAL_WARNING_DAYS:
+                # Trials expiring on the target date
+                trials = due.get(('trial', days), [])
                 
                 logger.info(f"Found {len(trials)} trials expiring in {days} day(s)")
                 
+                pending = []
                 for trial in trials:
                     # Check if warning already sent today
-                    if await self._was_warning_sent_today(trial['subscription_id'], days):
-                        logger.debug(f"Warning already sent for subscription {trial['subscription_id']}")
+                    if (trial.subscription_id, f'trial_warning_{days}d') in sent:
+                        logger.debug("Warning already sent for subscription %s", trial.subscription_id)
                         continue
-                    
-                    # Send warning notification
-                    try:
-                        trial_end = datetime.fromisoformat(trial['trial_end_date'])
-                        
-                        await self.notification_service.send_trial_warning_notification(
-                            group_id=trial['group_id'],
-                            days_remaining=days,
-                            trial_end_date=trial_end
-                        )
-                        
-                        # Log event
-                        await self.subscription_repo.log_event(
-                            trial['subscription_id'],
-                            trial['group_id'],
-                            f'trial_warning_{days}d',
-                            {'days_remaining': days, 'warning_sent': True}
-                        )
-                        
-                        self.metrics.inc_counter(f"trial_warnings_sent_{days}d")
-                        logger.info(f"Sent {days}-day warning for group {trial['group_id']}")
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to send trial warning for group {trial['group_id']}: {e}")
+                    pending.append(trial)
+                
+                semaphore = asyncio.Semaphore(self.CHECK_CONCURRENCY)
+                events = await asyncio.gather(
+                    *(_bounded(semaphore, self._send_trial_warning(trial, days)) for trial in pending)
+                )
+                
+                # Log all sent warnings and count them in one batch
+                sent_events = [event for event in events if event]
+                self._remember_sent(sent_events)
+                await self._queue_events(sent_events)
+                self.metrics.inc_counter(f"trial_warnings_sent_{days}d", len(sent_events))
+                logger.info("Sent %d of %d %d-day trial warnings", len(sent_events), len(pending), days)
             
             logger.info("Trial warnings check completed")
             
         except Exception as e:
             logger.error(f"Error checking trial warnings: {e}", exc_info=True)
     
-    async def check_expired_trials(self):
+    async def check_expired_trials(
+        self,
+        due: Optional[DueBuckets] = None,
+        run_at: Optional[datetime] = None
+    ):
         """
         Check for expired trials and activate grace period.
+        
+        Args:
+            due: Pre-loaded due subscriptions (loaded if omitted)
+            run_at: Time of the check run (defaults to now)
         """
         try:
             logger.info("Checking expired trials...")
             
-            # Find trials that expired today
-            now = datetime.now()
-            today_str = now.date().isoformat()
+            run_at = run_at or datetime.now()
+            if due is None:
+                due = await self._load_due_subscriptions(run_at)
             
-            expired_trials = await self._find_trials_expired_on_date(today_str)
+            # Trials that expired today
+            expired_trials = due.get(('trial', 0), [])
             
             logger.info(f"Found {len(expired_trials)} expired trials")
             
-            for trial in expired_trials:
-                try:
-                    # Calculate grace period end date
-                    grace_end = now + timedelta(days=self.GRACE_PERIOD_DAYS)
-                    
-                    # Update subscription to grace period
-                    await self.subscription_repo.update(trial['subscription_id'], {
-                        'subscription_status': 'grace_period',
-                        'grace_period_end_date': grace_end.isoformat()
-                    })
-                    
-                    # Update group status
-                    await self.group_repo.update(trial['group_id'], {
-                        'subscription_status': 'grace_period'
-                    })
-                    
-                    # Send trial expired notification
-                    await self.notification_service.send_trial_expired_notification(
-                        group_id=trial['group_id'],
-                        grace_period_days=self.GRACE_PERIOD_DAYS,
-                        grace_period_end=grace_end
-                    )
-                    
-                    # Log event
-                    await self.subscription_repo.log_event(
-                        trial['subscription_id'],
-                        trial['group_id'],
-                        'trial_expired',
-                        {'grace_period_end': grace_end.isoformat()}
-                    )
-                    
-                    self.metrics.inc_counter("trials_expired")
-                    logger.info(f"Activated grace period for group {trial['group_id']}")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process expired trial for group {trial['group_id']}: {e}")
+            if not expired_trials:
+                logger.info("Expired trials check completed")
+                return
+            
+            # Calculate grace period end date
+            grace_end = run_at + timedelta(days=self.GRACE_PERIOD_DAYS)
+            
+            # Move all expired trials to grace period with one UPDATE per table
+            await self.subscription_repo.update_all(
+                [trial.subscription_id for trial in expired_trials],
+                {'subscription_status': 'grace_period', 'grace_period_end': grace_end.isoformat()}
+            )
+            await self.group_repo.update_all(
+                [trial.group_id for trial in expired_trials],
+                {'subscription_status': 'grace_period'}
+            )
+            await self._invalidate_groups([trial.group_id for trial in expired_trials])
+            
+            semaphore = asyncio.Semaphore(self.CHECK_CONCURRENCY)
+            events = await asyncio.gather(
+                *(_bounded(semaphore, self._expire_trial(trial, grace_end)) for trial in expired_trials)
+            )
+            sent_events = [event for event in events if event]
+            self._remember_sent(sent_events)
+            await self._queue_events(sent_events)
+            self.metrics.inc_counter("trials_expired", len(sent_events))
+            logger.info("Activated grace period for %d groups", len(expired_trials))
             
             logger.info("Expired trials check completed")
             
         except Exception as e:
             logger.error(f"Error checking expired trials: {e}", exc_info=True)
     
-    async def check_grace_period_warnings(self):
+    async def check_grace_period_warnings(
+        self,
+        due: Optional[DueBuckets] = None,
+        run_at: Optional[datetime] = None
+    ):
         """
         Check for grace periods ending soon and send urgent warnings.
         Sends warning 1 day before grace period ends.
+        
+        Args:
+            due: Pre-loaded due subscriptions (loaded if omitted)
+            run_at: Time of the check run (defaults to now)
         """
         try:
             logger.info("Checking grace period warnings...")
             
-            # Find grace periods ending tomorrow
-            tomorrow = datetime.now() + timedelta(days=1)
-            tomorrow_str = tomorrow.date().isoformat()
+            run_at = run_at or datetime.now()
+            if due is None:
+                due = await self._load_due_subscriptions(run_at)
             
-            grace_periods = await self._find_grace_periods_ending_on_date(tomorrow_str)
+            # Grace periods ending tomorrow
+            grace_periods = due.get(('grace_period', 1), [])
             
             logger.info(f"Found {len(grace_periods)} grace periods ending tomorrow")
             
+            sent = await self._load_events_sent_today(['grace_period_warning'], run_at)
+            
+            pending = []
             for subscription in grace_periods:
                 # Check if warning already sent today
-                if await self._was_grace_warning_sent_today(subscription['subscription_id']):
-                    logger.debug(f"Grace warning already sent for subscription {subscription['subscription_id']}")
+                if (subscription.subscription_id, 'grace_period_warning') in sent:
+                    logger.debug("Grace warning already sent for subscription %s", subscription.subscription_id)
                     continue
-                
-                try:
-                    grace_end = datetime.fromisoformat(subscription['grace_period_end_date'])
-                    
-                    # Send urgent warning
-                    await self.notification_service.send_grace_period_warning_notification(
-                        group_id=subscription['group_id'],
-                        days_remaining=1,
-                        grace_period_end=grace_end
-                    )
-                    
-                    # Log event
-                    await self.subscription_repo.log_event(
-                        subscription['subscription_id'],
-                        subscription['group_id'],
-                        'grace_period_warning',
-                        {'days_remaining': 1, 'warning_sent': True}
-                    )
-                    
-                    self.metrics.inc_counter("grace_period_warnings_sent")
-                    logger.info(f"Sent grace period warning for group {subscription['group_id']}")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to send grace period warning for group {subscription['group_id']}: {e}")
+                pending.append(subscription)
+            
+            semaphore = asyncio.Semaphore(self.CHECK_CONCURRENCY)
+            events = await asyncio.gather(
+                *(_bounded(semaphore, self._send_grace_period_warning(subscription)) for subscription in pending)
+            )
+            sent_events = [event for event in events if event]
+            self._remember_sent(sent_events)
+            await self._queue_events(sent_events)
+            self.metrics.inc_counter("grace_period_warnings_sent", len(sent_events))
+            logger.info("Sent %d of %d grace period warnings", len(sent_events), len(pending))
             
             logger.info("Grace period warnings check completed")
             
         except Exception as e:
             logger.error(f"Error checking grace period warnings: {e}", exc_info=True)
     
-    async def check_expired_subscriptions(self):
+    async def check_expired_subscriptions(
+        self,
+        due: Optional[DueBuckets] = None,
+        run_at: Optional[datetime] = None
+    ):
         """
         Check for expired subscriptions and disable posting.
+        
+        Args:
+            due: Pre-loaded due subscriptions (loaded if omitted)
+            run_at: Time of the check run (defaults to now)
         """
         try:
             logger.info("Checking expired subscriptions...")
             
-            # Find grace periods that expired today
-            now = datetime.now()
-            today_str = now.date().isoformat()
+            run_at = run_at or datetime.now()
+            if due is None:
+                due = await self._load_due_subscriptions(run_at)
             
-            expired_subscriptions = await self._find_grace_periods_expired_on_date(today_str)
+            # Grace periods that expired today
+            expired_subscriptions = due.get(('grace_period', 0), [])
             
             logger.info(f"Found {len(expired_subscriptions)} expired subscriptions")
             
-            for subscription in expired_subscriptions:
-                try:
-                    # Update subscription to expired
-                    await self.subscription_repo.update(subscription['subscription_id'], {
-                        'subscription_status': 'expired'
-                    })
-                    
-                    # Disable group
-                    await self.group_repo.update(subscription['group_id'], {
-                        'subscription_status': 'expired',
-                        'is_active': 0
-                    })
-                    
-                    # Send expiration notification
-                    await self.notification_service.send_subscription_expired_notification(
-                        group_id=subscription['group_id']
-                    )
-                    
-                    # Log event
-                    await self.subscription_repo.log_event(
-                        subscription['subscription_id'],
-                        subscription['group_id'],
-                        'subscription_expired',
-                        {'posting_disabled': True}
-                    )
-                    
-                    self.metrics.inc_counter("subscriptions_expired")
-                    logger.info(f"Disabled posting for expired group {subscription['group_id']}")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process expired subscription for group {subscription['group_id']}: {e}")
+            if not expired_subscriptions:
+                logger.info("Expired subscriptions check completed")
+                return
+            
+            # Expire subscriptions and disable their groups with one UPDATE per table
+            await self.subscription_repo.update_all(
+                [subscription.subscription_id for subscription in expired_subscriptions],
+                {'subscription_status': 'expired'}
+            )
+            await self.group_repo.update_all(
+                [subscription.group_id for subscription in expired_subscriptions],
+                {'subscription_status': 'expired', 'is_active': 0}
+            )
+            await self._invalidate_groups([subscription.group_id for subscription in expired_subscriptions])
+            
+            semaphore = asyncio.Semaphore(self.CHECK_CONCURRENCY)
+            events = await asyncio.gather(
+                *(_bounded(semaphore, self._expire_subscription(subscription)) for subscription in expired_subscriptions)
+            )
+            sent_events = [event for event in events if event]
+            self._remember_sent(sent_events)
+            await self._queue_events(sent_events)
+            self.metrics.inc_counter("subscriptions_expired", len(sent_events))
+            logger.info("Disabled posting for %d expired groups", len(expired_subscriptions))
             
             logger.info("Expired subscriptions check completed")
 
         except Exception as e:
             logger.error(f"Error checking expired subscriptions: {e}", exc_info=True)
 
-    # Helper methods for database queries
+    # Audit event logging
 
-    async def _find_trials_expiring_on_date(self, date_str: str) -> List[Dict]:
-        """Find trials expiring on a specific date."""
-        try:
-            query = """
-                SELECT s.*, g.group_name
-                FROM subscriptions s
-                JOIN groups g ON s.group_id = g.group_id
-                WHERE s.subscription_status = 'trial'
-                AND DATE(s.trial_end_date) = ?
-            """
+    async def _queue_events(self, events: List[Event]):
+        """
+        Hand events to the background writer without waiting for the insert.
+        
+        Falls back to writing inline if the queue is full.
+        """
+        if not events:
+            return
+        
+        if self._event_writer_task is None or self._event_writer_task.done():
+            self._event_writer_task = asyncio.create_task(self._event_writer())
+        
+        for index, event in enumerate(events):
+            try:
+                self._event_queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning("Subscription event queue full, writing events inline")
+                await self.subscription_repo.log_events(events[index:])
+                return
 
-            results = await self.subscription_repo.execute_query(query, (date_str,), fetch_all=True)
-            return results if results else []
+    async def _event_writer(self):
+        """Drain queued events and insert them in batches."""
+        while True:
+            batch = [await self._event_queue.get()]
+            while len(batch) < self.EVENT_BATCH_SIZE:
+                try:
+                    batch.append(self._event_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            try:
+                await self.subscription_repo.log_events(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} subscription events: {e}")
+            finally:
+                for _ in batch:
+                    self._event_queue.task_done()
 
-        except Exception as e:
-            logger.error(f"Error finding trials expiring on {date_str}: {e}")
-            return []
+    # Per-subscription notifications; each returns the event to log, or None on failure
 
-    async def _find_trials_expired_on_date(self, date_str: str) -> List[Dict]:
-        """Find trials that expired on a specific date."""
+    async def _send_trial_warning(self, trial: DueSubscription, days: int) -> Optional[Event]:
+        """Send a trial warning."""
         try:
-            query = """
-                SELECT s.*, g.group_name
-                FROM subscriptions s
-                JOIN groups g ON s.group_id = g.group_id
-                WHERE s.subscription_status = 'trial'
-                AND DATE(s.trial_end_date) = ?
-            """
-
-            results = await self.subscription_repo.execute_query(query, (date_str,), fetch_all=True)
-            return results if results else []
-
+            await self.notification_service.send_trial_warning_notification(
+                group_id=trial.group_id,
+                days_remaining=days,
+                trial_end_date=trial.end_at
+            )
+            
+            logger.debug("Sent %d-day warning for group %s", days, trial.group_id)
+            return (
+                trial.subscription_id,
+                trial.group_id,
+                f'trial_warning_{days}d',
+                {'days_remaining': days, 'warning_sent': True}
+            )
+            
         except Exception as e:
-            logger.error(f"Error finding trials expired on {date_str}: {e}")
-            return []
+            logger.error("Failed to send trial warning for group %s: %s", trial.group_id, e)
+            return None
 
-    async def _find_grace_periods_ending_on_date(self, date_str: str) -> List[Dict]:
-        """Find grace periods ending on a specific date."""
+    async def _expire_trial(self, trial: DueSubscription, grace_end: datetime) -> Optional[Event]:
+        """Notify a group that its trial expired and its grace period started."""
         try:
-            query = """
-                SELECT s.*, g.group_name
-                FROM subscriptions s
-                JOIN groups g ON s.group_id = g.group_id
-                WHERE s.subscription_status = 'grace_period'
-                AND DATE(s.grace_period_end_date) = ?
-            """
-
-            results = await self.subscription_repo.execute_query(query, (date_str,), fetch_all=True)
-            return results if results else []
-
+            await self.notification_service.send_trial_expired_notification(
+                group_id=trial.group_id,
+                grace_period_days=self.GRACE_PERIOD_DAYS,
+                grace_period_end=grace_end
+            )
+            
+            logger.debug("Activated grace period for group %s", trial.group_id)
+            return (
+                trial.subscription_id,
+                trial.group_id,
+                'trial_expired',
+                {'grace_period_end': grace_end.isoformat()}
+            )
+            
         except Exception as e:
-            logger.error(f"Error finding grace periods ending on {date_str}: {e}")
-            return []
+            logger.error("Failed to process expired trial for group %s: %s", trial.group_id, e)
+            return None
 
-    async def _find_grace_periods_expired_on_date(self, date_str: str) -> List[Dict]:
-        """Find grace periods that expired on a specific date."""
+    async def _send_grace_period_warning(self, subscription: DueSubscription) -> Optional[Event]:
+        """Send an urgent grace period warning."""
         try:
-            query = """
-                SELECT s.*, g.group_name
-                FROM subscriptions s
-                JOIN groups g ON s.group_id = g.group_id
-                WHERE s.subscription_status = 'grace_period'
-                AND DATE(s.grace_period_end_date) = ?
-            """
-
-            results = await self.subscription_repo.execute_query(query, (date_str,), fetch_all=True)
-            return results if results else []
-
+            await self.notification_service.send_grace_period_warning_notification(
+                group_id=subscription.group_id,
+                days_remaining=1,
+                grace_period_end=subscription.end_at
+            )
+            
+            logger.debug("Sent grace period warning for group %s", subscription.group_id)
+            return (
+                subscription.subscription_id,
+                subscription.group_id,
+                'grace_period_warning',
+                {'days_remaining': 1, 'warning_sent': True}
+            )
+            
         except Exception as e:
-            logger.error(f"Error finding grace periods expired on {date_str}: {e}")
-            return []
+            logger.error("Failed to send grace period warning for group %s: %s", subscription.group_id, e)
+            return None
 
-    async def _was_warning_sent_today(self, subscription_id: int, days: int) -> bool:
-        """Check if a trial warning was already sent today."""
+    async def _expire_subscription(self, subscription: DueSubscription) -> Optional[Event]:
+        """Notify a group that its subscription expired and posting is disabled."""
         try:
-            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            await self.notification_service.send_subscription_expired_notification(
+                group_id=subscription.group_id
+            )
+            
+            logger.debug("Disabled posting for expired group %s", subscription.group_id)
+            return (
+                subscription.subscription_id,
+                subscription.group_id,
+                'subscription_expired',
+                {'posting_disabled': True}
+            )
+            
+        except Exception as e:
+            logger.error("Failed to process expired subscription for group %s: %s", subscription.group_id, e)
+            return None
 
-            query = """
-                SELECT COUNT(*) as count
-                FROM subscription_events
-                WHERE subscription_id = ?
-                AND event_type = ?
-                AND created_at >= ?
-            """
+    # Helper methods for database queries
 
+    async def _load_due_subscriptions(self, run_at: datetime) -> DueBuckets:
+        """
+        Load all trials and grace periods with an action due today in one scan.
+        
+        Rows are bucketed by (subscription_status, days until the relevant
+        end date): trials at 7/3/1 days (warnings) and 0 days (expired),
+        grace periods at 1 day (warning) and 0 days (expired). Rows are
+        materialized straight into slotted DueSubscription objects.
+        
+        Args:
+            run_at: Time of the check run
+        
+        Returns:
+            Dictionary mapping bucket to subscription rows
+        """
+        today = run_at.date()
+        
+        # Half-open one-day range per milestone keeps the predicates index-friendly
+        params = []
+        for _, days in DUE_MILESTONES:
+            day = today + timedelta(days=days)
+            params += (day.isoformat(), (day + timedelta(days=1)).isoformat())
+        
+        try:
             results = await self.subscription_repo.execute_query(
-                query,
-                (subscription_id, f'trial_warning_{days}d', today_start.isoformat()),
+                _DUE_SUBSCRIPTIONS_QUERY,
+                tuple(params),
+                fetch_all=True,
+                row_factory=DueSubscription.from_row
+            )
+        except Exception as e:
+            logger.error(f"Error loading due subscriptions: {e}")
+            return {}
+        
+        due: DueBuckets = {}
+        for row in results or []:
+            if row.end_at is None:
+                logger.warning("Invalid end date for subscription %s", row.subscription_id)
+                continue
+            due.setdefault((row.subscription_status, row.days_until_end), []).append(row)
+        
+        return due
+    
+    async def get_next_check_date(self, after: date) -> date:
+        """
+        Find the next date on which a trial or grace period milestone falls.
+        
+        Lets the caller sleep until something is actually due instead of
+        waking every day. The result is capped at SWEEP_INTERVAL_DAYS so a
+        safety-net sweep still runs regularly.
+        
+        Args:
+            after: Last date already covered by a check
+            
+        Returns:
+            Earliest milestone date after `after`
+        """
+        horizon = after + timedelta(days=self.SWEEP_INTERVAL_DAYS)
+        window_start = (after + timedelta(days=1)).isoformat()
+        trial_window_end = (horizon + timedelta(days=max(TRIAL_WARNING_DAYS) + 1)).isoformat()
+        grace_window_end = (horizon + timedelta(days=2)).isoformat()
+        
+        try:
+            results = await self.subscription_repo.execute_query(
+                _NEXT_MILESTONE_QUERY,
+                (window_start, trial_window_end, window_start, grace_window_end),
                 fetch_all=True
             )
-
-            return results[0]['count'] > 0 if results else False
-
         except Exception as e:
-            logger.error(f"Error checking if warning was sent: {e}")
-            return False
-
-    async def _was_grace_warning_sent_today(self, subscription_id: int) -> bool:
-        """Check if a grace period warning was already sent today."""
+            logger.error(f"Error finding next subscription milestone: {e}")
+            return after + timedelta(days=1)
+        
+        next_date = horizon
+        for row in results or []:
+            try:
+                end_date = datetime.fromisoformat(str(row['end_date'])).date()
+            except (TypeError, ValueError):
+                continue
+            offsets = (*TRIAL_WARNING_DAYS, 0) if row['subscription_status'] == 'trial' else (1, 0)
+            for days_before in offsets:
+                milestone = end_date - timedelta(days=days_before)
+                if after < milestone < next_date:
+                    next_date = milestone
+        
+        return next_date
+    
+    async def _load_events_sent_today(
+        self,
+        event_types: List[str],
+        run_at: datetime
+    ) -> Set[Tuple[int, str]]:
+        """
+        Load which of the given events were already logged today.
+        
+        Each event type is read from the database once per day; after that
+        the in-process cache, which also records events sent by this
+        service, is authoritative.
+        
+        Args:
+            event_types: Event types to look up
+            run_at: Time of the check run
+            
+        Returns:
+            Set of (subscription_id, event_type) pairs logged since midnight
+        """
+        today = run_at.date()
+        if self._sent_today_date != today:
+            self._sent_today.clear()
+            self._sent_today_types.clear()
+            self._sent_today_date = today
+        
+        missing = [event_type for event_type in event_types if event_type not in self._sent_today_types]
+        if not missing:
+            return self._sent_today
+        
+        # Make sure queued events are visible to the lookup
+        await self.flush_events()
+        
         try:
-            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-
-            query = """
-                SELECT COUNT(*) as count
-                FROM subscription_events
-                WHERE subscription_id = ?
-                AND event_type = 'grace_period_warning'
-                AND created_at >= ?
-            """
-
+            today_start = run_at.replace(hour=0, minute=0, second=0, microsecond=0)
+            
             results = await self.subscription_repo.execute_query(
-                query,
-                (subscription_id, today_start.isoformat()),
+                _events_sent_query(len(missing)),
+                (today_start.isoformat(), *missing),
                 fetch_all=True
             )
-
-            return results[0]['count'] > 0 if results else False
-
+            
+            self._sent_today.update((row['subscription_id'], row['event_type']) for row in results or [])
+            self._sent_today_types.update(missing)
+            
         except Exception as e:
-            logger.error(f"Error checking if grace warning was sent: {e}")
-            return False
-
+            logger.error(f"Error checking which warnings were sent today: {e}")
+        
+        return self._sent_today
+    
+    def _remember_sent(self, events: List[Event]):
+        """Record events sent by this run in the sent-today cache."""
+        self._sent_today.update((event[0], event[2]) for event in events)
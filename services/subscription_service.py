@@ -3,14 +3,21 @@ Subscription service for AI Market Insight Bot.
 Manages subscription lifecycle and validation.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, Callable, List, Tuple
 from datetime import datetime, timedelta
-import hashlib
 
-from repositories.subscription_repository import SubscriptionRepository
+from repositories.subscription_repository import (
+    SubscriptionRepository,
+    trial_fingerprint,
+    legacy_trial_fingerprint
+)
 from repositories.payment_repository import PaymentRepository
 from repositories.group_repository import GroupRepository
+from core.bloom_filter import ScalableBloomFilter
+from core.cache import TTLCache
 from core.metrics import MetricsCollector
 import config
 
@@ -21,6 +28,9 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Cache sentinel distinguishing "not cached" from a cached None
+_MISSING = object()
+
 
 class SubscriptionService:
     """
@@ -34,6 +44,17 @@ class SubscriptionService:
     - Posting permission checks
     """
 
+    # Configuration from config.py, resolved once at import
+    TRIAL_DAYS = config.TRIAL_DAYS
+    GRACE_PERIOD_DAYS = config.GRACE_PERIOD_DAYS
+    SUBSCRIPTION_PRICE_USD = config.SUBSCRIPTION_PRICE_USD
+    TRIAL_COOLDOWN_DAYS = config.TRIAL_COOLDOWN_DAYS
+    MAX_TRIALS_PER_CREATOR = config.MAX_TRIALS_PER_CREATOR
+
+    SUBSCRIPTION_CACHE_SIZE = 10_000  # Subscription rows kept in the process-local cache
+    SUBSCRIPTION_CACHE_TTL = 30  # Seconds a cached subscription row is reused
+    TRIAL_FILTER_CAPACITY = 100_000  # Initial capacity of the tracked-trial Bloom filter
+
     def __init__(
         self,
         subscription_repo: SubscriptionRepository,
@@ -58,14 +79,44 @@ class SubscriptionService:
         self.notification_service = notification_service
         self.metrics = metrics
 
-        # Configuration from config.py
-        self.TRIAL_DAYS = config.TRIAL_DAYS
-        self.GRACE_PERIOD_DAYS = config.GRACE_PERIOD_DAYS
-        self.SUBSCRIPTION_PRICE_USD = config.SUBSCRIPTION_PRICE_USD
-        self.TRIAL_COOLDOWN_DAYS = config.TRIAL_COOLDOWN_DAYS
-        self.MAX_TRIALS_PER_CREATOR = config.MAX_TRIALS_PER_CREATOR
+        # Process-local L1 for subscription rows by group_id (None = no subscription)
+        self._sub_cache = TTLCache(
+            maxsize=self.SUBSCRIPTION_CACHE_SIZE,
+            ttl=self.SUBSCRIPTION_CACHE_TTL
+        )
+
+        # In-flight subscription row loads, shared by concurrent callers
+        self._subscription_loads: Dict[int, asyncio.Future] = {}
+
+        # Bloom filter of tracked trial fingerprints and creators, built on first use
+        self._trial_filter: Optional[ScalableBloomFilter] = None
+        self._trial_filter_lock = asyncio.Lock()
+
+        # Callbacks invoked with a group_id when its subscription state changes
+        self._state_change_listeners: List[Callable[[int], None]] = []
 
         logger.info("SubscriptionService initialized")
+
+    def add_state_change_listener(self, listener: Callable[[int], None]):
+        """
+        Register a callback for subscription state changes.
+
+        Used by consumers that react to subscription changes, such as the
+        subscription checker schedule.
+
+        Args:
+            listener: Callable receiving the affected group_id
+        """
+        if listener not in self._state_change_listeners:
+            self._state_change_listeners.append(listener)
+
+    def _notify_state_change(self, group_id: int):
+        """Inform listeners that a group's subscription state changed."""
+        for listener in self._state_change_listeners:
+            try:
+                listener(group_id)
+            except Exception as e:
+                logger.error(f"Subscription state listener failed for group {group_id}: {e}")
     
     async def create_trial_subscription(
         self,
@@ -94,21 +145,14 @@ class SubscriptionService:
                 logger.info(f"Subscription already exists for group {group_id}")
                 return existing
             
+            # One clock reading for the abuse cooldown and the trial dates
+            trial_start = datetime.now()
+            
             # Check for trial abuse
-            if creator_user_id:
-                is_abuse = await self.check_trial_abuse(
-                    group_id,
-                    group_name,
-                    creator_user_id
-                )
-                
-                if is_abuse:
-                    logger.warning(f"Trial abuse detected for group {group_id}")
-                    self.metrics.inc_counter("trial_abuse_detected")
-                    return None
+            if await self._reject_trial_abuse(group_id, group_name, creator_user_id, trial_start):
+                return None
             
             # Calculate dates
-            trial_start = datetime.now()
             trial_end = trial_start + timedelta(days=self.TRIAL_DAYS)
             
             # Create subscription
@@ -123,48 +167,166 @@ class SubscriptionService:
                 logger.error(f"Failed to create subscription for group {group_id}")
                 return None
             
-            # Update group with subscription info
-            await self.group_repo.update(group_id, {
-                'subscription_status': 'trial',
-                'trial_ends_at': trial_end.isoformat()
-            })
-            
-            # Log event
-            await self.subscription_repo.log_event(
-                subscription['subscription_id'],
-                group_id,
-                'trial_started',
-                {'group_name': group_name, 'trial_days': self.TRIAL_DAYS}
-            )
+            # The remaining side effects are independent; run them concurrently
+            side_effects = {
+                # Update group with subscription info
+                'group update': self.group_repo.update(group_id, {
+                    'subscription_status': 'trial',
+                    'trial_ends_at': trial_end.isoformat()
+                }),
+                # Log event
+                'event log': self.subscription_repo.log_event(
+                    subscription['subscription_id'],
+                    group_id,
+                    'trial_started',
+                    {'group_name': group_name, 'trial_days': self.TRIAL_DAYS}
+                )
+            }
             
             # Track trial for abuse detection
             if creator_user_id:
-                await self.subscription_repo.track_trial(
+                side_effects['trial tracking'] = self.subscription_repo.track_trial(
                     group_id,
                     group_name,
                     creator_user_id
                 )
             
-            self.metrics.inc_counter("trials_created")
-            logger.info(f"Created trial subscription for group {group_id} ({group_name})")
-
-            # Send trial started notification
-            if self.notification_service:
-                try:
-                    await self.notification_service.send_trial_started_notification(
-                        group_id=group_id,
-                        trial_days=self.TRIAL_DAYS,
-                        trial_end_date=trial_end
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to send trial started notification: {e}")
+            await self._finish_trial(group_id, group_name, trial_end, creator_user_id, side_effects)
 
             return subscription
 
         except Exception as e:
-            logger.error(f"Error creating trial subscription: {e}", exc_info=True)
+            logger.exception("Error creating trial subscription: %s", e)
             return None
 
+    async def create_group_with_trial(
+        self,
+        group_id: int,
+        group_name: str,
+        posting_time: str = "09:00",
+        trader_type: str = "investor",
+        creator_user_id: Optional[int] = None
+    ) -> bool:
+        """
+        Register a new group and start its trial with a single transaction.
+        
+        Creates the group alone when it already has a subscription or trial
+        abuse is detected, and falls back to separate writes if the
+        transaction fails.
+        
+        Args:
+            group_id: Telegram group ID
+            group_name: Group name
+            posting_time: Daily posting time
+            trader_type: Trader type for content
+            creator_user_id: User ID who added the bot
+            
+        Returns:
+            True if the group was created
+        """
+        existing = await self.subscription_repo.find_by_group_id(group_id)
+        if existing:
+            logger.info(f"Subscription already exists for group {group_id}")
+        
+        # One clock reading for the abuse cooldown and the trial dates
+        trial_start = datetime.now()
+        
+        if existing or await self._reject_trial_abuse(group_id, group_name, creator_user_id, trial_start):
+            return await self.group_repo.create(group_id, group_name, posting_time, trader_type)
+        
+        # Calculate dates
+        trial_end = trial_start + timedelta(days=self.TRIAL_DAYS)
+        
+        created = await self.group_repo.register_group_with_trial(
+            group_id,
+            group_name,
+            posting_time,
+            trader_type,
+            trial_start,
+            trial_end,
+            event_data={'group_name': group_name, 'trial_days': self.TRIAL_DAYS},
+            fingerprint=trial_fingerprint(group_id, group_name) if creator_user_id else None,
+            creator_user_id=creator_user_id
+        )
+        if not created:
+            # Fall back to the step-by-step path so the group is still registered
+            logger.warning(f"Atomic registration failed for group {group_id}, creating group and trial separately")
+            if not await self.group_repo.create(group_id, group_name, posting_time, trader_type):
+                return False
+            if not await self.create_trial_subscription(group_id, group_name, creator_user_id):
+                logger.warning(f"Failed to create trial subscription for group {group_id}")
+            return True
+        
+        await self._finish_trial(group_id, group_name, trial_end, creator_user_id)
+        return True
+
+    async def _reject_trial_abuse(
+        self,
+        group_id: int,
+        group_name: str,
+        creator_user_id: Optional[int],
+        now: Optional[datetime] = None
+    ) -> bool:
+        """Run the abuse check for a new trial, recording any detection."""
+        if not creator_user_id:
+            return False
+        
+        if await self.check_trial_abuse(group_id, group_name, creator_user_id, now):
+            logger.warning(f"Trial abuse detected for group {group_id}")
+            self.metrics.inc_counter("trial_abuse_detected")
+            return True
+        return False
+
+    async def _finish_trial(
+        self,
+        group_id: int,
+        group_name: str,
+        trial_end: datetime,
+        creator_user_id: Optional[int],
+        side_effects: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Run the work that follows a committed trial.
+        
+        Drops cached posting state, records the trial in the abuse filter,
+        sends the trial started notification alongside any remaining side
+        effects, and informs state change listeners.
+        """
+        side_effects = side_effects or {}
+        await self._invalidate_posting_allowed(group_id)
+        
+        if creator_user_id:
+            self._remember_trial(trial_fingerprint(group_id, group_name), creator_user_id)
+        
+        # Send trial started notification
+        if self.notification_service:
+            side_effects['trial started notification'] = (
+                self.notification_service.send_trial_started_notification(
+                    group_id=group_id,
+                    trial_days=self.TRIAL_DAYS,
+                    trial_end_date=trial_end
+                )
+            )
+        
+        await self._run_side_effects(side_effects, group_id)
+        self._notify_state_change(group_id)
+        
+        self.metrics.inc_counter("trials_created")
+        logger.info(f"Created trial subscription for group {group_id} ({group_name})")
+
+    async def _run_side_effects(self, side_effects: Dict[str, Any], group_id: int):
+        """
+        Await independent side effects concurrently, logging each failure.
+        
+        Args:
+            side_effects: Coroutines keyed by a description used in logs
+            group_id: Telegram group ID the side effects belong to
+        """
+        results = await asyncio.gather(*side_effects.values(), return_exceptions=True)
+        for name, result in zip(side_effects, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed {name} for group {group_id}: {result}")
+
     def set_notification_service(self, notification_service: 'NotificationService'):
         """
         Set notification service for sending automated notifications.
@@ -184,6 +346,10 @@ class SubscriptionService:
         - Subscription is active
         - In grace period
         
+        The decision is made from the cached subscription row, so end
+        dates are always checked against the current time, and concurrent
+        lookups for an uncached group share one database read.
+        
         Args:
             group_id: Telegram group ID
             
@@ -191,41 +357,144 @@ class SubscriptionService:
             True if posting allowed
         """
         try:
-            subscription = await self.subscription_repo.find_by_group_id(group_id)
-            
-            if not subscription:
-                # No subscription = no posting
-                return False
+            subscription = self._sub_cache.get(group_id, _MISSING)
+            if subscription is _MISSING:
+                # Single flight: a burst of misses for one group reads the row once
+                load = self._subscription_loads.get(group_id)
+                if load is None:
+                    load = asyncio.ensure_future(self._get_subscription_cached(group_id))
+                    self._subscription_loads[group_id] = load
+                    try:
+                        subscription = await load
+                    finally:
+                        if self._subscription_loads.get(group_id) is load:
+                            del self._subscription_loads[group_id]
+                else:
+                    subscription = await asyncio.shield(load)
             
-            status = subscription['subscription_status']
-            now = datetime.now()
+            return self._posting_allowed_from_row(subscription, time.time())[0]
             
-            # Active subscription
-            if status == 'active':
-                if subscription['subscription_end_date']:
-                    end_date = datetime.fromisoformat(subscription['subscription_end_date'])
-                    if end_date > now:
-                        return True
+        except Exception as e:
+            logger.exception("Error checking posting permission for group %s: %s", group_id, e)
+            return False
+    
+    async def is_posting_allowed_bulk(self, group_ids: List[int]) -> Dict[int, bool]:
+        """
+        Check posting permission for many groups with one database read.
+        
+        Groups with a fresh cached row are answered from memory; the rest
+        are fetched together and cached.
+        
+        Args:
+            group_ids: Telegram group IDs
             
-            # Active trial
-            elif status == 'trial':
-                if subscription['trial_end_date']:
-                    trial_end = datetime.fromisoformat(subscription['trial_end_date'])
-                    if trial_end > now:
-                        return True
+        Returns:
+            Dictionary mapping group_id to whether posting is allowed
+        """
+        subscriptions: Dict[int, Optional[Dict[str, Any]]] = {}
+        missing = []
+        for group_id in group_ids:
+            subscription = self._sub_cache.get(group_id, _MISSING)
+            if subscription is _MISSING:
+                missing.append(group_id)
+            else:
+                subscriptions[group_id] = subscription
+        
+        try:
+            if missing:
+                rows = await self.subscription_repo.find_by_group_ids(missing, parse_dates=True)
+                loaded = {row['group_id']: row for row in rows}
+                for group_id in missing:
+                    subscriptions[group_id] = loaded.get(group_id)
+                    self._sub_cache.set(group_id, subscriptions[group_id])
+            
+            now_ts = time.time()
+            return {
+                group_id: self._posting_allowed_from_row(subscription, now_ts)[0]
+                for group_id, subscription in subscriptions.items()
+            }
             
-            # Grace period
-            elif status == 'grace_period':
-                if subscription['grace_period_end']:
-                    grace_end = datetime.fromisoformat(subscription['grace_period_end'])
-                    if grace_end > now:
-                        return True
+        except Exception as e:
+            logger.exception("Error checking posting permission for %s groups: %s", len(group_ids), e)
+            return {group_id: False for group_id in group_ids}
+    
+    @staticmethod
+    def _posting_allowed_from_row(
+        subscription: Optional[Dict[str, Any]],
+        now_ts: float
+    ) -> Tuple[bool, Optional[float]]:
+        """
+        Decide posting permission from an already loaded subscription row.
+        
+        Args:
+            subscription: Subscription row loaded with parse_dates, or None
+            now_ts: Unix time to evaluate the end dates against
             
-            return False
+        Returns:
+            (allowed, unix time the permission ends or None)
+        """
+        if not subscription:
+            # No subscription = no posting
+            return False, None
+        
+        status = subscription['subscription_status']
+        
+        # Active subscription
+        if status == 'active':
+            end_ts = subscription['subscription_end_ts']
+        
+        # Active trial
+        elif status == 'trial':
+            end_ts = subscription['trial_end_ts']
+        
+        # Grace period
+        elif status == 'grace_period':
+            end_ts = subscription['grace_period_end_ts']
+        
+        else:
+            return False, None
+        
+        if end_ts is not None and end_ts > now_ts:
+            return True, end_ts
+        
+        return False, None
+    
+    async def _get_subscription_cached(self, group_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a group's subscription row, served from the L1 cache when fresh.
+        
+        Date columns are parsed to datetime once, when the row is loaded.
+        
+        Args:
+            group_id: Telegram group ID
             
-        except Exception as e:
-            logger.error(f"Error checking posting permission for group {group_id}: {e}", exc_info=True)
-            return False
+        Returns:
+            Subscription row with datetime dates (shared; do not modify) or None
+        """
+        subscription = self._sub_cache.get(group_id, _MISSING)
+        if subscription is _MISSING:
+            subscription = await self.subscription_repo.find_by_group_id(group_id, parse_dates=True)
+            self._sub_cache.set(group_id, subscription)
+        return subscription
+    
+    async def _invalidate_posting_allowed(self, group_id: int):
+        """Drop a group's cached subscription row after a state change."""
+        self._sub_cache.pop(group_id, None)
+        self._subscription_loads.pop(group_id, None)
+    
+    async def invalidate_groups(self, group_ids: List[int]):
+        """
+        Drop cached posting state for groups changed outside this service.
+        
+        Used after batch status updates, such as the checker moving trials
+        to grace period, so cached decisions and listeners see the change.
+        
+        Args:
+            group_ids: Telegram group IDs whose subscription state changed
+        """
+        for group_id in group_ids:
+            await self._invalidate_posting_allowed(group_id)
+            self._notify_state_change(group_id)
     
     async def activate_subscription(
         self,
@@ -245,7 +514,7 @@ class SubscriptionService:
             True if successful
         """
         try:
-            subscription = await self.subscription_repo.find_by_id(subscription_id)
+            subscription = await self.subscription_repo.find_by_id(subscription_id, parse_dates=True)
             
             if not subscription:
                 logger.error(f"Subscription not found: {subscription_id}")
@@ -257,13 +526,13 @@ class SubscriptionService:
             # If trial, start from trial end date
             if subscription['subscription_status'] == 'trial':
                 if subscription['trial_end_date']:
-                    start_date = datetime.fromisoformat(subscription['trial_end_date'])
+                    start_date = subscription['trial_end_date']
                 else:
                     start_date = now
             else:
                 # Renewal - start from current end date or now
                 if subscription['subscription_end_date']:
-                    current_end = datetime.fromisoformat(subscription['subscription_end_date'])
+                    current_end = subscription['subscription_end_date']
                     start_date = current_end if current_end > now else now
                 else:
                     start_date = now
@@ -271,53 +540,70 @@ class SubscriptionService:
             end_date = start_date + timedelta(days=30 * months)
             next_billing = end_date - timedelta(days=7)  # Remind 7 days before
             
-            # Update subscription
-            await self.subscription_repo.update(subscription_id, {
+            fields = {
                 'subscription_status': 'active',
                 'subscription_start_date': start_date.isoformat(),
                 'subscription_end_date': end_date.isoformat(),
                 'next_billing_date': next_billing.isoformat()
-            })
-            
-            # Update group
-            await self.group_repo.update(subscription['group_id'], {
-                'subscription_status': 'active',
-                'is_active': 1
-            })
+            }
+            event_data = {'payment_id': payment_id, 'months': months, 'end_date': end_date.isoformat()}
             
-            # Log event
-            await self.subscription_repo.log_event(
+            # Subscription, group and event log written in one transaction
+            side_effects = {}
+            if not await self.subscription_repo.activate_and_log(
                 subscription_id,
                 subscription['group_id'],
-                'subscription_activated',
-                {'payment_id': payment_id, 'months': months, 'end_date': end_date.isoformat()}
-            )
+                fields,
+                event_data
+            ):
+                logger.warning(f"Atomic activation failed for subscription {subscription_id}, writing separately")
+                
+                # Update subscription
+                await self.subscription_repo.update(subscription_id, fields)
+                
+                # Update group
+                side_effects['group update'] = self.group_repo.update(subscription['group_id'], {
+                    'subscription_status': 'active',
+                    'is_active': 1
+                })
+                # Log event
+                side_effects['event log'] = self.subscription_repo.log_event(
+                    subscription_id,
+                    subscription['group_id'],
+                    'subscription_activated',
+                    event_data
+                )
+            
+            await self._invalidate_posting_allowed(subscription['group_id'])
             
-            self.metrics.inc_counter("subscriptions_activated")
-            logger.info(f"Activated subscription {subscription_id} for {months} month(s)")
-
             # Send subscription activated notification
             if self.notification_service:
-                try:
-                    await self.notification_service.send_subscription_activated_notification(
+                side_effects['subscription activated notification'] = (
+                    self.notification_service.send_subscription_activated_notification(
                         group_id=subscription['group_id'],
                         subscription_end_date=end_date,
                         next_billing_date=next_billing
                     )
-                except Exception as e:
-                    logger.error(f"Failed to send subscription activated notification: {e}")
+                )
+            
+            await self._run_side_effects(side_effects, subscription['group_id'])
+            self._notify_state_change(subscription['group_id'])
+            
+            self.metrics.inc_counter("subscriptions_activated")
+            logger.info(f"Activated subscription {subscription_id} for {months} month(s)")
 
             return True
 
         except Exception as e:
-            logger.error(f"Error activating subscription {subscription_id}: {e}", exc_info=True)
+            logger.exception("Error activating subscription %s: %s", subscription_id, e)
             return False
     
     async def check_trial_abuse(
         self,
         group_id: int,
         group_title: str,
-        creator_user_id: int
+        creator_user_id: int,
+        now: Optional[datetime] = None
     ) -> bool:
         """
         Check for trial abuse patterns.
@@ -328,43 +614,92 @@ class SubscriptionService:
             group_id: Telegram group ID
             group_title: Group title
             creator_user_id: User ID who created the trial
+            now: Time to evaluate the cooldown against (defaults to now)
             
         Returns:
             True if abuse detected
         """
         try:
-            # Generate fingerprint
-            fingerprint = hashlib.sha256(
-                f"{group_id}:{group_title}".encode()
-            ).hexdigest()
+            # Generate fingerprints; trials tracked before BLAKE2b carry the SHA-256 one
+            fingerprints = [
+                trial_fingerprint(group_id, group_title),
+                legacy_trial_fingerprint(group_id, group_title)
+            ]
+            
+            # Fast path: neither the fingerprint nor the creator has a tracked
+            # trial, so no rule can match (Bloom filters have no false negatives)
+            trial_filter = await self._get_trial_filter()
+            if (
+                trial_filter is not None
+                and self.MAX_TRIALS_PER_CREATOR > 0
+                and not any(f"fp:{fingerprint}" in trial_filter for fingerprint in fingerprints)
+                and f"creator:{creator_user_id}" not in trial_filter
+            ):
+                return False
+            
+            # Latest same-fingerprint trial and creator trial count, in one query
+            signals = await self.subscription_repo.find_trial_abuse_signals(
+                fingerprints,
+                creator_user_id
+            )
             
             # Check for existing trials with same fingerprint
-            existing = await self.subscription_repo.find_by_fingerprint(fingerprint)
+            last_trial_str = signals['fingerprint']['last_started_at']
             
-            if existing:
+            if last_trial_str:
                 # Check cooldown period
-                last_trial_str = existing[0]['trial_started_at']
                 last_trial = datetime.fromisoformat(last_trial_str)
                 cooldown_end = last_trial + timedelta(days=self.TRIAL_COOLDOWN_DAYS)
                 
-                if datetime.now() < cooldown_end:
+                if (now or datetime.now()) < cooldown_end:
                     logger.warning(f"Trial abuse: Same fingerprint within cooldown period")
                     return True
             
             # Check trials by creator
-            creator_trials = await self.subscription_repo.find_by_creator(creator_user_id)
+            creator_trials = signals['creator']['trial_count']
             
-            if len(creator_trials) >= self.MAX_TRIALS_PER_CREATOR:
-                logger.warning(f"Trial abuse: Creator has {len(creator_trials)} trials")
+            if creator_trials >= self.MAX_TRIALS_PER_CREATOR:
+                logger.warning(f"Trial abuse: Creator has {creator_trials} trials")
                 return True
             
             return False
             
         except Exception as e:
-            logger.error(f"Error checking trial abuse: {e}", exc_info=True)
+            logger.exception("Error checking trial abuse: %s", e)
             # On error, allow trial (fail open)
             return False
     
+    def _remember_trial(self, fingerprint: str, creator_user_id: int):
+        """Add a newly tracked trial to the Bloom filter, if it is built."""
+        if self._trial_filter is not None:
+            self._trial_filter.add(f"fp:{fingerprint}")
+            self._trial_filter.add(f"creator:{creator_user_id}")
+    
+    async def _get_trial_filter(self) -> Optional[ScalableBloomFilter]:
+        """
+        Get the Bloom filter of tracked trials, building it on first use.
+        
+        Returns:
+            Filter over 'fp:<fingerprint>' and 'creator:<user_id>' keys, or
+            None if it could not be built (callers then query the database)
+        """
+        if self._trial_filter is not None:
+            return self._trial_filter
+        
+        async with self._trial_filter_lock:
+            if self._trial_filter is None:
+                try:
+                    bloom = ScalableBloomFilter(initial_capacity=self.TRIAL_FILTER_CAPACITY)
+                    async for row in self.subscription_repo.iter_tracked_trials():
+                        bloom.add(f"fp:{row['group_title_hash']}")
+                        bloom.add(f"creator:{row['creator_user_id']}")
+                    self._trial_filter = bloom
+                    logger.info(f"Loaded {len(bloom)} trial abuse keys into Bloom filter")
+                except Exception as e:
+                    logger.error(f"Failed to build trial abuse Bloom filter: {e}")
+        
+        return self._trial_filter
+    
     async def get_subscription(self, group_id: int) -> Optional[Dict[str, Any]]:
         """
         Get subscription for a group.
@@ -373,12 +708,14 @@ class SubscriptionService:
             group_id: Telegram group ID
             
         Returns:
-            Subscription data or None
+            Subscription data (dates as datetime) or None
         """
         try:
-            return await self.subscription_repo.find_by_group_id(group_id)
+            subscription = await self._get_subscription_cached(group_id)
+            # Callers may modify the result; keep the cached row intact
+            return dict(subscription) if subscription else None
         except Exception as e:
-            logger.error(f"Error getting subscription for group {group_id}: {e}", exc_info=True)
+            logger.exception("Error getting subscription for group %s: %s", group_id, e)
             return None
     
     async def get_subscription_status(self, group_id: int) -> Dict[str, Any]:
@@ -392,7 +729,7 @@ class SubscriptionService:
             Dictionary with status information
         """
         try:
-            subscription = await self.subscription_repo.find_by_group_id(group_id)
+            subscription = await self._get_subscription_cached(group_id)
             
             if not subscription:
                 return {
@@ -407,19 +744,20 @@ class SubscriptionService:
             result = {
                 'has_subscription': True,
                 'status': status,
-                'posting_allowed': await self.is_posting_allowed(group_id)
+                # Reuse the row already loaded instead of a second lookup
+                'posting_allowed': self._posting_allowed_from_row(subscription, now.timestamp())[0]
             }
             
             # Add trial info
             if status == 'trial' and subscription['trial_end_date']:
-                trial_end = datetime.fromisoformat(subscription['trial_end_date'])
+                trial_end = subscription['trial_end_date']
                 days_left = (trial_end - now).days
                 result['trial_days_left'] = max(0, days_left)
                 result['trial_end_date'] = trial_end.isoformat()
             
             # Add subscription info
             if status == 'active' and subscription['subscription_end_date']:
-                sub_end = datetime.fromisoformat(subscription['subscription_end_date'])
+                sub_end = subscription['subscription_end_date']
                 days_left = (sub_end - now).days
                 result['subscription_days_left'] = max(0, days_left)
                 result['subscription_end_date'] = sub_end.isoformat()
@@ -427,7 +765,7 @@ class SubscriptionService:
             return result
             
         except Exception as e:
-            logger.error(f"Error getting subscription status: {e}", exc_info=True)
+            logger.exception("Error getting subscription status: %s", e)
             return {
                 'has_subscription': False,
                 'status': 'error',
@@ -3,8 +3,11 @@ User service for AI Market Insight Bot.
 Handles user management and preferences.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List, TYPE_CHECKING
+import random
+import time
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
 
 from core.metrics import MetricsCollector
 from repositories.user_repository import UserRepository
@@ -27,6 +30,12 @@ class UserService:
     - Activity tracking
     """
 
+    USER_STATS_TTL = 60.0  # Seconds cached user stats are served
+    # Fraction of the TTL after which a read may trigger an early background refresh
+    USER_STATS_EARLY_REFRESH = 0.8
+    LAST_ACTIVE_FLUSH_INTERVAL = 30.0  # Seconds between last active write-backs
+    LAST_ACTIVE_FLUSH_SIZE = 500  # Buffered users that trigger an early write-back
+
     def __init__(
         self,
         user_repo: UserRepository,
@@ -48,6 +57,15 @@ class UserService:
         self.metrics = metrics
         self.subscription_service = subscription_service
 
+        # (monotonic load time, stats) and the refresh currently in flight
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._stats_refresh: Optional[asyncio.Task] = None
+
+        # chat_id -> latest activity time, written back in batches
+        self._last_active_buffer: Dict[int, float] = {}
+        self._last_active_full = asyncio.Event()
+        self._last_active_task: Optional[asyncio.Task] = None
+
         logger.info("UserService initialized")
 
     def set_subscription_service(self, subscription_service: 'SubscriptionService'):
@@ -81,7 +99,7 @@ class UserService:
             
             if existing:
                 # Update last active
-                await self.user_repo.update_last_active(chat_id)
+                self._touch_last_active(chat_id)
                 logger.info(f"User {chat_id} already registered")
                 return True
             
@@ -95,7 +113,7 @@ class UserService:
             return success
             
         except Exception as e:
-            logger.error(f"Error registering user {chat_id}: {e}", exc_info=True)
+            logger.exception("Error registering user %s: %s", chat_id, e)
             return False
     
     async def get_user(self, chat_id: int) -> Optional[Dict[str, Any]]:
@@ -113,14 +131,67 @@ class UserService:
             
             if user:
                 # Update last active
-                await self.user_repo.update_last_active(chat_id)
+                self._touch_last_active(chat_id)
             
             return user
             
         except Exception as e:
-            logger.error(f"Error getting user {chat_id}: {e}", exc_info=True)
+            logger.exception("Error getting user %s: %s", chat_id, e)
             return None
     
+    def _touch_last_active(self, chat_id: int):
+        """Record user activity; the write happens in the next batch flush."""
+        self._last_active_buffer[chat_id] = time.time()
+        
+        if self._last_active_task is None or self._last_active_task.done():
+            self._last_active_task = asyncio.create_task(self._last_active_writer())
+        if len(self._last_active_buffer) >= self.LAST_ACTIVE_FLUSH_SIZE:
+            self._last_active_full.set()
+    
+    async def _last_active_writer(self):
+        """Flush buffered activity every interval, or sooner once the buffer fills."""
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._last_active_full.wait(),
+                    timeout=self.LAST_ACTIVE_FLUSH_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._last_active_full.clear()
+            await self.flush_last_active()
+    
+    async def flush_last_active(self) -> int:
+        """
+        Write buffered last active timestamps to the database.
+        
+        Returns:
+            Number of users updated
+        """
+        if not self._last_active_buffer:
+            return 0
+        
+        pending, self._last_active_buffer = self._last_active_buffer, {}
+        try:
+            return await self.user_repo.bulk_update_last_active(pending)
+        except Exception as e:
+            logger.error(f"Failed to flush last active for {len(pending)} users: {e}")
+            # Keep the updates for the next flush without overwriting newer activity
+            for chat_id, ts in pending.items():
+                self._last_active_buffer.setdefault(chat_id, ts)
+            return 0
+    
+    async def close(self):
+        """Write pending last active timestamps and stop the background writer."""
+        if self._last_active_task is not None:
+            self._last_active_task.cancel()
+            try:
+                await self._last_active_task
+            except asyncio.CancelledError:
+                pass
+            self._last_active_task = None
+        await self.flush_last_active()
+    
     async def update_trader_type(
         self,
         chat_id: int,
@@ -145,7 +216,7 @@ class UserService:
             return success
             
         except Exception as e:
-            logger.error(f"Error updating trader type for {chat_id}: {e}", exc_info=True)
+            logger.exception("Error updating trader type for %s: %s", chat_id, e)
             return False
     
     async def get_or_create_user(
@@ -164,17 +235,19 @@ class UserService:
             User data
         """
         try:
-            user = await self.user_repo.get_or_create(chat_id, trader_type)
+            user, created = await self.user_repo.get_or_create(chat_id, trader_type)
             
-            if user:
-                # Update metrics
+            if created:
+                # Only a new user changes the total
                 total_users = await self.user_repo.count_total()
                 self.metrics.set_gauge("bot_users_total", total_users)
+            elif user:
+                self._touch_last_active(chat_id)
             
             return user
             
         except Exception as e:
-            logger.error(f"Error getting/creating user {chat_id}: {e}", exc_info=True)
+            logger.exception("Error getting/creating user %s: %s", chat_id, e)
             return None
     
     async def register_group(
@@ -206,31 +279,27 @@ class UserService:
                 logger.info(f"Group {group_id} already registered")
                 return True
 
-            # Create new group
-            success = await self.group_repo.create(
-                group_id,
-                group_name,
-                posting_time,
-                trader_type
-            )
-
-            if not success:
-                logger.error(f"Failed to create group {group_id}")
-                return False
-
-            # Create trial subscription if subscription service is available
             if self.subscription_service:
-                subscription = await self.subscription_service.create_trial_subscription(
+                # Group, trial subscription, event and abuse tracking in one transaction
+                success = await self.subscription_service.create_group_with_trial(
                     group_id,
                     group_name,
+                    posting_time,
+                    trader_type,
                     creator_user_id
                 )
+            else:
+                # Create new group
+                success = await self.group_repo.create(
+                    group_id,
+                    group_name,
+                    posting_time,
+                    trader_type
+                )
 
-                if not subscription:
-                    logger.warning(f"Failed to create trial subscription for group {group_id}")
-                    # Don't fail the registration, but log the issue
-                else:
-                    logger.info(f"Created trial subscription for group {group_id}")
+            if not success:
+                logger.error(f"Failed to create group {group_id}")
+                return False
 
             self.metrics.inc_counter("bot_groups_total")
             logger.info(f"Registered new group: {group_id} ({group_name})")
@@ -238,7 +307,7 @@ class UserService:
             return True
             
         except Exception as e:
-            logger.error(f"Error registering group {group_id}: {e}", exc_info=True)
+            logger.exception("Error registering group %s: %s", group_id, e)
             return False
     
     async def get_group(self, group_id: int) -> Optional[Dict[str, Any]]:
@@ -254,7 +323,7 @@ class UserService:
         try:
             return await self.group_repo.find_by_id(group_id)
         except Exception as e:
-            logger.error(f"Error getting group {group_id}: {e}", exc_info=True)
+            logger.exception("Error getting group %s: %s", group_id, e)
             return None
     
     async def get_active_groups(self) -> List[Dict[str, Any]]:
@@ -262,10 +331,10 @@ class UserService:
         Get all active groups.
         
         Returns:
-            List of active groups
+            List of active groups (group_id, posting_time, trader_type)
         """
         try:
-            groups = await self.group_repo.find_active()
+            groups = await self.group_repo.find_active_minimal()
             
             # Update metrics
             self.metrics.set_gauge("bot_groups_total", len(groups))
@@ -273,7 +342,7 @@ class UserService:
             return groups
             
         except Exception as e:
-            logger.error(f"Error getting active groups: {e}", exc_info=True)
+            logger.exception("Error getting active groups: %s", e)
             return []
     
     async def update_group_posting_time(
@@ -300,7 +369,7 @@ class UserService:
             return success
             
         except Exception as e:
-            logger.error(f"Error updating posting time for {group_id}: {e}", exc_info=True)
+            logger.exception("Error updating posting time for %s: %s", group_id, e)
             return False
     
     async def deactivate_group(self, group_id: int) -> bool:
@@ -322,7 +391,7 @@ class UserService:
             return success
 
         except Exception as e:
-            logger.error(f"Error deactivating group {group_id}: {e}", exc_info=True)
+            logger.exception("Error deactivating group %s: %s", group_id, e)
             return False
 
     async def pause_group(self, group_id: int) -> bool:
@@ -356,7 +425,7 @@ class UserService:
             return success
 
         except Exception as e:
-            logger.error(f"Error resuming group {group_id}: {e}", exc_info=True)
+            logger.exception("Error resuming group %s: %s", group_id, e)
             return False
 
     async def remove_group(self, group_id: int) -> bool:
@@ -379,7 +448,7 @@ class UserService:
             return success
 
         except Exception as e:
-            logger.error(f"Error removing group {group_id}: {e}", exc_info=True)
+            logger.exception("Error removing group %s: %s", group_id, e)
             return False
 
     async def update_group_post_time(self, group_id: int, post_time: str) -> bool:
@@ -419,35 +488,67 @@ class UserService:
             return success
 
         except Exception as e:
-            logger.error(f"Error updating trader type for group {group_id}: {e}", exc_info=True)
+            logger.exception("Error updating trader type for group %s: %s", group_id, e)
             return False
     
     async def get_user_stats(self) -> Dict[str, Any]:
         """
         Get user statistics.
         
+        Served from a cache for USER_STATS_TTL seconds. Reads late in the
+        TTL refresh it in the background with rising probability, so the
+        entry is usually renewed before it expires and callers never queue
+        up behind the aggregate queries together.
+        
         Returns:
             Dictionary with user stats
         """
         try:
-            total_users = await self.user_repo.count_total()
-            by_trader_type = await self.user_repo.count_by_trader_type()
-            total_groups = await self.group_repo.count_total()
-            active_groups = await self.group_repo.count_active()
+            if self._stats_cache is not None:
+                loaded_at, stats = self._stats_cache
+                age = (time.monotonic() - loaded_at) / self.USER_STATS_TTL
+                if age < 1.0:
+                    if random.random() < age - self.USER_STATS_EARLY_REFRESH:
+                        self._start_stats_refresh()
+                    return dict(stats)
             
-            return {
-                'total_users': total_users,
-                'by_trader_type': by_trader_type,
-                'total_groups': total_groups,
-                'active_groups': active_groups
-            }
+            # Expired or never loaded: share a single refresh between callers
+            return dict(await asyncio.shield(self._start_stats_refresh()))
             
         except Exception as e:
-            logger.error(f"Error getting user stats: {e}", exc_info=True)
+            logger.exception("Error getting user stats: %s", e)
             return {
                 'total_users': 0,
                 'by_trader_type': {},
                 'total_groups': 0,
                 'active_groups': 0
             }
-
+    
+    def _start_stats_refresh(self) -> asyncio.Task:
+        """Start a user stats refresh unless one is already running."""
+        if self._stats_refresh is None or self._stats_refresh.done():
+            self._stats_refresh = asyncio.create_task(self._load_user_stats())
+            self._stats_refresh.add_done_callback(self._log_stats_refresh_error)
+        return self._stats_refresh
+    
+    @staticmethod
+    def _log_stats_refresh_error(task: asyncio.Task):
+        """Log background refresh failures; foreground callers see them directly."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"User stats refresh failed: {task.exception()}")
+    
+    async def _load_user_stats(self) -> Dict[str, Any]:
+        """Run the aggregate queries and cache the result."""
+        total_users = await self.user_repo.count_total()
+        by_trader_type = await self.user_repo.count_by_trader_type()
+        total_groups = await self.group_repo.count_total()
+        active_groups = await self.group_repo.count_active()
+        
+        stats = {
+            'total_users': total_users,
+            'by_trader_type': by_trader_type,
+            'total_groups': total_groups,
+            'active_groups': active_groups
+        }
+        self._stats_cache = (time.monotonic(), stats)
+        return stats
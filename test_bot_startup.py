@@ -4,57 +4,88 @@ Quick test to verify bot components load correctly.
 
 import sys
 import asyncio
+import traceback
+
+# Load the whole bot import graph up front, before the event loop starts;
+# a failure is kept and reported by test_imports()
+_import_error = None
+try:
+    from bot import EnterpriseBot
+    from handlers import UserHandlers, AdminHandlers
+    from services import NewsService, UserService, AnalyticsService, SchedulerService
+    from core import init_container, shutdown_container
+except Exception as e:
+    _import_error = e
+
+# Event loop lag probe: how often it wakes, and the worst lateness allowed
+# while the bot initializes (more means a blocking call on the loop)
+LOOP_PROBE_INTERVAL = 0.01
+MAX_LOOP_LAG = 0.1
+
+async def _probe_loop_lag(lags, stop):
+    """Record how late each short sleep wakes up until stop is set."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(LOOP_PROBE_INTERVAL)
+        lags.append(loop.time() - started - LOOP_PROBE_INTERVAL)
 
 async def test_imports():
     """Test that all imports work."""
     print("Testing imports...")
     
-    try:
-        from bot import EnterpriseBot
-        print("✅ EnterpriseBot imported")
-        
-        from handlers import UserHandlers, AdminHandlers
-        print("✅ Handlers imported")
-        
-        from services import NewsService, UserService, AnalyticsService, SchedulerService
-        print("✅ Services imported")
-        
-        from core import init_container
-        print("✅ Core components imported")
-        
-        print("\n✅ All imports successful!")
-        return True
-        
-    except Exception as e:
-        print(f"\n❌ Import error: {e}")
-        import traceback
-        traceback.print_exc()
+    if _import_error is not None:
+        print(f"\n❌ Import error: {_import_error}")
+        traceback.print_exception(_import_error)
         return False
+    
+    print("✅ EnterpriseBot imported")
+    print("✅ Handlers imported")
+    print("✅ Services imported")
+    print("✅ Core components imported")
+    
+    print("\n✅ All imports successful!")
+    return True
 
 async def test_bot_initialization():
     """Test bot initialization."""
     print("\nTesting bot initialization...")
     
     try:
-        from bot import EnterpriseBot
-        
         bot = EnterpriseBot()
         print("✅ Bot instance created")
         
-        await bot.initialize()
+        # Watch the event loop while initializing to catch blocking calls
+        lags = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_loop_lag(lags, stop))
+        try:
+            await bot.initialize()
+        finally:
+            stop.set()
+            await probe
         print("✅ Services initialized")
         
-        print("\n✅ Bot initialization successful!")
+        lags.sort()
+        worst = lags[-1] if lags else 0.0
+        if lags:
+            print(
+                f"⏱️  Event loop lag: p50 {lags[len(lags) // 2] * 1000:.1f}ms, "
+                f"p99 {lags[int(len(lags) * 0.99)] * 1000:.1f}ms, max {worst * 1000:.1f}ms"
+            )
         
         # Cleanup
-        from core import shutdown_container
         await shutdown_container()
         
+        if worst >= MAX_LOOP_LAG:
+            print(f"\n❌ Initialization blocked the event loop for {worst * 1000:.0f}ms")
+            return False
+        
+        print("\n✅ Bot initialization successful!")
         return True
         
     except Exception as e:
         print(f"\n❌ Initialization error: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
@@ -78,5 +109,13 @@ async def main():
     print("\nYour bot is ready to run with: python bot.py")
 
 if __name__ == "__main__":
+    # Faster event loop where available (optional dependency)
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
     asyncio.run(main())
 
@@ -4,16 +4,12 @@ Tests complete user flows from trial to subscription.
 """
 
 import asyncio
-import os
+import sqlite3
 import sys
 from datetime import datetime, timedelta
 
-# Test database
-TEST_DB = "test_e2e.db"
-
-# Clean up old test database
-if os.path.exists(TEST_DB):
-    os.remove(TEST_DB)
+# Shared in-memory database: lives as long as the pool's connections, nothing to clean up
+TEST_DB = "file::memory:?cache=shared"
 
 
 async def test_complete_subscription_flow():
@@ -30,17 +26,34 @@ async def test_complete_subscription_flow():
     print("="*60)
     
     from db_pool import ConnectionPool
+    
+    # Create database pool
+    # SQLite serializes writers anyway; one connection avoids lock contention
+    pool = ConnectionPool(db_path=TEST_DB, pool_size=1)
+    
+    # One handle for the test's own SQL, held for the whole flow; the
+    # repositories keep the pooled connection to themselves
+    conn = sqlite3.connect(TEST_DB, uri=True)
+    conn.row_factory = sqlite3.Row
+    
+    try:
+        return await _run_subscription_flow(pool, conn)
+    finally:
+        # Closing every connection frees the in-memory database; no waiting needed
+        conn.close()
+        pool.close_all()
+        print("\n🧹 Database connections closed")
+
+
+async def _run_subscription_flow(pool, conn) -> bool:
+    """Run the flow steps against an open pool and test connection."""
     from repositories.subscription_repository import SubscriptionRepository
     from repositories.payment_repository import PaymentRepository
     from repositories.group_repository import GroupRepository
     from services.subscription_service import SubscriptionService
-    from services.payment_service import PaymentService
     from services.notification_service import NotificationService
     from core.metrics import MetricsCollector
     
-    # Create database pool
-    pool = ConnectionPool(db_path=TEST_DB, pool_size=5)
-    
     # Create schema (using actual migration schema)
     print("\n📝 Setting up test database...")
     from migrations.migration_006_subscription_system import MIGRATION_006
@@ -57,14 +70,17 @@ async def test_complete_subscription_flow():
     );
     """
 
-    with pool.get_connection() as conn:
-        # Create groups table
-        conn.execute(groups_table)
-        # Create subscription tables from migration
-        for statement in MIGRATION_006:
-            if statement.strip():
-                conn.execute(statement)
-        conn.commit()
+    # Durability is irrelevant for a throwaway database
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    # Groups table plus the subscription tables from the migration,
+    # compiled and committed as one script
+    ddl = ";\n".join(
+        [groups_table.strip().rstrip(";")]
+        + [statement.strip() for statement in MIGRATION_006 if statement.strip()]
+    )
+    conn.executescript(f"BEGIN;\n{ddl};\nCOMMIT;")
 
     print("✅ Database schema created")
     
@@ -83,11 +99,6 @@ async def test_complete_subscription_flow():
         metrics=metrics,
         notification_service=notification_service
     )
-    payment_service = PaymentService(
-        payment_repo=payment_repo,
-        subscription_repo=subscription_repo,
-        metrics=metrics
-    )
     
     # Test data
     test_group_id = -1001234567890
@@ -99,7 +110,7 @@ async def test_complete_subscription_flow():
     print("="*60)
 
     # First, create the group record (required for foreign key)
-    with pool.get_connection() as conn:
+    with conn:
         conn.execute(
             """
             INSERT INTO groups (group_id, group_name, is_active, status)
@@ -107,7 +118,6 @@ async def test_complete_subscription_flow():
             """,
             (test_group_id, test_group_name)
         )
-        conn.commit()
     print(f"✅ Group record created: {test_group_name}")
 
     # Create trial subscription
@@ -142,10 +152,11 @@ async def test_complete_subscription_flow():
     print("="*60)
     
     # Manually expire the trial
-    expired_date = (datetime.now() - timedelta(days=1)).isoformat()
-    grace_end = (datetime.now() + timedelta(days=3)).isoformat()
+    now = datetime.now()
+    expired_date = (now - timedelta(days=1)).isoformat()
+    grace_end = (now + timedelta(days=3)).isoformat()
 
-    with pool.get_connection() as conn:
+    with conn:
         conn.execute(
             """
             UPDATE subscriptions
@@ -157,8 +168,9 @@ async def test_complete_subscription_flow():
             """,
             (expired_date, grace_end, subscription['subscription_id'])
         )
-        conn.commit()
     
+    # Direct writes bypass the service, so drop its cached subscription row
+    await subscription_service._invalidate_posting_allowed(test_group_id)
     print("✅ Trial expired, grace period activated")
     
     # Check posting permission during grace period
@@ -173,6 +185,14 @@ async def test_complete_subscription_flow():
     print("STEP 4: Create Payment Invoice")
     print("="*60)
     
+    # Payments are first needed here
+    from services.payment_service import PaymentService
+    payment_service = PaymentService(
+        payment_repo=payment_repo,
+        subscription_repo=subscription_repo,
+        metrics=metrics
+    )
+    
     # Note: This will fail without API key, but tests the logic
     invoice = await payment_service.create_invoice(
         subscription_id=subscription['subscription_id'],
@@ -187,7 +207,7 @@ async def test_complete_subscription_flow():
     else:
         print("⚠️  Invoice creation skipped (API key not configured - expected)")
         # Create mock payment record for testing
-        with pool.get_connection() as conn:
+        with conn:
             cursor = conn.execute(
                 """
                 INSERT INTO payments (subscription_id, group_id, amount_usd, currency, invoice_id, payment_status)
@@ -195,7 +215,6 @@ async def test_complete_subscription_flow():
                 """,
                 (subscription['subscription_id'], test_group_id, 15.00, 'btc', 'TEST_INVOICE_123', 'pending')
             )
-            conn.commit()
             payment_id = cursor.lastrowid
         print(f"✅ Mock payment record created (ID: {payment_id})")
     
@@ -241,7 +260,7 @@ async def test_complete_subscription_flow():
     print("="*60)
     
     # Manually expire the subscription
-    with pool.get_connection() as conn:
+    with conn:
         conn.execute(
             """
             UPDATE subscriptions
@@ -261,8 +280,9 @@ async def test_complete_subscription_flow():
             """,
             (test_group_id,)
         )
-        conn.commit()
     
+    # Direct writes bypass the service, so drop its cached subscription row
+    await subscription_service._invalidate_posting_allowed(test_group_id)
     print("✅ Subscription expired, group disabled")
     
     # Check posting permission with expired subscription
@@ -284,37 +304,32 @@ async def test_complete_subscription_flow():
     print(f"   • Trial period: {final_subscription['trial_start_date']} → {final_subscription['trial_end_date']}")
     print(f"   • Subscription period: {final_subscription['subscription_start_date']} → {final_subscription['subscription_end_date']}")
 
-    # Get payment records
-    with pool.get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM payments WHERE subscription_id = ?",
-            (subscription['subscription_id'],)
-        )
-        payments = [dict(row) for row in cursor.fetchall()]
-
-    print(f"\n✅ Payment records: {len(payments)}")
-    for payment in payments:
-        print(f"   • Invoice: {payment['invoice_id']}, Status: {payment['payment_status']}")
-
-    # Get events
-    with pool.get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM subscription_events WHERE subscription_id = ? ORDER BY created_at",
-            (subscription['subscription_id'],)
-        )
-        events = [dict(row) for row in cursor.fetchall()]
+    # Print payment records and events; rows stream from the cursor, with the
+    # count read first so it can head the list
+    subscription_id = subscription['subscription_id']
+    with conn:
+        (payment_count,) = conn.execute(
+            "SELECT COUNT(*) FROM payments WHERE subscription_id = ?",
+            (subscription_id,)
+        ).fetchone()
+        print(f"\n✅ Payment records: {payment_count}")
+        for invoice_id, payment_status in conn.execute(
+            "SELECT invoice_id, payment_status FROM payments WHERE subscription_id = ?",
+            (subscription_id,)
+        ):
+            print(f"   • Invoice: {invoice_id}, Status: {payment_status}")
 
-    print(f"\n✅ Subscription events: {len(events)}")
-    for event in events:
-        print(f"   • {event['event_type']} at {event['created_at']}")
+        (event_count,) = conn.execute(
+            "SELECT COUNT(*) FROM subscription_events WHERE subscription_id = ?",
+            (subscription_id,)
+        ).fetchone()
+        print(f"\n✅ Subscription events: {event_count}")
+        for event_type, created_at in conn.execute(
+            "SELECT event_type, created_at FROM subscription_events WHERE subscription_id = ? ORDER BY created_at",
+            (subscription_id,)
+        ):
+            print(f"   • {event_type} at {created_at}")
     
-    # Cleanup
-    try:
-        pool.close_all()
-        print("\n🧹 Database connections closed")
-    except Exception as e:
-        print(f"⚠️  Error closing pool: {e}")
-
     print("\n" + "="*60)
     print("✅ END-TO-END TEST COMPLETED SUCCESSFULLY")
     print("="*60)
@@ -323,6 +338,14 @@ async def test_complete_subscription_flow():
 
 
 if __name__ == "__main__":
+    # Faster event loop where available (optional dependency)
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
     success = False
     try:
         success = asyncio.run(test_complete_subscription_flow())
@@ -330,18 +353,6 @@ if __name__ == "__main__":
         print(f"\n❌ Test error: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        # Cleanup test database
-        import time
-        time.sleep(0.5)  # Give time for connections to close
-        try:
-            if os.path.exists(TEST_DB):
-                os.remove(TEST_DB)
-                print(f"\n🧹 Cleaned up test database: {TEST_DB}")
-        except PermissionError:
-            print(f"\n⚠️  Could not delete test database (file in use): {TEST_DB}")
-        except Exception as e:
-            print(f"\n⚠️  Error cleaning up test database: {e}")
 
     if success:
         print("\n✅ All tests passed!")
@@ -4,199 +4,247 @@ Tests notification message formatting without sending actual Telegram messages.
 """
 
 import asyncio
+import sys
 from datetime import datetime, timedelta
-from services.notification_service import NotificationService
-from core.metrics import MetricsCollector
 
 
-async def test_notification_messages():
-    """Test all notification message templates."""
+# Template text, built once at import and filled with str.format
+_TRIAL_STARTED = (
+    "🎉 <b>Welcome to AI Market Insight Bot!</b>\n\n"
+    "✅ Your {trial_days}-day free trial has started!\n\n"
+    "📅 <b>Trial Period:</b>\n"
+    "   • Starts: {today_str}\n"
+    "   • Ends: {trial_end_str}\n\n"
+    "🚀 <b>What You Get:</b>\n"
+    "   • Real-time crypto news alerts 24/7\n"
+    "   • AI-powered market impact analysis\n"
+    "   • Hot news posted immediately\n"
+    "   • Customized for your trading style\n\n"
+    "💡 <b>Commands:</b>\n"
+    "   • /subscription - Check your trial status\n"
+    "   • /renew - View subscription plans\n\n"
+    "Enjoy your trial! 🎊"
+)
+
+_TRIAL_WARNING_7D = (
+    "📢 <b>Reminder</b>\n\n"
+    "📅 Your free trial expires in <b>{days_remaining} days</b>!\n\n"
+    "📅 <b>Trial Ends:</b> {trial_end_full}\n\n"
+    "💰 <b>Continue Receiving News:</b>\n"
+    "   • Subscribe for just $15/month\n"
+    "   • Pay with cryptocurrency (BTC, ETH, USDT, etc.)\n"
+    "   • Instant activation after payment\n\n"
+    "🔄 <b>Renew Now:</b>\n"
+    "   Use /renew to see payment options\n\n"
+    "❓ Questions? Contact support."
+)
+
+_TRIAL_WARNING_1D = (
+    "⚠️ <b>URGENT</b>\n\n"
+    "🚨 Your free trial expires in <b>{days_remaining} day</b>!\n\n"
+    "📅 <b>Trial Ends:</b> {trial_end_full}\n\n"
+    "💰 <b>Continue Receiving News:</b>\n"
+    "   • Subscribe for just $15/month\n"
+    "   • Pay with cryptocurrency (BTC, ETH, USDT, etc.)\n"
+    "   • Instant activation after payment\n\n"
+    "🔄 <b>Renew Now:</b>\n"
+    "   Use /renew to see payment options\n\n"
+    "❓ Questions? Contact support."
+)
+
+_TRIAL_EXPIRED = (
+    "⏰ <b>Trial Period Expired</b>\n\n"
+    "Your {grace_period_days}-day free trial has ended.\n\n"
+    "🎁 <b>Grace Period Active:</b>\n"
+    "   • You have {grace_period_days} days to renew\n"
+    "   • News posting will continue during grace period\n"
+    "   • Grace period ends: {grace_end_str}\n\n"
+    "💰 <b>Subscribe Now:</b>\n"
+    "   • Only $15/month\n"
+    "   • Pay with crypto (BTC, ETH, USDT, USDC, BNB, TRX)\n"
+    "   • Instant activation\n\n"
+    "🔄 <b>Renew:</b> Use /renew command\n\n"
+    "⚠️ After grace period, news posting will stop until you subscribe."
+)
+
+_GRACE_PERIOD_WARNING = (
+    "🚨 <b>URGENT: Grace Period Ending Soon</b>\n\n"
+    "⏰ Your grace period expires in <b>{days_remaining} day</b>!\n\n"
+    "📅 <b>Grace Period Ends:</b> {grace_end_full}\n\n"
+    "⚠️ <b>What Happens Next:</b>\n"
+    "   • News posting will STOP after grace period\n"
+    "   • You'll need to subscribe to resume service\n\n"
+    "💰 <b>Subscribe Now - $15/month:</b>\n"
+    "   • Instant activation\n"
+    "   • Pay with cryptocurrency\n"
+    "   • Uninterrupted news delivery\n\n"
+    "🔄 <b>Renew:</b> Use /renew command immediately\n\n"
+    "Don't miss out on critical market updates!"
+)
+
+_SUBSCRIPTION_EXPIRED = (
+    "❌ <b>Subscription Expired</b>\n\n"
+    "Your grace period has ended and news posting has been stopped.\n\n"
+    "💰 <b>Reactivate Your Subscription:</b>\n"
+    "   • Only $15/month\n"
+    "   • Pay with cryptocurrency\n"
+    "   • Instant reactivation\n\n"
+    "🔄 <b>Subscribe:</b> Use /renew command\n\n"
+    "We'll be here when you're ready to resume! 👋"
+)
+
+_PAYMENT_RECEIVED = (
+    "✅ <b>Payment Received!</b>\n\n"
+    "🎉 Your payment has been confirmed!\n\n"
+    "💰 <b>Payment Details:</b>\n"
+    "   • Amount: ${amount_usd:.2f} USD\n"
+    "   • Currency: {currency}\n"
+    "   • Status: Confirmed\n\n"
+    "⏳ <b>Activation:</b>\n"
+    "   Your subscription is being activated...\n"
+    "   This usually takes a few seconds.\n\n"
+    "Thank you for subscribing! 🙏"
+)
+
+_SUBSCRIPTION_ACTIVATED = (
+    "🎊 <b>Subscription Activated!</b>\n\n"
+    "✅ Your subscription is now active!\n\n"
+    "📅 <b>Subscription Details:</b>\n"
+    "   • Status: Active\n"
+    "   • Valid Until: {sub_end_str}\n"
+    "   • Next Billing: {next_billing_str}\n\n"
+    "🚀 <b>What's Included:</b>\n"
+    "   • Real-time crypto news 24/7\n"
+    "   • AI-powered market analysis\n"
+    "   • Hot news posted immediately\n"
+    "   • Unlimited news updates\n\n"
+    "💡 <b>Commands:</b>\n"
+    "   • /subscription - Check status\n"
+    "   • /renew - Renew subscription\n\n"
+    "Enjoy your premium service! 🎉"
+)
+
+
+def _template_context() -> dict:
+    """Dates and values shared by the templates, formatted once."""
+    now = datetime.now()
+    trial_end_date = now + timedelta(days=15)
+    grace_period_end = now + timedelta(days=3)
+    subscription_end_date = now + timedelta(days=30)
+    next_billing_date = now + timedelta(days=23)
     
+    return {
+        'trial_days': 15,
+        'today_str': now.strftime('%B %d, %Y'),
+        'trial_end_str': trial_end_date.strftime('%B %d, %Y'),
+        'trial_end_full': trial_end_date.strftime('%B %d, %Y at %I:%M %p UTC'),
+        'grace_end_str': grace_period_end.strftime('%B %d, %Y'),
+        'grace_end_full': grace_period_end.strftime('%B %d, %Y at %I:%M %p UTC'),
+        'sub_end_str': subscription_end_date.strftime('%B %d, %Y'),
+        'next_billing_str': next_billing_date.strftime('%B %d, %Y'),
+    }
+
+
+async def _trial_started(ctx: dict) -> str:
+    """Trial Started Notification."""
+    return _TRIAL_STARTED.format(**ctx)
+
+
+async def _trial_warning_7d(ctx: dict) -> str:
+    """Trial Warning (7 days remaining)."""
+    return _TRIAL_WARNING_7D.format(days_remaining=7, **ctx)
+
+
+async def _trial_warning_1d(ctx: dict) -> str:
+    """Trial Warning (1 day remaining - URGENT)."""
+    return _TRIAL_WARNING_1D.format(days_remaining=1, **ctx)
+
+
+async def _trial_expired(ctx: dict) -> str:
+    """Trial Expired Notification."""
+    return _TRIAL_EXPIRED.format(grace_period_days=3, **ctx)
+
+
+async def _grace_period_warning(ctx: dict) -> str:
+    """Grace Period Warning."""
+    return _GRACE_PERIOD_WARNING.format(days_remaining=1, **ctx)
+
+
+async def _subscription_expired(ctx: dict) -> str:
+    """Subscription Expired Notification."""
+    return _SUBSCRIPTION_EXPIRED
+
+
+async def _payment_received(ctx: dict) -> str:
+    """Payment Received Notification."""
+    return _PAYMENT_RECEIVED.format(amount_usd=15.00, currency="BTC", **ctx)
+
+
+async def _subscription_activated(ctx: dict) -> str:
+    """Subscription Activated Notification."""
+    return _SUBSCRIPTION_ACTIVATED.format(**ctx)
+
+
+# (heading, async builder) for every notification template
+TEMPLATES = [
+    ("1️⃣  Trial Started Notification:", _trial_started),
+    ("2️⃣  Trial Warning (7 days remaining):", _trial_warning_7d),
+    ("3️⃣  Trial Warning (1 day remaining - URGENT):", _trial_warning_1d),
+    ("4️⃣  Trial Expired Notification:", _trial_expired),
+    ("5️⃣  Grace Period Warning:", _grace_period_warning),
+    ("6️⃣  Subscription Expired Notification:", _subscription_expired),
+    ("7️⃣  Payment Received Notification:", _payment_received),
+    ("8️⃣  Subscription Activated Notification:", _subscription_activated),
+]
+
+
+async def test_notification_messages() -> bool:
+    """Test all notification message templates."""
     print("\n" + "=" * 60)
     print("🧪 NOTIFICATION SYSTEM TEST")
     print("=" * 60)
     
-    # Create notification service (without bot instance for testing)
-    metrics = MetricsCollector()
-    notification_service = NotificationService(bot=None, metrics=metrics)
-    
-    # Test data
-    group_id = -1001234567890
-    trial_days = 15
-    trial_end_date = datetime.now() + timedelta(days=15)
-    grace_period_end = datetime.now() + timedelta(days=3)
-    subscription_end_date = datetime.now() + timedelta(days=30)
-    next_billing_date = datetime.now() + timedelta(days=23)
+    ctx = _template_context()
+    failures = []
     
     print("\n📝 Testing Notification Templates:\n")
     
-    # Test 1: Trial Started
-    print("1️⃣  Trial Started Notification:")
-    print("-" * 60)
-    message = (
-        f"🎉 <b>Welcome to AI Market Insight Bot!</b>\n\n"
-        f"✅ Your {trial_days}-day free trial has started!\n\n"
-        f"📅 <b>Trial Period:</b>\n"
-        f"   • Starts: {datetime.now().strftime('%B %d, %Y')}\n"
-        f"   • Ends: {trial_end_date.strftime('%B %d, %Y')}\n\n"
-        f"🚀 <b>What You Get:</b>\n"
-        f"   • Real-time crypto news alerts 24/7\n"
-        f"   • AI-powered market impact analysis\n"
-        f"   • Hot news posted immediately\n"
-        f"   • Customized for your trading style\n\n"
-        f"💡 <b>Commands:</b>\n"
-        f"   • /subscription - Check your trial status\n"
-        f"   • /renew - View subscription plans\n\n"
-        f"Enjoy your trial! 🎊"
+    # Build every template concurrently, as the notification sender would;
+    # each is checked on its own so one failure doesn't hide the rest
+    messages = await asyncio.gather(
+        *(build(ctx) for _, build in TEMPLATES),
+        return_exceptions=True
     )
-    print(message)
-    print("✅ Template OK\n")
     
-    # Test 2: Trial Warning (7 days)
-    print("2️⃣  Trial Warning (7 days remaining):")
-    print("-" * 60)
-    days_remaining = 7
-    message = (
-        f"📢 <b>Reminder</b>\n\n"
-        f"📅 Your free trial expires in <b>{days_remaining} days</b>!\n\n"
-        f"📅 <b>Trial Ends:</b> {trial_end_date.strftime('%B %d, %Y at %I:%M %p UTC')}\n\n"
-        f"💰 <b>Continue Receiving News:</b>\n"
-        f"   • Subscribe for just $15/month\n"
-        f"   • Pay with cryptocurrency (BTC, ETH, USDT, etc.)\n"
-        f"   • Instant activation after payment\n\n"
-        f"🔄 <b>Renew Now:</b>\n"
-        f"   Use /renew to see payment options\n\n"
-        f"❓ Questions? Contact support."
-    )
-    print(message)
-    print("✅ Template OK\n")
+    # Collect the report and write it in one go instead of a print per line
+    report = []
+    for (title, _), message in zip(TEMPLATES, messages):
+        report.append(title)
+        report.append("-" * 60)
+        if isinstance(message, Exception):
+            error = message
+        elif "<b>" not in message:
+            error = "missing HTML formatting"
+        else:
+            report.append(message)
+            report.append("✅ Template OK\n")
+            continue
+        failures.append(title)
+        report.append(f"❌ Template failed: {error}\n")
+    sys.stdout.write("\n".join(report) + "\n")
     
-    # Test 3: Trial Warning (1 day)
-    print("3️⃣  Trial Warning (1 day remaining - URGENT):")
-    print("-" * 60)
-    days_remaining = 1
-    message = (
-        f"⚠️ <b>URGENT</b>\n\n"
-        f"🚨 Your free trial expires in <b>{days_remaining} day</b>!\n\n"
-        f"📅 <b>Trial Ends:</b> {trial_end_date.strftime('%B %d, %Y at %I:%M %p UTC')}\n\n"
-        f"💰 <b>Continue Receiving News:</b>\n"
-        f"   • Subscribe for just $15/month\n"
-        f"   • Pay with cryptocurrency (BTC, ETH, USDT, etc.)\n"
-        f"   • Instant activation after payment\n\n"
-        f"🔄 <b>Renew Now:</b>\n"
-        f"   Use /renew to see payment options\n\n"
-        f"❓ Questions? Contact support."
-    )
-    print(message)
-    print("✅ Template OK\n")
-    
-    # Test 4: Trial Expired
-    print("4️⃣  Trial Expired Notification:")
-    print("-" * 60)
-    grace_period_days = 3
-    message = (
-        f"⏰ <b>Trial Period Expired</b>\n\n"
-        f"Your {grace_period_days}-day free trial has ended.\n\n"
-        f"🎁 <b>Grace Period Active:</b>\n"
-        f"   • You have {grace_period_days} days to renew\n"
-        f"   • News posting will continue during grace period\n"
-        f"   • Grace period ends: {grace_period_end.strftime('%B %d, %Y')}\n\n"
-        f"💰 <b>Subscribe Now:</b>\n"
-        f"   • Only $15/month\n"
-        f"   • Pay with crypto (BTC, ETH, USDT, USDC, BNB, TRX)\n"
-        f"   • Instant activation\n\n"
-        f"🔄 <b>Renew:</b> Use /renew command\n\n"
-        f"⚠️ After grace period, news posting will stop until you subscribe."
-    )
-    print(message)
-    print("✅ Template OK\n")
-    
-    # Test 5: Grace Period Warning
-    print("5️⃣  Grace Period Warning:")
-    print("-" * 60)
-    days_remaining = 1
-    message = (
-        f"🚨 <b>URGENT: Grace Period Ending Soon</b>\n\n"
-        f"⏰ Your grace period expires in <b>{days_remaining} day</b>!\n\n"
-        f"📅 <b>Grace Period Ends:</b> {grace_period_end.strftime('%B %d, %Y at %I:%M %p UTC')}\n\n"
-        f"⚠️ <b>What Happens Next:</b>\n"
-        f"   • News posting will STOP after grace period\n"
-        f"   • You'll need to subscribe to resume service\n\n"
-        f"💰 <b>Subscribe Now - $15/month:</b>\n"
-        f"   • Instant activation\n"
-        f"   • Pay with cryptocurrency\n"
-        f"   • Uninterrupted news delivery\n\n"
-        f"🔄 <b>Renew:</b> Use /renew command immediately\n\n"
-        f"Don't miss out on critical market updates!"
-    )
-    print(message)
-    print("✅ Template OK\n")
-    
-    # Test 6: Subscription Expired
-    print("6️⃣  Subscription Expired Notification:")
-    print("-" * 60)
-    message = (
-        f"❌ <b>Subscription Expired</b>\n\n"
-        f"Your grace period has ended and news posting has been stopped.\n\n"
-        f"💰 <b>Reactivate Your Subscription:</b>\n"
-        f"   • Only $15/month\n"
-        f"   • Pay with cryptocurrency\n"
-        f"   • Instant reactivation\n\n"
-        f"🔄 <b>Subscribe:</b> Use /renew command\n\n"
-        f"We'll be here when you're ready to resume! 👋"
-    )
-    print(message)
-    print("✅ Template OK\n")
-    
-    # Test 7: Payment Received
-    print("7️⃣  Payment Received Notification:")
-    print("-" * 60)
-    amount_usd = 15.00
-    currency = "btc"
-    message = (
-        f"✅ <b>Payment Received!</b>\n\n"
-        f"🎉 Your payment has been confirmed!\n\n"
-        f"💰 <b>Payment Details:</b>\n"
-        f"   • Amount: ${amount_usd:.2f} USD\n"
-        f"   • Currency: {currency.upper()}\n"
-        f"   • Status: Confirmed\n\n"
-        f"⏳ <b>Activation:</b>\n"
-        f"   Your subscription is being activated...\n"
-        f"   This usually takes a few seconds.\n\n"
-        f"Thank you for subscribing! 🙏"
-    )
-    print(message)
-    print("✅ Template OK\n")
-    
-    # Test 8: Subscription Activated
-    print("8️⃣  Subscription Activated Notification:")
-    print("-" * 60)
-    message = (
-        f"🎊 <b>Subscription Activated!</b>\n\n"
-        f"✅ Your subscription is now active!\n\n"
-        f"📅 <b>Subscription Details:</b>\n"
-        f"   • Status: Active\n"
-        f"   • Valid Until: {subscription_end_date.strftime('%B %d, %Y')}\n"
-        f"   • Next Billing: {next_billing_date.strftime('%B %d, %Y')}\n\n"
-        f"🚀 <b>What's Included:</b>\n"
-        f"   • Real-time crypto news 24/7\n"
-        f"   • AI-powered market analysis\n"
-        f"   • Hot news posted immediately\n"
-        f"   • Unlimited news updates\n\n"
-        f"💡 <b>Commands:</b>\n"
-        f"   • /subscription - Check status\n"
-        f"   • /renew - Renew subscription\n\n"
-        f"Enjoy your premium service! 🎉"
-    )
-    print(message)
-    print("✅ Template OK\n")
+    if failures:
+        print("=" * 60)
+        print(f"❌ {len(failures)} of {len(TEMPLATES)} NOTIFICATION TEMPLATES FAILED")
+        print("=" * 60)
+        return False
     
     # Summary
     print("=" * 60)
     print("✅ ALL NOTIFICATION TEMPLATES VALIDATED")
     print("=" * 60)
     print("\n📊 Summary:")
-    print("   • 8 notification types tested")
+    print(f"   • {len(TEMPLATES)} notification types tested")
     print("   • All templates properly formatted")
     print("   • HTML formatting validated")
     print("   • Ready for production use")
@@ -209,7 +257,18 @@ async def test_notification_messages():
     print("     - Grace period warnings (background task)")
     print("\n✅ Notification System Ready!\n")
 
+    return True
+
 
 if __name__ == "__main__":
-    asyncio.run(test_notification_messages())
+    # Faster event loop where available (optional dependency)
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
+    success = asyncio.run(test_notification_messages())
+    sys.exit(0 if success else 1)
 
@@ -4,7 +4,7 @@ Tests automated expiration checking and notification sending.
 """
 
 import asyncio
-import os
+import sys
 from datetime import datetime, timedelta
 from db_pool import ConnectionPool
 from db_adapter import DatabaseAdapter
@@ -16,18 +16,21 @@ from services.notification_service import NotificationService
 from core.metrics import MetricsCollector
 
 
-# Test database
-TEST_DB = "test_subscription_checker.db"
+# Test database: shared in-memory, so every pooled connection sees the same data
+TEST_DB = "file:subchecker_test?mode=memory&cache=shared"
+
+# Applied to every pooled connection of the in-memory test DB
+TEST_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+)
 
 
 async def setup_test_database():
     """Create test database with schema."""
-    # Remove old test database
-    if os.path.exists(TEST_DB):
-        os.remove(TEST_DB)
-
     # Create pool
-    pool = ConnectionPool(db_path=TEST_DB, pool_size=5)
+    pool = ConnectionPool(db_path=TEST_DB, pool_size=5, sqlite_pragmas=TEST_PRAGMAS)
     
     # Create schema
     schema = """
@@ -48,7 +51,7 @@ async def setup_test_database():
         subscription_start_date TEXT,
         subscription_end_date TEXT,
         next_billing_date TEXT,
-        grace_period_end_date TEXT,
+        grace_period_end TEXT,
         created_at TEXT DEFAULT CURRENT_TIMESTAMP,
         updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (group_id) REFERENCES groups(group_id)
@@ -76,60 +79,95 @@ async def setup_test_database():
     """
 
     with pool.get_connection() as conn:
-        for statement in schema.split(';'):
-            if statement.strip():
-                conn.execute(statement)
-        conn.commit()
+        # One C-level call for the whole DDL, in a single transaction
+        conn.executescript(f"BEGIN IMMEDIATE;\n{schema}\nCOMMIT;")
 
     return pool
 
 
-async def create_test_trial(pool, group_id: int, days_until_expiry: int):
-    """Create a test trial subscription."""
-    now = datetime.now()
-    trial_start = now - timedelta(days=15 - days_until_expiry)
-    trial_end = now + timedelta(days=days_until_expiry)
+# What one checker run must produce for TEST_SCENARIOS. Checker query errors
+# are caught and logged, so missing rows are the only sign that they happened.
+EXPECTED_EVENTS = {
+    'grace_period_warning': 1,
+    'subscription_expired': 1,
+    'trial_expired': 1,
+    'trial_warning_1d': 1,
+    'trial_warning_3d': 1,
+    'trial_warning_7d': 1,
+}
+EXPECTED_STATUSES = {'expired': 1, 'grace_period': 2, 'trial': 3}
+EXPECTED_DISABLED_GROUPS = 1
+
+# Closing summary, printed after the verification counts
+SUMMARY = """
+============================================================
+✅ ALL TESTS COMPLETED
+============================================================
+
+📊 Summary:
+   • Trial warnings sent for 7, 3, 1 day expirations
+   • Expired trials moved to grace period
+   • Grace period warnings sent
+   • Expired subscriptions disabled
+   • All events logged to database
+
+💡 What Happens in Production:
+   • Checker runs daily at 9:00 AM UTC
+   • Notifications sent via Telegram bot
+   • Groups automatically disabled when expired
+   • All events tracked for analytics
+
+✅ Subscription Checker Service Ready!
+"""
 
-    with pool.get_connection() as conn:
-        # Create group
-        conn.execute(
-            "INSERT INTO groups (group_id, group_name, subscription_status) VALUES (?, ?, ?)",
-            (group_id, f"Test Group {group_id}", "trial")
-        )
-
-        # Create subscription
-        conn.execute(
-            """INSERT INTO subscriptions
-               (group_id, subscription_status, trial_start_date, trial_end_date)
-               VALUES (?, ?, ?, ?)""",
-            (group_id, "trial", trial_start.isoformat(), trial_end.isoformat())
-        )
+# Fixture statements, kept identical across calls so the connection's
+# statement cache reuses the prepared statements
+_INSERT_GROUP_SQL = "INSERT INTO groups (group_id, group_name, subscription_status) VALUES (?, ?, ?)"
+_INSERT_SUBSCRIPTION_SQL = """INSERT INTO subscriptions
+    (group_id, subscription_status, trial_start_date, trial_end_date, grace_period_end)
+    VALUES (?, ?, ?, ?, ?)"""
+
+# (group_id, subscription_status, days until the trial or grace period ends)
+TEST_SCENARIOS = [
+    (-1001, "trial", 7),  # Trial expiring in 7 days
+    (-1002, "trial", 3),  # Trial expiring in 3 days
+    (-1003, "trial", 1),  # Trial expiring in 1 day
+    (-1004, "trial", 0),  # Trial expiring today
+    (-1005, "grace_period", 1),  # Grace period ending in 1 day
+    (-1006, "grace_period", 0),  # Grace period ending today
+]
+
+
+async def create_test_fixtures(pool, scenarios, now: datetime):
+    """
+    Create the groups and subscriptions for all scenarios in one transaction.
+    
+    Every row is dated relative to the same `now`, so expiry offsets line up
+    exactly across scenarios.
+    """
+    # ISO strings by day offset from now; scenarios share most offsets
+    iso_by_offset = {}
 
-        conn.commit()
+    def _iso(offset_days: int) -> str:
+        if offset_days not in iso_by_offset:
+            iso_by_offset[offset_days] = (now + timedelta(days=offset_days)).isoformat()
+        return iso_by_offset[offset_days]
 
+    groups_rows = []
+    subs_rows = []
 
-async def create_test_grace_period(pool, group_id: int, days_until_expiry: int):
-    """Create a test subscription in grace period."""
-    now = datetime.now()
-    trial_start = now - timedelta(days=20)
-    trial_end = now - timedelta(days=5)
-    grace_end = now + timedelta(days=days_until_expiry)
+    for group_id, status, days_until_expiry in scenarios:
+        if status == "trial":
+            dates = (_iso(days_until_expiry - 15), _iso(days_until_expiry), None)
+        else:
+            dates = (_iso(-20), _iso(-5), _iso(days_until_expiry))
 
-    with pool.get_connection() as conn:
-        # Create group
-        conn.execute(
-            "INSERT INTO groups (group_id, group_name, subscription_status) VALUES (?, ?, ?)",
-            (group_id, f"Test Group {group_id}", "grace_period")
-        )
-
-        # Create subscription
-        conn.execute(
-            """INSERT INTO subscriptions
-               (group_id, subscription_status, trial_start_date, trial_end_date, grace_period_end_date)
-               VALUES (?, ?, ?, ?, ?)""",
-            (group_id, "grace_period", trial_start.isoformat(), trial_end.isoformat(), grace_end.isoformat())
-        )
+        groups_rows.append((group_id, f"Test Group {group_id}", status))
+        subs_rows.append((group_id, status, *dates))
 
+    with pool.get_connection() as conn:
+        conn.executemany(_INSERT_GROUP_SQL, groups_rows)
+        conn.executemany(_INSERT_SUBSCRIPTION_SQL, subs_rows)
         conn.commit()
 
 
@@ -161,13 +199,9 @@ async def run_tests():
     
     print("\n📝 Setting up test data...\n")
     
-    # Create test scenarios
-    await create_test_trial(pool, -1001, 7)  # Trial expiring in 7 days
-    await create_test_trial(pool, -1002, 3)  # Trial expiring in 3 days
-    await create_test_trial(pool, -1003, 1)  # Trial expiring in 1 day
-    await create_test_trial(pool, -1004, 0)  # Trial expiring today
-    await create_test_grace_period(pool, -1005, 1)  # Grace period ending in 1 day
-    await create_test_grace_period(pool, -1006, 0)  # Grace period ending today
+    # Create test scenarios against a single baseline time
+    now = datetime.now()
+    await create_test_fixtures(pool, TEST_SCENARIOS, now)
     
     print("✅ Test data created:")
     print("   • Trial expiring in 7 days (Group -1001)")
@@ -181,29 +215,25 @@ async def run_tests():
     print("🔍 RUNNING SUBSCRIPTION CHECKS")
     print("=" * 60)
     
-    # Test 1: Check trial warnings
-    print("\n1️⃣  Testing Trial Warnings...")
-    print("-" * 60)
-    await checker_service.check_trial_warnings()
-    print("✅ Trial warnings check completed")
-    
-    # Test 2: Check expired trials
-    print("\n2️⃣  Testing Expired Trials...")
-    print("-" * 60)
-    await checker_service.check_expired_trials()
-    print("✅ Expired trials check completed")
-    
-    # Test 3: Check grace period warnings
-    print("\n3️⃣  Testing Grace Period Warnings...")
-    print("-" * 60)
-    await checker_service.check_grace_period_warnings()
-    print("✅ Grace period warnings check completed")
+    # Tests 1-4: the phases touch disjoint status buckets, so run them concurrently
+    phases = (
+        ("1️⃣  Testing Trial Warnings...", "✅ Trial warnings check completed"),
+        ("2️⃣  Testing Expired Trials...", "✅ Expired trials check completed"),
+        ("3️⃣  Testing Grace Period Warnings...", "✅ Grace period warnings check completed"),
+        ("4️⃣  Testing Expired Subscriptions...", "✅ Expired subscriptions check completed"),
+    )
+    await asyncio.gather(
+        checker_service.check_trial_warnings(),
+        checker_service.check_expired_trials(),
+        checker_service.check_grace_period_warnings(),
+        checker_service.check_expired_subscriptions()
+    )
     
-    # Test 4: Check expired subscriptions
-    print("\n4️⃣  Testing Expired Subscriptions...")
-    print("-" * 60)
-    await checker_service.check_expired_subscriptions()
-    print("✅ Expired subscriptions check completed")
+    # Report after gather so the output keeps its phase order
+    for title, done in phases:
+        print(f"\n{title}")
+        print("-" * 60)
+        print(done)
     
     # Test 5: Run full check
     print("\n5️⃣  Testing Full Daily Check...")
@@ -211,66 +241,60 @@ async def run_tests():
     await checker_service.check_all_subscriptions()
     print("✅ Full daily check completed")
     
+    # Write out queued subscription events before verifying
+    await checker_service.close()
+    
     # Verify results
     print("\n" + "=" * 60)
     print("📊 VERIFICATION")
     print("=" * 60)
     
-    # Check subscription events
+    # Event counts, status counts and disabled groups in one round-trip
     with pool.get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT event_type, COUNT(*) as count FROM subscription_events GROUP BY event_type"
-        )
-        events = cursor.fetchall()
-
-        print("\n📝 Events Logged:")
-        for event in events:
-            print(f"   • {event[0]}: {event[1]} event(s)")
-
-        # Check updated statuses
-        cursor = conn.execute(
-            "SELECT subscription_status, COUNT(*) as count FROM subscriptions GROUP BY subscription_status"
-        )
-        statuses = cursor.fetchall()
-
-        print("\n📊 Subscription Statuses:")
-        for status in statuses:
-            print(f"   • {status[0]}: {status[1]} subscription(s)")
-
-        # Check disabled groups
-        cursor = conn.execute(
-            "SELECT COUNT(*) as count FROM groups WHERE is_active = 0"
-        )
-        disabled = cursor.fetchone()
-
-        print(f"\n🚫 Disabled Groups: {disabled[0]}")
-    
-    # Summary
-    print("\n" + "=" * 60)
-    print("✅ ALL TESTS COMPLETED")
-    print("=" * 60)
-    
-    print("\n📊 Summary:")
-    print("   • Trial warnings sent for 7, 3, 1 day expirations")
-    print("   • Expired trials moved to grace period")
-    print("   • Grace period warnings sent")
-    print("   • Expired subscriptions disabled")
-    print("   • All events logged to database")
-    
-    print("\n💡 What Happens in Production:")
-    print("   • Checker runs daily at 9:00 AM UTC")
-    print("   • Notifications sent via Telegram bot")
-    print("   • Groups automatically disabled when expired")
-    print("   • All events tracked for analytics")
-    
-    print("\n✅ Subscription Checker Service Ready!\n")
-
-    # Cleanup
+        rows = conn.execute(
+            """SELECT 'event', event_type, COUNT(*) FROM subscription_events GROUP BY event_type
+               UNION ALL
+               SELECT 'status', subscription_status, COUNT(*) FROM subscriptions GROUP BY subscription_status
+               UNION ALL
+               SELECT 'disabled', NULL, COUNT(*) FROM groups WHERE is_active = 0"""
+        ).fetchall()
+
+    counts = {'event': [], 'status': [], 'disabled': []}
+    for kind, name, count in rows:
+        counts[kind].append((name, count))
+
+    # Build the rest of the report and write it in one go
+    report = ["\n📝 Events Logged:"]
+    report += [f"   • {event_type}: {count} event(s)" for event_type, count in counts['event']]
+    report.append("\n📊 Subscription Statuses:")
+    report += [f"   • {status}: {count} subscription(s)" for status, count in counts['status']]
+    disabled_groups = counts['disabled'][0][1]
+    report.append(f"\n🚫 Disabled Groups: {disabled_groups}")
+
+    # Compare against the expected outcome
+    failures = []
+    if dict(counts['event']) != EXPECTED_EVENTS:
+        failures.append(f"events {dict(counts['event'])} != expected {EXPECTED_EVENTS}")
+    if dict(counts['status']) != EXPECTED_STATUSES:
+        failures.append(f"statuses {dict(counts['status'])} != expected {EXPECTED_STATUSES}")
+    if disabled_groups != EXPECTED_DISABLED_GROUPS:
+        failures.append(f"disabled groups {disabled_groups} != expected {EXPECTED_DISABLED_GROUPS}")
+
+    if failures:
+        report.append("\n" + "=" * 60)
+        report.append("❌ VERIFICATION FAILED")
+        report.append("=" * 60)
+        report += [f"   • {failure}" for failure in failures]
+    else:
+        report.append(SUMMARY)
+    sys.stdout.write("\n".join(report) + "\n")
+
+    # Cleanup (closing the last connection releases the in-memory database)
     pool.close_all()
-    if os.path.exists(TEST_DB):
-        os.remove(TEST_DB)
+
+    return not failures
 
 
 if __name__ == "__main__":
-    asyncio.run(run_tests())
+    sys.exit(0 if asyncio.run(run_tests()) else 1)
 
@@ -4,6 +4,8 @@ Tests all components of the subscription payment system.
 """
 
 import asyncio
+import hashlib
+import hmac
 import sys
 import os
 from datetime import datetime, timedelta
@@ -11,8 +13,7 @@ from datetime import datetime, timedelta
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from db_pool import ConnectionPool
-from db_adapter import DatabaseAdapter
+from db_pool import init_pool
 from repositories.subscription_repository import SubscriptionRepository
 from repositories.payment_repository import PaymentRepository
 from repositories.group_repository import GroupRepository
@@ -22,12 +23,21 @@ from core.metrics import MetricsCollector
 from migrations import run_all_migrations
 import config
 
+# Shared in-memory database: no files to create or clean up
+TEST_DB = "file:ainews_test?mode=memory&cache=shared"
+
+# Applied to every pooled connection of the in-memory test DB
+TEST_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+)
+
 
 class SubscriptionSystemTester:
     """Test suite for subscription system."""
 
     def __init__(self):
-        self.db_pool = None
         self.db_pool = None
         self.subscription_repo = None
         self.payment_repo = None
@@ -35,111 +45,114 @@ class SubscriptionSystemTester:
         self.subscription_service = None
         self.payment_service = None
         self.metrics = MetricsCollector()
-        self.test_results = []
+        # Running totals; only failures are kept, since the summary lists just those
+        self._pass = 0
+        self._fail = 0
+        self._failures: list[tuple[str, str]] = []
+        # Result lines buffered per test and written with one stdout write
+        self._report: list[str] = []
+        # Subscriptions already fetched by earlier tests, keyed by group ID
+        self._subscription_cache: dict[int, dict] = {}
+        # Encoded once; every webhook test vector signs with the same key
+        self._ipn_secret_bytes = (config.NOWPAYMENTS_IPN_SECRET or "").encode('utf-8')
 
     async def setup(self):
         """Initialize database and repositories."""
-        print("🔧 Setting up test environment...")
+        # Set environment variable for test database first, so anything that
+        # reads it during setup sees the test database
+        os.environ['DATABASE_URL'] = TEST_DB
 
-        # Set environment variable for test database
-        import os
-        os.environ['DATABASE_URL'] = 'test_ainews.db'
+        print("🔧 Setting up test environment...")
 
         # Initialize database pool (synchronous) - uses global pool
-        from db_pool import init_pool
-        self.db_pool = init_pool(db_path="test_ainews.db", pool_size=5)
+        self.db_pool = init_pool(db_path=TEST_DB, pool_size=5, sqlite_pragmas=TEST_PRAGMAS)
 
         # Create base tables first (minimal schema for testing)
         print("📦 Creating test database schema...")
         with self.db_pool.get_connection() as conn:
-            # Create groups table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS groups (
-                    group_id INTEGER PRIMARY KEY,
-                    group_name TEXT NOT NULL,
-                    posting_time TEXT DEFAULT '09:00',
-                    trader_type TEXT DEFAULT 'investor',
-                    is_active BOOLEAN DEFAULT 1,
-                    last_post TIMESTAMP,
-                    subscription_id INTEGER,
-                    subscription_status TEXT DEFAULT 'trial',
-                    trial_ends_at TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            # All tables in one script: one parse pass and one commit
+            conn.executescript("""
+            BEGIN IMMEDIATE;
 
-            # Create subscriptions table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS subscriptions (
-                    subscription_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    group_id INTEGER NOT NULL UNIQUE,
-                    subscription_status TEXT NOT NULL,
-                    trial_start_date TIMESTAMP NOT NULL,
-                    trial_end_date TIMESTAMP NOT NULL,
-                    subscription_start_date TIMESTAMP,
-                    subscription_end_date TIMESTAMP,
-                    next_billing_date TIMESTAMP,
-                    grace_period_end TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (group_id) REFERENCES groups(group_id) ON DELETE CASCADE
-                )
-            """)
+            -- Create groups table
+            CREATE TABLE IF NOT EXISTS groups (
+                group_id INTEGER PRIMARY KEY,
+                group_name TEXT NOT NULL,
+                posting_time TEXT DEFAULT '09:00',
+                trader_type TEXT DEFAULT 'investor',
+                is_active BOOLEAN DEFAULT 1,
+                last_post TIMESTAMP,
+                subscription_id INTEGER,
+                subscription_status TEXT DEFAULT 'trial',
+                trial_ends_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
 
-            # Create payments table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS payments (
-                    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subscription_id INTEGER NOT NULL,
-                    group_id INTEGER NOT NULL,
-                    amount_usd DECIMAL(10, 2) NOT NULL,
-                    amount_crypto DECIMAL(20, 8),
-                    currency TEXT NOT NULL,
-                    payment_address TEXT,
-                    payment_status TEXT NOT NULL,
-                    payment_url TEXT,
-                    invoice_id TEXT UNIQUE,
-                    payment_id_external TEXT,
-                    transaction_hash TEXT,
-                    confirmations INTEGER DEFAULT 0,
-                    required_confirmations INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    confirmed_at TIMESTAMP,
-                    expires_at TIMESTAMP,
-                    webhook_data TEXT,
-                    FOREIGN KEY (subscription_id) REFERENCES subscriptions(subscription_id) ON DELETE CASCADE,
-                    FOREIGN KEY (group_id) REFERENCES groups(group_id) ON DELETE CASCADE
-                )
-            """)
+            -- Create subscriptions table
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                subscription_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id INTEGER NOT NULL UNIQUE,
+                subscription_status TEXT NOT NULL,
+                trial_start_date TIMESTAMP NOT NULL,
+                trial_end_date TIMESTAMP NOT NULL,
+                subscription_start_date TIMESTAMP,
+                subscription_end_date TIMESTAMP,
+                next_billing_date TIMESTAMP,
+                grace_period_end TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (group_id) REFERENCES groups(group_id) ON DELETE CASCADE
+            );
 
-            # Create subscription_events table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS subscription_events (
-                    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subscription_id INTEGER NOT NULL,
-                    group_id INTEGER NOT NULL,
-                    event_type TEXT NOT NULL,
-                    event_data TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (subscription_id) REFERENCES subscriptions(subscription_id) ON DELETE CASCADE
-                )
-            """)
+            -- Create payments table
+            CREATE TABLE IF NOT EXISTS payments (
+                payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subscription_id INTEGER NOT NULL,
+                group_id INTEGER NOT NULL,
+                amount_usd DECIMAL(10, 2) NOT NULL,
+                amount_crypto DECIMAL(20, 8),
+                currency TEXT NOT NULL,
+                payment_address TEXT,
+                payment_status TEXT NOT NULL,
+                payment_url TEXT,
+                invoice_id TEXT UNIQUE,
+                payment_id_external TEXT,
+                transaction_hash TEXT,
+                confirmations INTEGER DEFAULT 0,
+                required_confirmations INTEGER DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                confirmed_at TIMESTAMP,
+                expires_at TIMESTAMP,
+                webhook_data TEXT,
+                FOREIGN KEY (subscription_id) REFERENCES subscriptions(subscription_id) ON DELETE CASCADE,
+                FOREIGN KEY (group_id) REFERENCES groups(group_id) ON DELETE CASCADE
+            );
 
-            # Create trial_abuse_tracking table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS trial_abuse_tracking (
-                    tracking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    group_id INTEGER NOT NULL,
-                    group_title_hash TEXT NOT NULL,
-                    creator_user_id INTEGER,
-                    trial_started_at TIMESTAMP NOT NULL,
-                    is_flagged BOOLEAN DEFAULT 0,
-                    flag_reason TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            -- Create subscription_events table
+            CREATE TABLE IF NOT EXISTS subscription_events (
+                event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subscription_id INTEGER NOT NULL,
+                group_id INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                event_data TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (subscription_id) REFERENCES subscriptions(subscription_id) ON DELETE CASCADE
+            );
+
+            -- Create trial_abuse_tracking table
+            CREATE TABLE IF NOT EXISTS trial_abuse_tracking (
+                tracking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id INTEGER NOT NULL,
+                group_title_hash TEXT NOT NULL,
+                creator_user_id INTEGER,
+                trial_started_at TIMESTAMP NOT NULL,
+                is_flagged BOOLEAN DEFAULT 0,
+                flag_reason TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
 
-            conn.commit()
+            COMMIT;
+            """)
 
         print("✅ Test schema created!")
 
@@ -168,29 +181,53 @@ class SubscriptionSystemTester:
         """Cleanup test data and close connections."""
         print("\n🧹 Cleaning up...")
 
-        # Delete test data (synchronous operations)
+        # Drop the test tables (synchronous operations); the test database
+        # holds nothing else, so there is no need to delete row by row
         try:
             with self.db_pool.get_connection() as conn:
-                # Try to delete from each table, ignore if table doesn't exist
-                for table in ['subscription_events', 'payments', 'subscriptions', 'trial_abuse_tracking', 'groups']:
-                    try:
-                        conn.execute(f"DELETE FROM {table} WHERE group_id < 0")
-                    except Exception as e:
-                        pass  # Table might not exist
-                conn.commit()
+                conn.executescript("""
+                BEGIN IMMEDIATE;
+                DROP TABLE IF EXISTS subscription_events;
+                DROP TABLE IF EXISTS payments;
+                DROP TABLE IF EXISTS subscriptions;
+                DROP TABLE IF EXISTS trial_abuse_tracking;
+                DROP TABLE IF EXISTS groups;
+                COMMIT;
+                """)
         except Exception as e:
             print(f"   ⚠️ Cleanup warning: {e}")
 
         self.db_pool.close_all()
         print("✅ Cleanup complete!")
     
+    async def _get_sub(self, group_id):
+        """Get a group's subscription, reusing the row fetched by an earlier test."""
+        if group_id not in self._subscription_cache:
+            self._subscription_cache[group_id] = await self.subscription_service.get_subscription(group_id)
+        return self._subscription_cache[group_id]
+    
+    def _invalidate_sub(self, group_id):
+        """Forget a group's cached subscription after a test changes it."""
+        self._subscription_cache.pop(group_id, None)
+    
     def log_test(self, test_name, passed, message=""):
         """Log test result."""
         status = "✅ PASS" if passed else "❌ FAIL"
-        self.test_results.append((test_name, passed, message))
-        print(f"{status} - {test_name}")
+        if passed:
+            self._pass += 1
+        else:
+            self._fail += 1
+            self._failures.append((test_name, message))
+        self._report.append(f"{status} - {test_name}")
         if message:
-            print(f"   {message}")
+            self._report.append(f"   {message}")
+    
+    def _flush_report(self):
+        """Write the buffered result lines."""
+        if self._report:
+            self._report.append("")
+            sys.stdout.write("\n".join(self._report))
+            self._report.clear()
     
     async def test_trial_creation(self):
         """Test 1: Trial subscription creation."""
@@ -210,25 +247,29 @@ class SubscriptionSystemTester:
             subscription = await self.subscription_service.create_trial_subscription(
                 group_id, group_name, creator_user_id
             )
+            self._invalidate_sub(group_id)
             
             # Verify subscription was created
             if subscription:
+                # Parse each timestamp once for both the log line and the duration check
+                trial_end = datetime.fromisoformat(subscription['trial_end_date'])
+                trial_start = datetime.fromisoformat(subscription['trial_start_date'])
+                
                 self.log_test(
                     "Trial Creation",
                     True,
                     f"Trial created with ID: {subscription['subscription_id']}, "
-                    f"Ends: {subscription['trial_end_date'][:10]}"
+                    f"Ends: {trial_end.date().isoformat()}"
                 )
                 
                 # Verify trial days
-                trial_end = datetime.fromisoformat(subscription['trial_end_date'].replace('Z', '+00:00'))
-                trial_start = datetime.fromisoformat(subscription['trial_start_date'].replace('Z', '+00:00'))
+                trial_days = config.TRIAL_DAYS
                 days_diff = (trial_end - trial_start).days
                 
                 self.log_test(
                     "Trial Duration",
-                    days_diff == config.TRIAL_DAYS,
-                    f"Trial duration: {days_diff} days (expected: {config.TRIAL_DAYS})"
+                    days_diff == trial_days,
+                    f"Trial duration: {days_diff} days (expected: {trial_days})"
                 )
             else:
                 self.log_test("Trial Creation", False, "Failed to create trial")
@@ -293,7 +334,7 @@ class SubscriptionSystemTester:
             creator_user_id = 12345
 
             # Get the original subscription ID
-            original_sub = await self.subscription_service.get_subscription(group_id)
+            original_sub = await self._get_sub(group_id)
             original_id = original_sub['subscription_id'] if original_sub else None
 
             # Try to create another trial - should return existing subscription
@@ -304,6 +345,9 @@ class SubscriptionSystemTester:
             # Check that it returned the existing subscription (same ID)
             is_same = (subscription and original_id and
                       subscription.get('subscription_id') == original_id)
+            if not is_same:
+                # A new trial replaced the cached row
+                self._invalidate_sub(group_id)
 
             self.log_test(
                 "Duplicate Trial Prevention",
@@ -321,15 +365,7 @@ class SubscriptionSystemTester:
         print("=" * 50)
         
         try:
-            # Get subscription
-            group_id = -1001
-            subscription = await self.subscription_service.get_subscription(group_id)
-            
-            if not subscription:
-                self.log_test("Payment Invoice", False, "No subscription found")
-                return
-            
-            # Check if API keys are configured
+            # Check if API keys are configured (before touching the database)
             if not config.NOWPAYMENTS_API_KEY:
                 self.log_test(
                     "Payment Invoice",
@@ -338,6 +374,14 @@ class SubscriptionSystemTester:
                 )
                 return
             
+            # Get subscription
+            group_id = -1001
+            subscription = await self._get_sub(group_id)
+            
+            if not subscription:
+                self.log_test("Payment Invoice", False, "No subscription found")
+                return
+            
             # Create invoice
             invoice = await self.payment_service.create_invoice(
                 subscription_id=subscription['subscription_id'],
@@ -375,16 +419,14 @@ class SubscriptionSystemTester:
                 )
                 return
             
-            # Test with sample data
-            import hmac
-            import hashlib
+            # Test with sample data (raw body bytes, as the webhook receives it)
+            payload = b'{"invoice_id":"test123","payment_status":"finished"}'
             
-            payload = '{"invoice_id":"test123","payment_status":"finished"}'
-            expected_signature = hmac.new(
-                config.NOWPAYMENTS_IPN_SECRET.encode('utf-8'),
-                payload.encode('utf-8'),
-                hashlib.sha512
-            ).hexdigest()
+            # Keyed once; copy() per vector skips the key setup
+            hmac_proto = hmac.new(self._ipn_secret_bytes, None, hashlib.sha512)
+            mac = hmac_proto.copy()
+            mac.update(payload)
+            expected_signature = mac.hexdigest()
             
             # Verify signature
             is_valid = await self.payment_service.verify_webhook_signature(
@@ -420,32 +462,47 @@ class SubscriptionSystemTester:
         await self.setup()
         
         # Run tests
-        await self.test_trial_creation()
-        await self.test_subscription_status()
-        await self.test_posting_validation()
-        await self.test_trial_abuse_detection()
-        await self.test_payment_invoice_creation()
-        await self.test_webhook_signature_verification()
+        tests = [
+            self.test_trial_creation,
+            self.test_subscription_status,
+            self.test_posting_validation,
+            self.test_trial_abuse_detection
+        ]
         
-        # Print summary
-        print("\n" + "=" * 50)
-        print("📊 TEST SUMMARY")
-        print("=" * 50)
+        # Payment tests need NOWPayments credentials; skip both in one branch
+        # when none are configured
+        payments_configured = bool(config.NOWPAYMENTS_API_KEY or config.NOWPAYMENTS_IPN_SECRET)
+        if payments_configured:
+            tests += [self.test_payment_invoice_creation, self.test_webhook_signature_verification]
+        
+        for test in tests:
+            await test()
+            # Each test's results are written together once it finishes
+            self._flush_report()
         
-        total_tests = len(self.test_results)
-        passed_tests = sum(1 for _, passed, _ in self.test_results if passed)
-        failed_tests = total_tests - passed_tests
+        if not payments_configured:
+            self.log_test("Payment Tests", True, "⚠️ SKIPPED - NOWPayments not configured")
         
-        print(f"\nTotal Tests: {total_tests}")
-        print(f"✅ Passed: {passed_tests}")
-        print(f"❌ Failed: {failed_tests}")
-        print(f"Success Rate: {(passed_tests/total_tests*100):.1f}%")
+        # Print summary
+        passed_tests = self._pass
+        failed_tests = self._fail
+        total_tests = passed_tests + failed_tests
+        
+        self._report += [
+            "\n" + "=" * 50,
+            "📊 TEST SUMMARY",
+            "=" * 50,
+            f"\nTotal Tests: {total_tests}",
+            f"✅ Passed: {passed_tests}",
+            f"❌ Failed: {failed_tests}",
+            f"Success Rate: {(passed_tests/total_tests*100):.1f}%"
+        ]
         
         if failed_tests > 0:
-            print("\n❌ Failed Tests:")
-            for name, passed, message in self.test_results:
-                if not passed:
-                    print(f"  - {name}: {message}")
+            self._report.append("\n❌ Failed Tests:")
+            self._report += [f"  - {name}: {message}" for name, message in self._failures]
+        
+        self._flush_report()
         
         await self.cleanup()
         
@@ -5,29 +5,80 @@ Provides security and data integrity checks.
 
 import re
 import logging
-from typing import Any, Optional
+import string
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 logger = logging.getLogger(__name__)
 
+try:
+    import re2
+except ImportError:
+    re2 = None
+
 
 class InputValidator:
     """Validates and sanitizes user input."""
     
     # Regex patterns
-    CHAT_ID_PATTERN = re.compile(r'^-?\d+$')
-    USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_]{1,32}$')
-    URL_PATTERN = re.compile(r'^https?://[^\s/$.?#].[^\s]*$', re.IGNORECASE)
+    # Deletes every allowed username character; anything left over is invalid
+    USERNAME_STRIP_TABLE = str.maketrans('', '', string.ascii_letters + string.digits + '_')
+    MAX_USERNAME_LENGTH = 32
+    
+    # Allowed values
+    VALID_TRADER_TYPES = frozenset({"scalper", "day_trader", "swing_trader", "investor"})
+    VALID_SENTIMENTS = frozenset({"Bullish", "Bearish", "Neutral"})
+    
+    # Characters rejected in group names
+    GROUP_NAME_FORBIDDEN_CHARS = frozenset('<>"\'')
+    URL_SCHEMES = ('http://', 'https://')
+    MAX_URL_LENGTH = 2048
+    # The SQL keyword checks in one alternation, so text is scanned once;
+    # the group names identify which check matched. The '--' comment check
+    # is a plain substring test in validate_text_input. Keyword pairs must be
+    # on the same line and at most 256 characters apart: the bounded gap caps
+    # the work per candidate keyword instead of rescanning to the end of the line.
+    _SQL_INJECTION_REGEX = (
+        r"(?P<union_select>\bunion\b.{0,256}?\bselect\b)"
+        r"|(?P<drop_table>\bdrop\b.{0,256}?\btable\b)"
+        r"|(?P<insert_into>\binsert\b.{0,256}?\binto\b)"
+        r"|(?P<delete_from>\bdelete\b.{0,256}?\bfrom\b)"
+        r"|(?P<stacked_drop>;.{0,256}?\bdrop\b)"
+    )
+    SQL_INJECTION_PATTERN = re.compile(_SQL_INJECTION_REGEX, re.IGNORECASE)
+    # Same checks for ASCII text that is already lowercased: no case folding
+    # while matching. Uses RE2's linear-time matcher when google-re2 is
+    # installed; its ASCII-only \b agrees with re on ASCII input.
+    SQL_INJECTION_PATTERN_LOWER = (re2 or re).compile(_SQL_INJECTION_REGEX)
+    # Every SQL_INJECTION_PATTERN match contains one of these (lowercase) substrings
+    SQL_INJECTION_HINTS = ('union', 'drop', 'insert', 'delete')
     
     @staticmethod
     def validate_chat_id(chat_id: Any) -> bool:
         """Validate Telegram chat ID."""
+        # Common case: Telegram hands us ints (bool is an int but not an ID)
+        if isinstance(chat_id, int) and not isinstance(chat_id, bool):
+            return True
+        
         try:
-            chat_id_str = str(chat_id)
-            return bool(InputValidator.CHAT_ID_PATTERN.match(chat_id_str))
+            chat_id_str = chat_id if isinstance(chat_id, str) else str(chat_id)
+            digits = chat_id_str[1:] if chat_id_str.startswith('-') else chat_id_str
+            # isdecimal() matches the same characters as the regex \d
+            return digits.isdecimal()
         except Exception as e:
             logger.warning(f"Chat ID validation failed: {e}")
             return False
     
+    @staticmethod
+    def validate_username(username: str) -> bool:
+        """Validate Telegram username (1-32 ASCII letters, digits or underscores)."""
+        return (
+            isinstance(username, str)
+            and 1 <= len(username) <= InputValidator.MAX_USERNAME_LENGTH
+            and not username.translate(InputValidator.USERNAME_STRIP_TABLE)
+        )
+    
     @staticmethod
     def validate_group_name(name: str, max_length: int = 255) -> bool:
         """Validate group name."""
@@ -38,7 +89,7 @@ class InputValidator:
             return False
         
         # Check for suspicious patterns
-        if any(char in name for char in ['<', '>', '"', "'"]):
+        if not InputValidator.GROUP_NAME_FORBIDDEN_CHARS.isdisjoint(name):
             return False
         
         return True
@@ -46,12 +97,14 @@ class InputValidator:
     @staticmethod
     def validate_trader_type(trader_type: str) -> bool:
         """Validate trader type."""
-        valid_types = ["scalper", "day_trader", "swing_trader", "investor"]
-        return trader_type.lower() in valid_types
+        return isinstance(trader_type, str) and trader_type.lower() in InputValidator.VALID_TRADER_TYPES
     
     @staticmethod
     def validate_posting_hour(hour: int) -> bool:
         """Validate posting hour (0-23)."""
+        # Fast path for the common int case; other types go through int()
+        if type(hour) is int:
+            return 0 <= hour <= 23
         try:
             hour_int = int(hour)
             return 0 <= hour_int <= 23
@@ -61,6 +114,9 @@ class InputValidator:
     @staticmethod
     def validate_posting_minute(minute: int) -> bool:
         """Validate posting minute (0-59)."""
+        # Fast path for the common int case; other types go through int()
+        if type(minute) is int:
+            return 0 <= minute <= 59
         try:
             minute_int = int(minute)
             return 0 <= minute_int <= 59
@@ -70,10 +126,10 @@ class InputValidator:
     @staticmethod
     def validate_url(url: str) -> bool:
         """Validate URL format."""
-        if not isinstance(url, str):
+        if not isinstance(url, str) or len(url) > InputValidator.MAX_URL_LENGTH:
             return False
         
-        return bool(InputValidator.URL_PATTERN.match(url))
+        return _check_url(url)
     
     @staticmethod
     def validate_article_title(title: str, max_length: int = 500) -> bool:
@@ -89,8 +145,7 @@ class InputValidator:
     @staticmethod
     def validate_sentiment(sentiment: str) -> bool:
         """Validate sentiment value."""
-        valid_sentiments = ["Bullish", "Bearish", "Neutral"]
-        return sentiment in valid_sentiments
+        return isinstance(sentiment, str) and sentiment in InputValidator.VALID_SENTIMENTS
 
     @staticmethod
     def validate_text_input(text: str, max_length: int = 4000) -> bool:
@@ -104,28 +159,93 @@ class InputValidator:
         if len(text) > max_length:
             return False
 
-        # Check for SQL injection patterns
-        sql_patterns = [
-            r"(\bUNION\b.*\bSELECT\b)",
-            r"(\bDROP\b.*\bTABLE\b)",
-            r"(\bINSERT\b.*\bINTO\b)",
-            r"(\bDELETE\b.*\bFROM\b)",
-            r"(--)",
-            r"(;.*\bDROP\b)",
-        ]
+        # SQL comment marker: a literal, no regex needed
+        if '--' in text:
+            logger.warning("SQL injection pattern detected: comment")
+            return False
 
-        text_upper = text.upper()
-        for pattern in sql_patterns:
-            if re.search(pattern, text_upper, re.IGNORECASE):
-                logger.warning(f"SQL injection pattern detected: {pattern}")
-                return False
+        # Cheap gate: ASCII text without any hint substring cannot match, so
+        # skip the regex. Non-ASCII text always takes the regex path, since
+        # IGNORECASE also folds characters such as 'ſ' and 'ı' onto ASCII letters.
+        if text.isascii():
+            lowered = text.lower()
+            if not any(hint in lowered for hint in InputValidator.SQL_INJECTION_HINTS):
+                return True
+            # The lowered copy is already paid for; match it case-sensitively
+            match = InputValidator.SQL_INJECTION_PATTERN_LOWER.search(lowered)
+        else:
+            match = InputValidator.SQL_INJECTION_PATTERN.search(text)
+
+        if match:
+            logger.warning(f"SQL injection pattern detected: {match.lastgroup}")
+            return False
 
         return True
 
 
+def _check_url(url: str) -> bool:
+    """Check an http(s) URL's format once the type and length are known."""
+    # Scheme prefix, case-insensitively, without lowering the whole URL
+    if not url[:8].lower().startswith(InputValidator.URL_SCHEMES):
+        return False
+    
+    # No whitespace anywhere: splitting must give back the URL unchanged
+    if url.split(maxsplit=1) != [url]:
+        return False
+    
+    try:
+        return bool(urlsplit(url).netloc)
+    except ValueError:
+        # e.g. malformed IPv6 host
+        return False
+
+
+def _strip_tags(text: str) -> str:
+    """
+    Remove HTML-like tags (same result as re.sub(r'<[^>]+>', '', text)).
+    
+    Linear str.find scan: a '<' with no closing '>' ends the search instead
+    of being rescanned from every later '<'.
+    """
+    if '<' not in text:
+        return text
+    
+    parts = []
+    start = 0
+    while True:
+        open_pos = text.find('<', start)
+        if open_pos < 0:
+            break
+        close_pos = text.find('>', open_pos + 1)
+        if close_pos < 0:
+            # No '>' left, so no further tags
+            break
+        if close_pos == open_pos + 1:
+            # '<>' is not a tag; keep the '<' and look past it
+            parts.append(text[start:open_pos + 1])
+            start = open_pos + 1
+            continue
+        parts.append(text[start:open_pos])
+        start = close_pos + 1
+    parts.append(text[start:])
+    return ''.join(parts)
+
+
 class InputSanitizer:
     """Sanitizes user input to prevent injection attacks."""
     
+    # Deletes control characters (including null bytes) except newlines and tabs
+    CONTROL_CHARS_TABLE = str.maketrans(dict.fromkeys(
+        (code for code in range(32) if chr(code) not in '\n\t'), None
+    ))
+    HTML_ESCAPE_TABLE = str.maketrans({
+        '&': '&amp;',
+        '<': '&lt;',
+        '>': '&gt;',
+        '"': '&quot;',
+        "'": '&#39;',
+    })
+    
     @staticmethod
     def sanitize_text(text: str, max_length: int = 1000) -> str:
         """
@@ -144,11 +264,8 @@ class InputSanitizer:
         # Truncate to max length
         text = text[:max_length]
         
-        # Remove null bytes
-        text = text.replace('\x00', '')
-        
-        # Remove control characters except newlines and tabs
-        text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t')
+        # Remove null bytes and other control characters except newlines and tabs
+        text = text.translate(InputSanitizer.CONTROL_CHARS_TABLE)
         
         return text.strip()
     
@@ -158,29 +275,41 @@ class InputSanitizer:
         name = InputSanitizer.sanitize_text(name, max_length=255)
         
         # Remove HTML-like tags
-        name = re.sub(r'<[^>]+>', '', name)
+        name = _strip_tags(name)
         
         return name
     
     @staticmethod
     def sanitize_url(url: str) -> str:
         """Sanitize URL."""
-        url = InputSanitizer.sanitize_text(url, max_length=2048)
+        if not isinstance(url, str):
+            return ""
         
-        # Remove potentially dangerous characters
-        url = url.replace('\n', '').replace('\r', '')
+        return _sanitize_url(url[:2048])
+    
+    @staticmethod
+    def sanitize_and_validate_url(url: str) -> Tuple[str, bool]:
+        """
+        Sanitize a URL and validate the result in one step.
+        
+        Args:
+            url: Raw URL
+        
+        Returns:
+            Tuple of (sanitized URL, whether it is a valid http(s) URL)
+        """
+        if not isinstance(url, str):
+            return "", False
         
-        return url
+        return _sanitize_and_validate_url_cached(url[:2048])
     
     @staticmethod
     def sanitize_article_title(title: str) -> str:
         """Sanitize article title."""
-        title = InputSanitizer.sanitize_text(title, max_length=500)
-        
-        # Remove HTML-like tags
-        title = re.sub(r'<[^>]+>', '', title)
+        if not isinstance(title, str):
+            return ""
         
-        return title
+        return _sanitize_article_title_cached(title[:500])
     
     @staticmethod
     def sanitize_html_message(message: str) -> str:
@@ -195,42 +324,68 @@ class InputSanitizer:
         """
         message = InputSanitizer.sanitize_text(message)
         
-        # Escape HTML special characters
-        message = message.replace('&', '&amp;')
-        message = message.replace('<', '&lt;')
-        message = message.replace('>', '&gt;')
-        message = message.replace('"', '&quot;')
-        message = message.replace("'", '&#39;')
-        
-        return message
+        # Escape HTML special characters in a single pass
+        return message.translate(InputSanitizer.HTML_ESCAPE_TABLE)
+
+
+def _sanitize_url(url: str) -> str:
+    """Sanitize a URL already truncated to its maximum length."""
+    url = InputSanitizer.sanitize_text(url, max_length=2048)
+    
+    # Remove line breaks (sanitize_text already dropped '\r' with the other
+    # control characters, so only '\n' can remain)
+    return url.replace('\n', '')
+
+
+@lru_cache(maxsize=8192)
+def _sanitize_and_validate_url_cached(url: str) -> Tuple[str, bool]:
+    """
+    Sanitize and validate a URL with one cache lookup per raw URL.
+    
+    Feeds redeliver the same URLs every tick; only the part that survives
+    truncation matters, so it is also the cache key.
+    """
+    url = _sanitize_url(url)
+    return url, InputValidator.validate_url(url)
+
+
+@lru_cache(maxsize=8192)
+def _sanitize_article_title_cached(title: str) -> str:
+    """Sanitize an article title (memoized by InputSanitizer.sanitize_article_title)."""
+    title = InputSanitizer.sanitize_text(title, max_length=500)
+    
+    # Remove HTML-like tags
+    return _strip_tags(title)
 
 
 class DataValidator:
     """Validates data integrity and consistency."""
     
+    GROUP_SETTINGS_FLAG_FIELDS = (
+        'include_scalper', 'include_day_trader',
+        'include_swing_trader', 'include_investor'
+    )
+    ARTICLE_REQUIRED_FIELDS = ('title', 'description', 'url', 'source', 'publishedAt')
+    _MISSING = object()
+    
     @staticmethod
     def validate_group_settings(settings: dict) -> bool:
         """Validate group settings dictionary."""
-        required_fields = [
-            'include_scalper', 'include_day_trader',
-            'include_swing_trader', 'include_investor',
-            'posting_hour', 'posting_minute'
-        ]
-        
-        # Check all required fields exist
-        if not all(field in settings for field in required_fields):
-            return False
+        missing = DataValidator._MISSING
         
-        # Validate boolean fields
-        for field in ['include_scalper', 'include_day_trader', 'include_swing_trader', 'include_investor']:
-            if not isinstance(settings[field], (bool, int)):
+        # Existence and type of each flag in one lookup per field
+        for field in DataValidator.GROUP_SETTINGS_FLAG_FIELDS:
+            value = settings.get(field, missing)
+            if value is missing or not isinstance(value, (bool, int)):
                 return False
         
         # Validate time fields
-        if not InputValidator.validate_posting_hour(settings['posting_hour']):
+        hour = settings.get('posting_hour', missing)
+        if hour is missing or not InputValidator.validate_posting_hour(hour):
             return False
         
-        if not InputValidator.validate_posting_minute(settings['posting_minute']):
+        minute = settings.get('posting_minute', missing)
+        if minute is missing or not InputValidator.validate_posting_minute(minute):
             return False
         
         return True
@@ -238,9 +393,7 @@ class DataValidator:
     @staticmethod
     def validate_article_data(article: dict) -> bool:
         """Validate article data structure."""
-        required_fields = ['title', 'description', 'url', 'source', 'publishedAt']
-        
-        if not all(field in article for field in required_fields):
+        if not all(field in article for field in DataValidator.ARTICLE_REQUIRED_FIELDS):
             return False
         
         # Validate individual fields
@@ -251,4 +404,28 @@ class DataValidator:
             return False
         
         return True
-
+    
+    @staticmethod
+    def validate_articles(articles: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Validate a batch of articles.
+        
+        Same checks as validate_article_data, with the field list and
+        validators looked up once per batch instead of once per article.
+        
+        Args:
+            articles: Article dictionaries
+        
+        Returns:
+            One validity flag per article, in order
+        """
+        required_fields = DataValidator.ARTICLE_REQUIRED_FIELDS
+        validate_title = InputValidator.validate_article_title
+        validate_url = InputValidator.validate_url
+        
+        return [
+            all(field in article for field in required_fields)
+            and validate_title(article['title'])
+            and validate_url(article['url'])
+            for article in articles
+        ]